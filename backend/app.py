@@ -1,12 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory
-from pymongo import MongoClient
-from bson import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Blueprint, Response, current_app, g, render_template, request, redirect, url_for, session, flash, jsonify
+from markupsafe import Markup
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+import functools
+import hmac
+import importlib.util
 import os
 import re
 import sys
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import threading
@@ -14,131 +17,372 @@ import time
 
 # Add parent directory to path for utils import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.logger import setup_logger, log_startup, log_success, log_error, log_warning, log_info
+from utils.logger import setup_logger, flush_logs, log_startup, log_success, log_error, log_warning, log_info
 from utils.chatbot_prompt import get_system_prompt, get_user_prompt_template, validate_response_for_hallucination
-
-# Import Ollama for local LLM
-OLLAMA_AVAILABLE = False
-OLLAMA_ERROR = None
-try:
-    import ollama
-    OLLAMA_AVAILABLE = True
-except ImportError as e:
-    OLLAMA_AVAILABLE = False
-    OLLAMA_ERROR = str(e)
-    # Will log warning after logger is initialized
-except Exception as e:
-    # Handle any other import errors
-    OLLAMA_AVAILABLE = False
-    OLLAMA_ERROR = str(e)
-
-# Import Razorpay for payment processing
-RAZORPAY_AVAILABLE = False
-razorpay_client = None
-try:
-    import razorpay
-    RAZORPAY_AVAILABLE = True
-except ImportError:
-    RAZORPAY_AVAILABLE = False
-    # Will log warning after logger is initialized
-except Exception:
-    RAZORPAY_AVAILABLE = False
+from utils.storage import create_storage
+from utils.assets import AssetRegistry
+from utils.i18n import TranslationBundles
+from utils.data_versions import DataVersions
+from utils.fragment_cache import FragmentCache
+from utils.conditional import conditional_response, version_etag
+from utils.process_lock import ProcessLock
+from utils.database import Database, bulk_timeout, job_timeout
+from utils.metrics import Metrics, MongoCommandMetrics
+from utils.profiling import StackSampler, native_thread_id, profile_cpu, profile_memory, profile_lock
+from utils.rate_limit import AdmissionControl, MemoryBuckets, MongoBuckets, RateLimit, RateLimiter
+from utils.passwords import DEFAULT_METHOD, HasherBusy, PasswordHasher
+from utils.repositories import (CROP_FIELDS, CROP_PROJECTION, CropRepository, MarketUpdateRepository,
+                                PaymentRepository, StoryRepository, UserRepository, as_object_id, crop_record)
+from utils.seller_snapshots import SellerSnapshotSync, seller_snapshot
+from utils.migrations import run_migrations
+from utils.json_provider import FastJSONProvider, stream_json_array
+from utils.market_analytics import MarketAnalytics
+from utils.price_bands import PriceBands
+from utils.gazetteer import Gazetteer, distance_km
+from utils.crop_import import import_crops, rows_from_csv
+from utils.change_feed import ChangeFeed, change_type
+from utils.sessions import MongoSessionInterface, ProfileCache
+from utils.export import EXPORT_FORMATS, csv_chunks, export_query, ndjson_chunks, parse_after, parse_since
+
+# Ollama and Razorpay are optional and slow to import, so only check that they are
+# installed here; they are imported on first use
+OLLAMA_AVAILABLE = importlib.util.find_spec('ollama') is not None
+RAZORPAY_AVAILABLE = importlib.util.find_spec('razorpay') is not None
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Setup logger
+# Setup logger (queued JSON or text output, see utils/logger.py). Messages logged on every
+# request use '%s' arguments so they are only formatted by the log writer thread.
 logger = setup_logger("FarmingApp")
 
-# Log Ollama availability status
-if not OLLAMA_AVAILABLE:
-    python_path = sys.executable
-    conda_env = os.environ.get('CONDA_DEFAULT_ENV', 'Not in conda env')
-    log_warning(f"Ollama not available in current Python: {python_path}")
-    log_warning(f"Conda environment: {conda_env}")
-    log_warning("Make sure you're using the conda environment Python. Try: conda activate syed && python main.py")
-    log_warning("Or install ollama in current environment: pip install ollama")
-
-# Load Razorpay keys from environment (before checking)
-RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID')
-RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET')
-
-# Log Razorpay availability status
-if not RAZORPAY_AVAILABLE:
-    log_warning("Razorpay not installed. Install with: pip install razorpay")
-elif not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
-    log_warning("Razorpay keys not found in environment variables. Payment features will be disabled.")
-
 # Chatbot session storage (in-memory, stores conversation history per session)
 chatbot_sessions = {}  # Format: {session_id: [{"role": "user", "content": "message"}, {"role": "assistant", "content": "response"}, ...]}
 
-app = Flask(__name__, template_folder='../templates')
+main = Blueprint('main', __name__)
 
 # Configure upload settings
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'stories')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_FOLDER = os.path.join(PROJECT_ROOT, 'uploads', 'stories')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi', 'webm'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB max file size
+STORIES_ETAG_WINDOW = 60  # Seconds an /api/stories ETag stays valid (stories expire over time)
+
+# Shared services. They are configured by create_app() and connect lazily on first use.
+mongo = Database()
+users_collection = mongo.collection('users')
+market_updates_collection = mongo.collection('market_updates')
+crops_collection = mongo.collection('crops')
+stories_collection = mongo.collection('stories')
+payments_collection = mongo.collection('payments')
+price_stats_collection = mongo.collection('price_stats')
+price_bands_collection = mongo.collection('price_bands')
+sessions_collection = mongo.collection('sessions')
+
+# Per-route request metrics, MongoDB command timings and outbound call timings, served at
+# /metrics. With METRICS_DIR set, every worker process writes its figures there so a scrape
+# of any worker reports the whole server.
+metrics = Metrics(os.getenv('METRICS_DIR') or None)
+mongo.add_event_listener(MongoCommandMetrics(metrics))
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 10))  # Seconds between writes to METRICS_DIR
+
+# On-demand CPU/memory profiles of a live worker (see utils/profiling.py), enabled by PROFILING_TOKEN
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 60))
+
+# Public listings read through the catalog read preference (secondaries by default)
+market_updates_catalog = mongo.catalog_collection('market_updates')
+crops_catalog = mongo.catalog_collection('crops')
+stories_catalog = mongo.catalog_collection('stories')
+price_stats_catalog = mongo.catalog_collection('price_stats')
+CATALOG_SETTLE_SECONDS = int(os.getenv('CATALOG_SETTLE_SECONDS', 10))  # Upper bound on replication lag
+
+# Repositories used by request handlers to query the collections above
+market_updates_repository = MarketUpdateRepository(market_updates_collection, catalog=market_updates_catalog)
+crops_repository = CropRepository(crops_collection, catalog=crops_catalog)
+stories_repository = StoryRepository(stories_collection, catalog=stories_catalog)
+payments_repository = PaymentRepository(payments_collection)
+users_repository = UserRepository(users_collection)
+
+# Daily price and sales aggregates, updated from the listing and payment write paths
+market_analytics = MarketAnalytics(price_stats_collection, catalog=price_stats_catalog)
+ANALYTICS_MAX_DAYS = 365
+
+# Offline place-name lookup for crop and profile locations (loaded on first use)
+gazetteer = Gazetteer()
+SEARCH_MAX_RADIUS_KM = 2000
+
+# Fair-price bands and price outliers, recomputed by a background job and kept in memory
+price_bands = PriceBands(crops_collection, price_bands_collection)
+
+# Sessions are stored server-side (the cookie only carries the session id); profiles are
+# cached per process and reloaded when the session's profile_version changes
+session_interface = MongoSessionInterface(sessions_collection, touch_interval=int(os.getenv('SESSION_TOUCH_INTERVAL', 3600)))
+profile_cache = ProfileCache(lambda user_id: load_profile(user_id), int(os.getenv('PROFILE_CACHE_SIZE', 1024)))
+
+# Listing changes pushed to marketplace pages over Server-Sent Events (/api/crops/stream).
+# Each open stream holds a worker thread, so threaded workers only give half of their
+# threads to streams (pages beyond that poll instead); gevent workers can hold many.
+if os.getenv('WORKER_CLASS', 'gthread') == 'gevent':
+    default_feed_clients = 50
+else:
+    default_feed_clients = int(os.getenv('WORKER_THREADS', 4)) // 2
+crop_feed = ChangeFeed(max_clients=int(os.getenv('CHANGE_FEED_MAX_CLIENTS', default_feed_clients)),
+                       max_seconds=int(os.getenv('CHANGE_FEED_MAX_SECONDS', 300)))
+
+# Per-client token buckets for expensive endpoints ('<requests>/<seconds>', 'off' disables one),
+# kept per worker ('memory') or shared through MongoDB ('mongo'), and per-route, per-worker caps
+# on slow requests running at once (requests over a cap get 503 instead of waiting). Login and
+# signup have no cap of their own: their password work is bounded by password_hasher.
+RATE_LIMITS = {
+    'chatbot': os.getenv('RATE_LIMIT_CHATBOT', '10/60'),
+    'stories-upload': os.getenv('RATE_LIMIT_STORIES_UPLOAD', '20/3600'),
+    'signup': os.getenv('RATE_LIMIT_SIGNUP', '5/3600'),
+    'login': os.getenv('RATE_LIMIT_LOGIN', '10/300'),
+}
+rate_limits_collection = mongo.collection('rate_limits')
+rate_limiter = RateLimiter(
+    MongoBuckets(rate_limits_collection) if os.getenv('RATE_LIMIT_BACKEND', 'memory').lower() == 'mongo' else MemoryBuckets(),
+    {route: RateLimit.parse(limit) for route, limit in RATE_LIMITS.items() if limit.lower() not in ('', 'off')},
+    logger
+)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0))
+admission = {
+    'chatbot': AdmissionControl(int(os.getenv('ADMISSION_MAX_CHATBOT', 2)), ADMISSION_QUEUE_TIMEOUT),
+    'stories-upload': AdmissionControl(int(os.getenv('ADMISSION_MAX_STORIES_UPLOAD', 2)), ADMISSION_QUEUE_TIMEOUT),
+}
+ADMISSION_RETRY_AFTER = 5  # Seconds clients are asked to wait after a shed request
+
+# Password hashing runs in a few helper processes per worker (see utils/passwords.py)
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', 1)),
+    max_pending=int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+)
+
+# Largest number of rows accepted by one /api/crops/bulk request
+CROP_IMPORT_MAX_ROWS = int(os.getenv('CROP_IMPORT_MAX_ROWS', 10000))
+
+# Collections available from /api/export/<dataset>: (repository, projection, CSV columns)
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_DATASETS = {
+    'crops': (crops_repository, CROP_PROJECTION, CROP_FIELDS),
+    'payments': (payments_repository, None, (
+        'order_id', 'payment_id', 'user_id', 'user_email', 'amount', 'status',
+        'crop_id', 'crop_name', 'quantity_purchased', 'created_at'
+    )),
+    'users': (users_repository, {'password': 0}, (
+        'email', 'phone', 'username', 'profile.name', 'profile.location', 'profile.bio',
+        'profile_completed', 'is_active', 'created_at', 'updated_at', 'last_login'
+    )),
+}
+
+# Crop listings carry a snapshot of their seller; profile changes are copied onto them in the background
+seller_snapshots = SellerSnapshotSync(crops_repository, users_repository, on_change=lambda: bump_data_version('crops'))
+
+# Story media storage (local content-addressed folder or S3-compatible bucket), set by create_app()
+media_storage = None
+
+# Static assets (CSS/JS) are loaded into memory once, precompressed and fingerprinted.
+# In debug mode (or with ASSETS_WATCH=True) changed files are reloaded from disk.
+assets = AssetRegistry(PROJECT_ROOT, {'': 'webpage', 'static/js/': 'static/js'})
+
+# Translation bundles split per language and page, built from static/i18n/translations.json
+translations = TranslationBundles(
+    os.path.join(PROJECT_ROOT, 'static', 'i18n', 'translations.json'),
+    os.path.join(PROJECT_ROOT, 'templates'),
+    [os.path.join(PROJECT_ROOT, 'static', 'js'), os.path.join(PROJECT_ROOT, 'webpage')],
+    assets
+)
+
+# Rendered listing/update cards are cached per data version and language
+data_versions = DataVersions(mongo.collection('data_versions'))
+fragment_cache = FragmentCache(int(os.getenv('FRAGMENT_CACHE_SIZE', 512)))
+
+# Razorpay client, created on first use by get_razorpay_client()
+RAZORPAY_KEY_ID = None
+RAZORPAY_KEY_SECRET = None
+_razorpay_client = None
+_razorpay_lock = threading.Lock()
+
+def get_razorpay_client():
+    """Get the shared Razorpay client, creating it on first use. Returns None if not configured"""
+    global _razorpay_client
+    if _razorpay_client is not None or not (RAZORPAY_AVAILABLE and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET):
+        return _razorpay_client
+    with _razorpay_lock:
+        if _razorpay_client is None:
+            try:
+                import razorpay
+                _razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+                log_success("Razorpay initialized successfully")
+            except Exception as e:
+                log_error(f"Failed to initialize Razorpay: {e}")
+    return _razorpay_client
+
+def rejected_response(status, message, retry_after, redirect_endpoint):
+    """429/503 JSON for API routes; for form posts, a flash message and redirect like other form errors"""
+    if request.path.startswith('/api/'):
+        response = jsonify({"success": False, "error": message})
+        response.status_code = status
+    else:
+        flash(f'❌ {message}', 'error')
+        response = redirect(url_for(redirect_endpoint))
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def rate_limited(route, redirect_endpoint='main.index'):
+    """Apply the route's rate limit (per user, or per IP when anonymous) and admission cap to POSTs"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'POST' or not current_app.config['RATE_LIMIT_ENABLED']:
+                return view(*args, **kwargs)
+            user_id = session.get('user_id')
+            client = f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+            allowed, retry_after = rate_limiter.check(route, client)
+            if not allowed:
+                metrics.inc('farming_requests_rejected_total', (('route', route), ('reason', 'rate_limit')))
+                logger.warning("Rate limit reached on %s by %s", route, client)
+                return rejected_response(429, f"Too many requests. Please try again in {retry_after} seconds.",
+                                         retry_after, redirect_endpoint)
+            route_admission = admission.get(route)
+            if route_admission is None:
+                return view(*args, **kwargs)
+            if not route_admission.try_enter():
+                metrics.inc('farming_requests_rejected_total', (('route', route), ('reason', 'overload')))
+                logger.warning("Shed %s request: %s already running", route, route_admission.max_concurrent)
+                return rejected_response(503, "The server is busy. Please try again in a few seconds.",
+                                         ADMISSION_RETRY_AFTER, redirect_endpoint)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                route_admission.leave()
+        return wrapper
+    return decorator
+
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
 
-# Create upload directory if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+    Nothing slow happens here: MongoDB, Razorpay and Ollama are connected/imported on
+    first use and background jobs start with the first request (or gunicorn post_fork).
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    Args:
+        config: optional dict of settings overriding the environment (e.g. for tests)
+    """
+    global media_storage, RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET
+    started = time.perf_counter()
+    
+    app = Flask(__name__, template_folder='../templates')
+    app.json = FastJSONProvider(app)
+    app.session_interface = session_interface
+    app.config.update(
+        SECRET_KEY=os.getenv('SECRET_KEY'),
+        MONGO_URI=os.getenv('MONGO_URI'),
+        DB_NAME=os.getenv('DB_NAME', 'farming'),
+        RAZORPAY_KEY_ID=os.getenv('RAZORPAY_KEY_ID'),
+        RAZORPAY_KEY_SECRET=os.getenv('RAZORPAY_KEY_SECRET'),
+        UPLOAD_FOLDER=UPLOAD_FOLDER,
+        MAX_CONTENT_LENGTH=MAX_FILE_SIZE,
+        ASSETS_WATCH=os.getenv('ASSETS_WATCH', os.getenv('FLASK_DEBUG', 'False')).lower() == 'true',
+        EXPORT_API_TOKEN=os.getenv('EXPORT_API_TOKEN'),
+        METRICS_TOKEN=os.getenv('METRICS_TOKEN'),
+        PROFILING_TOKEN=os.getenv('PROFILING_TOKEN'),
+        RATE_LIMIT_ENABLED=os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true',
+        PROXY_FIX_X_FOR=int(os.getenv('PROXY_FIX_X_FOR', 0)),
+    )
+    if config:
+        app.config.update(config)
+    
+    # Check required settings
+    if not app.config['SECRET_KEY']:
+        log_error("SECRET_KEY environment variable is not set. Please check your .env file.")
+        raise ValueError("SECRET_KEY environment variable is not set. Please check your .env file.")
+    if not app.config['MONGO_URI']:
+        log_error("MONGO_URI environment variable is not set. Please check your .env file.")
+        raise ValueError("MONGO_URI environment variable is not set. Please check your .env file.")
+    
+    # Behind a reverse proxy, take the client IP (used by rate limits) from X-Forwarded-For
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
+    mongo.init_app(app)
+    media_storage = create_storage(app.config['UPLOAD_FOLDER'])
+    
+    assets.watch = app.config['ASSETS_WATCH']
+    assets.load_all()
+    app.jinja_env.globals['asset_url'] = assets.url_for
+    translations.build()
+    translations.init_app(app)
+    
+    # Log optional integration status
+    RAZORPAY_KEY_ID = app.config['RAZORPAY_KEY_ID']
+    RAZORPAY_KEY_SECRET = app.config['RAZORPAY_KEY_SECRET']
+    if not OLLAMA_AVAILABLE:
+        log_warning(f"Ollama not available in current Python: {sys.executable}")
+        log_warning("Install it with: pip install ollama")
+    if not RAZORPAY_AVAILABLE:
+        log_warning("Razorpay not installed. Install with: pip install razorpay")
+    elif not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
+        log_warning("Razorpay keys not found in environment variables. Payment features will be disabled.")
+    
+    app.register_blueprint(main)
+    
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+    log_success(f"Farming App created in {app.config['STARTUP_SECONDS'] * 1000:.0f} ms "
+                f"(database: {mongo.db_name}, media storage: {media_storage.name})")
+    return app
 
-# Check required environment variables
-SECRET_KEY = os.getenv('SECRET_KEY')
-if not SECRET_KEY:
-    log_error("SECRET_KEY environment variable is not set. Please check your .env file.")
-    raise ValueError("SECRET_KEY environment variable is not set. Please check your .env file.")
+def bump_data_version(name):
+    """Mark a dataset as changed so cached fragments are re-rendered"""
+    try:
+        data_versions.bump(name)
+    except Exception as e:
+        logger.error(f"Error bumping data version for {name}: {e}")
+    fragment_cache.invalidate(name)
 
-MONGO_URI = os.getenv('MONGO_URI')
-if not MONGO_URI:
-    log_error("MONGO_URI environment variable is not set. Please check your .env file.")
-    raise ValueError("MONGO_URI environment variable is not set. Please check your .env file.")
+def catalog_version(name):
+    """
+    Dataset version for caches and ETags built from catalog reads.
+    Catalog reads may come from a lagging secondary, so for CATALOG_SETTLE_SECONDS after a
+    write the version gets a separate token; anything cached meanwhile is replaced once it settles.
+    """
+    version, updated_at = data_versions.info(name)
+    if (mongo.catalog_read_preference.mode and updated_at
+            and datetime.utcnow() - updated_at < timedelta(seconds=CATALOG_SETTLE_SECONDS)):
+        return f"{version}-settling"
+    return version
 
-# Set Flask secret key
-app.secret_key = SECRET_KEY
-log_success("Flask secret key configured")
+def render_cards(namespace, template_name, macro_name, load_items, owner_field=None, viewer_email='', key_extra=()):
+    """
+    Render a list of cards with a macro, reusing cached HTML.
+    Cards owned by the viewer (owner_field == viewer_email) are rendered per request.
+    Returns (cards HTML, number of cards)
+    """
+    macro = getattr(current_app.jinja_env.get_template(template_name).module, macro_name)
+    key = (namespace, catalog_version(namespace), translations.current_language(), template_name) + tuple(key_extra)
+    
+    def render_all():
+        return [(item, str(macro(item, False))) for item in load_items()]
+    
+    cards = fragment_cache.get_or_render(key, render_all)
+    html = []
+    for item, card_html in cards:
+        if owner_field and viewer_email and item.get(owner_field) == viewer_email:
+            html.append(str(macro(item, True)))
+        else:
+            html.append(card_html)
+    return Markup(''.join(html)), len(cards)
 
-# Initialize Razorpay (keys already loaded above)
-if RAZORPAY_AVAILABLE and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
-    try:
-        razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-        log_success("Razorpay initialized successfully")
-    except Exception as e:
-        log_error(f"Failed to initialize Razorpay: {e}")
-        razorpay_client = None
-elif RAZORPAY_AVAILABLE:
-    log_warning("Razorpay keys not found in environment variables. Payment features will be disabled.")
-else:
-    log_warning("Razorpay not available. Payment features will be disabled.")
-
-# Connect to MongoDB
-try:
-    client = MongoClient(MONGO_URI)
-    db_name = os.getenv('DB_NAME', 'farming')
-    db = client[db_name]
-    users_collection = db.users
-    market_updates_collection = db.market_updates
-    crops_collection = db.crops
-    stories_collection = db.stories
-    log_success(f"Connected to MongoDB database: {db_name}")
-except Exception as e:
-    log_error(f"Failed to connect to MongoDB: {e}")
-    raise
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # Market Updates Database Functions
 def get_market_updates():
     """Get all market updates from database"""
     try:
-        updates = list(market_updates_collection.find().sort("created_at", -1))
-        for update in updates:
-            update['_id'] = str(update['_id'])
-        return updates
+        return market_updates_repository.latest()
     except Exception as e:
         logger.error(f"Error getting market updates: {e}")
         return []
@@ -146,9 +390,9 @@ def get_market_updates():
 def add_market_update(update_data):
     """Add a new market update to database"""
     try:
-        update_data['created_at'] = datetime.utcnow()
-        result = market_updates_collection.insert_one(update_data)
-        return str(result.inserted_id)
+        update_id = market_updates_repository.create(update_data)
+        bump_data_version('market_updates')
+        return update_id
     except Exception as e:
         logger.error(f"Error adding market update: {e}")
         return None
@@ -156,12 +400,9 @@ def add_market_update(update_data):
 def update_market_update(update_id, update_data):
     """Update an existing market update"""
     try:
-        from bson import ObjectId
-        result = market_updates_collection.update_one(
-            {"_id": ObjectId(update_id)},
-            {"$set": update_data}
-        )
-        return result.modified_count > 0
+        modified = market_updates_repository.update(update_id, update_data)
+        bump_data_version('market_updates')
+        return modified
     except Exception as e:
         logger.error(f"Error updating market update: {e}")
         return False
@@ -169,9 +410,9 @@ def update_market_update(update_id, update_data):
 def delete_market_update(update_id):
     """Delete a market update"""
     try:
-        from bson import ObjectId
-        result = market_updates_collection.delete_one({"_id": ObjectId(update_id)})
-        return result.deleted_count > 0
+        deleted = market_updates_repository.delete(update_id)
+        bump_data_version('market_updates')
+        return deleted
     except Exception as e:
         logger.error(f"Error deleting market update: {e}")
         return False
@@ -180,28 +421,11 @@ def delete_market_update(update_id):
 def get_crops(filters=None):
     """Get all crops from database with optional filters"""
     try:
-        query = {}
-        if filters:
-            if filters.get('category'):
-                query['category'] = filters['category']
-            if filters.get('location'):
-                query['location'] = {'$regex': filters['location'], '$options': 'i'}
-            if filters.get('price_min') or filters.get('price_max'):
-                price_query = {}
-                if filters.get('price_min'):
-                    price_query['$gte'] = filters['price_min']
-                if filters.get('price_max'):
-                    price_query['$lte'] = filters['price_max']
-                query['price_per_kg'] = price_query
-        
-        crops = list(crops_collection.find(query).sort("created_at", -1))
-        for crop in crops:
-            crop['_id'] = str(crop['_id'])
-            # Ensure all required fields exist with defaults
-            crop.setdefault('total_price', crop.get('quantity', 0) * crop.get('price_per_kg', 0))
-            crop.setdefault('seller_name', 'Unknown')
-            crop.setdefault('seller_phone', '')
-            crop.setdefault('description', '')
+        crops = crops_repository.search(filters)
+        if filters and filters.get('near'):
+            for crop in crops:
+                point = crop.get('location_point')
+                crop['distance_km'] = round(distance_km(filters['near'], point), 1) if point else None
         return crops
     except Exception as e:
         logger.error(f"Error getting crops: {e}")
@@ -210,9 +434,11 @@ def get_crops(filters=None):
 def add_crop(crop_data):
     """Add a new crop listing to database"""
     try:
-        crop_data['created_at'] = datetime.utcnow()
-        result = crops_collection.insert_one(crop_data)
-        return str(result.inserted_id)
+        crop_id = crops_repository.create(crop_data)
+        bump_data_version('crops')
+        record_listings([crop_data])
+        publish_crop_change('new', crop_id, crop_record(dict(crop_data, _id=crop_id)))
+        return crop_id
     except Exception as e:
         logger.error(f"Error adding crop: {e}")
         return None
@@ -220,12 +446,10 @@ def add_crop(crop_data):
 def update_crop(crop_id, crop_data):
     """Update an existing crop listing"""
     try:
-        from bson import ObjectId
-        result = crops_collection.update_one(
-            {"_id": ObjectId(crop_id)},
-            {"$set": crop_data}
-        )
-        return result.modified_count > 0
+        modified = crops_repository.update(crop_id, crop_data)
+        bump_data_version('crops')
+        publish_crop_change(change_type(crop_data), crop_id, crop_data)
+        return modified
     except Exception as e:
         logger.error(f"Error updating crop: {e}")
         return False
@@ -233,29 +457,153 @@ def update_crop(crop_id, crop_data):
 def delete_crop(crop_id):
     """Delete a crop listing"""
     try:
-        from bson import ObjectId
-        result = crops_collection.delete_one({"_id": ObjectId(crop_id)})
-        return result.deleted_count > 0
+        deleted = crops_repository.delete(crop_id)
+        bump_data_version('crops')
+        if deleted:
+            publish_crop_change('removed', crop_id)
+        return deleted
     except Exception as e:
         logger.error(f"Error deleting crop: {e}")
         return False
 
+def publish_crop_change(event_type, crop_id, fields=None):
+    """Push a listing change to connected marketplace pages (skipped when the change stream carries it)"""
+    try:
+        crop_feed.publish_local(event_type, crop_id, fields)
+    except Exception as e:
+        logger.error(f"Error publishing crop change: {e}")
+
+def record_listings(crops):
+    """Add new crop listings to the price aggregates (never fails the write that called it)"""
+    try:
+        if market_analytics.record_listings(crops):
+            bump_data_version('price_stats')
+    except Exception as e:
+        logger.error(f"Error updating price aggregates: {e}")
+
+def record_sale(crop, quantity, amount):
+    """Add a verified sale (amount in rupees) to the price aggregates"""
+    try:
+        market_analytics.record_sale(crop_order_details(crop)['crop_details'], quantity, amount)
+        bump_data_version('price_stats')
+    except Exception as e:
+        logger.error(f"Error updating price aggregates: {e}")
+
+def current_price_bands():
+    """Price bands, reloaded when another process has recomputed them"""
+    try:
+        version = data_versions.get('price_bands')
+        if version != price_bands.version:
+            price_bands.load(version)
+    except Exception as e:
+        logger.error(f"Error loading price bands: {e}")
+    return price_bands
+
+def location_search_filters(near, radius_km):
+    """
+    Filters for a nearest/radius crop search around a place name or 'lat,lon'.
+    Raises ValueError if the place is unknown or the radius is out of range.
+    """
+    point = gazetteer.locate(near)
+    if point is None:
+        raise ValueError(f"Unknown location: {near}")
+    filters = {'near': point}
+    if radius_km is not None:
+        if not 0 < radius_km <= SEARCH_MAX_RADIUS_KM:
+            raise ValueError(f"radius_km must be between 0 and {SEARCH_MAX_RADIUS_KM}")
+        filters['radius_km'] = radius_km
+    return filters
+
+def crop_order_details(crop):
+    """Crop and seller details shown with an order, taken from the listing and its seller snapshot"""
+    return {
+        'crop_details': {
+            'name': crop.get('name', 'Unknown'),
+            'category': crop.get('category', ''),
+            'price_per_kg': crop.get('price_per_kg', 0),
+            'location': crop.get('location', '')
+        },
+        'seller_details': {
+            'name': crop.get('seller_name', 'Unknown Seller'),
+            'email': crop.get('seller_email', ''),
+            'phone': crop.get('seller_phone', ''),
+            'location': crop.get('seller_location', '')
+        }
+    }
+
 def get_user_crops(user_email):
     """Get crops listed by a specific user"""
     try:
-        crops = list(crops_collection.find({"seller_email": user_email}).sort("created_at", -1))
-        for crop in crops:
-            crop['_id'] = str(crop['_id'])
-            # Ensure all required fields exist with defaults
-            crop.setdefault('total_price', crop.get('quantity', 0) * crop.get('price_per_kg', 0))
-            crop.setdefault('seller_name', 'Unknown')
-            crop.setdefault('seller_phone', '')
-            crop.setdefault('description', '')
-        return crops
+        return crops_repository.by_seller(user_email)
     except Exception as e:
         logger.error(f"Error getting user crops: {e}")
         return []
 
+def load_profile(user_id):
+    """Profile and profile version of a user from the database (the profile cache loader)"""
+    user = users_repository.get(user_id, {'profile': 1, 'profile_version': 1}) or {}
+    return user.get('profile', {}), user.get('profile_version')
+
+def current_profile():
+    """The logged-in user's profile ({} when logged out)"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return {}
+    try:
+        profile, version = profile_cache.get(user_id, session.get('profile_version'))
+    except Exception as e:
+        logger.error(f"Error loading profile: {e}")
+        return {}
+    if version != session.get('profile_version'):
+        # Changed from another session of the same user
+        session['profile_version'] = version
+    return profile
+
+def current_user(default_email='user@example.com'):
+    """Template variables describing the logged-in user (user_email, user_name, ...)"""
+    user_email = session.get('email', default_email)
+    profile = current_profile()
+    return {
+        'user_email': user_email,
+        'user_phone': session.get('phone', ''),
+        'user_name': profile.get('name') or (user_email.split('@')[0] if user_email else 'Guest'),
+        'user_location': profile.get('location', ''),
+        'user_bio': profile.get('bio', ''),
+    }
+
+def start_user_session(user_id, user):
+    """Log a user in: a fresh session id, identity fields and their profile in the cache"""
+    session.clear()
+    session.regenerate()
+    session['user_id'] = user_id
+    session['email'] = user['email']
+    session['phone'] = user.get('phone', '')
+    session['username'] = user.get('username', user['email'])
+    session['profile_version'] = user.get('profile_version')
+    profile_cache.put(user_id, user.get('profile_version'), user.get('profile', {}))
+
+@contextmanager
+def password_timer(operation):
+    """Record how long a password hash or check took, including the wait for a helper process"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe('farming_password_hash_seconds', (('operation', operation),), time.perf_counter() - started)
+
+def rehash_password(user, password):
+    """Re-hash a password made with other hash parameters, after a successful login"""
+    try:
+        if not password_hasher.needs_rehash(user['password']):
+            return
+        with password_timer('hash'):
+            password_hash = password_hasher.hash(password)
+        users_repository.update(user['_id'], {'password': password_hash})
+        logger.info("Upgraded password hash of %s to %s", user['email'], password_hasher.method)
+    except Exception as e:
+        # The old hash still works; try again on the next login
+        logger.warning("Could not upgrade password hash of %s: %s", user['email'], e)
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -274,14 +622,14 @@ def validate_password(password):
         return False, "Password must be at least 6 characters long"
     return True, ""
 
-@app.route('/')
+@main.route('/')
 def index():
     """Serve the main webpage - redirect to booking/homepage"""
     try:
         # Check if user is logged in
         if 'user_id' in session:
             # Redirect to booking page (homepage/dashboard)
-            logger.info(f"User {session.get('username', 'Unknown')} is logged in, redirecting to homepage")
+            logger.info("User %s is logged in, redirecting to homepage", session.get('username', 'Unknown'))
             return redirect('/booking')
         else:
             # Not logged in, redirect to market page (public)
@@ -291,62 +639,49 @@ def index():
         logger.error(f"Error redirecting: {e}")
         return "Error loading webpage.", 500
 
-@app.route('/styles.css')
-def styles():
+@main.route('/styles.css')
+@main.route('/styles.<fingerprint>.css')
+def styles(fingerprint=None):
     """Serve the CSS file"""
-    try:
-        # Get the correct path to the CSS file
-        import os
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        css_path = os.path.join(current_dir, '..', 'webpage', 'styles.css')
-        
-        with open(css_path, 'r', encoding='utf-8') as f:
-            css_content = f.read()
-        return css_content, 200, {'Content-Type': 'text/css'}
-    except FileNotFoundError:
-        logger.error(f"CSS file not found at: {css_path}")
+    response = assets.serve(request.path.lstrip('/'))
+    if response is None:
+        logger.error("CSS file not found: styles.css")
         return "CSS file not found.", 404
+    return response
 
-@app.route('/favicon.ico')
+@main.route('/favicon.ico')
 def favicon():
     """Handle favicon requests"""
     return '', 204  # No content response
 
-@app.route('/script.js')
-def script():
+@main.route('/script.js')
+@main.route('/script.<fingerprint>.js')
+def script(fingerprint=None):
     """Serve the JavaScript file"""
-    try:
-        # Get the correct path to the JavaScript file
-        import os
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        js_path = os.path.join(current_dir, '..', 'webpage', 'script.js')
-        
-        with open(js_path, 'r', encoding='utf-8') as f:
-            js_content = f.read()
-        logger.info("Serving JavaScript file")
-        return js_content, 200, {'Content-Type': 'application/javascript'}
-    except FileNotFoundError:
-        logger.error(f"JavaScript file not found at: {js_path}")
+    response = assets.serve(request.path.lstrip('/'))
+    if response is None:
+        logger.error("JavaScript file not found: script.js")
         return "JavaScript file not found.", 404
+    return response
 
-@app.route('/static/js/<path:filename>')
+@main.route('/static/js/<path:filename>')
 def static_js(filename):
     """Serve static JavaScript files"""
-    try:
-        import os
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        js_path = os.path.join(current_dir, '..', 'static', 'js', filename)
-        
-        with open(js_path, 'r', encoding='utf-8') as f:
-            js_content = f.read()
-        logger.info(f"Serving static JavaScript file: {filename}")
-        return js_content, 200, {'Content-Type': 'application/javascript'}
-    except FileNotFoundError:
-        logger.error(f"Static JavaScript file not found: {filename}")
+    response = assets.serve(f"static/js/{filename}")
+    if response is None:
+        logger.warning("Static JavaScript file not found: %s", filename)
         return "JavaScript file not found.", 404
+    return response
 
+@main.route('/i18n/<path:filename>')
+def translation_bundle(filename):
+    """Serve per-language, per-page translation bundles"""
+    response = assets.serve(f"i18n/{filename}")
+    if response is None:
+        return jsonify({"success": False, "error": "Translation bundle not found"}), 404
+    return response
 
-@app.route('/login-page')
+@main.route('/login-page')
 def login_page():
     """Serve the login page only"""
     try:
@@ -356,7 +691,7 @@ def login_page():
         logger.error(f"Error serving login page: {e}")
         return "Error loading login page.", 500
 
-@app.route('/signup-page')
+@main.route('/signup-page')
 def signup_page():
     """Serve the signup page only"""
     try:
@@ -366,7 +701,7 @@ def signup_page():
         logger.error(f"Error serving signup page: {e}")
         return "Error loading signup page.", 500
 
-@app.route('/about')
+@main.route('/about')
 def about_page():
     """Serve the about us page"""
     try:
@@ -376,26 +711,24 @@ def about_page():
         logger.error(f"Error serving about page: {e}")
         return "Error loading about page.", 500
 
-@app.route('/profile-setup')
+@main.route('/profile-setup')
 def profile_setup():
     """Serve the profile setup page"""
     try:
-        logger.info(f"Profile setup accessed. Session: {dict(session)}")
-        
         # Check if user is logged in
         if 'user_id' not in session:
             logger.warning("Unauthorized access to profile setup - redirecting to login")
             flash('Please login to access profile setup', 'error')
             return redirect('/login-page')
         
-        logger.info(f"Profile setup page served successfully")
+        logger.info("Profile setup page served successfully")
         return render_template('profile_setup.html')
         
     except Exception as e:
         logger.error(f"Error serving profile setup page: {e}")
         return f"Error loading profile setup page: {e}", 500
 
-@app.route('/complete-profile', methods=['POST'])
+@main.route('/complete-profile', methods=['POST'])
 def complete_profile():
     """Handle profile completion form submission"""
     try:
@@ -415,26 +748,28 @@ def complete_profile():
             flash('❌ Please fill in your name and farm location', 'error')
             return redirect('/profile-setup')
         
-        # Update user profile in database
+        # Update user profile in database, with a new version so every worker reloads it
         user_id = session['user_id']
-        users_collection.update_one(
-            {'_id': ObjectId(user_id)},
-            {
-                '$set': {
-                    'profile.name': name,
-                    'profile.location': location,
-                    'profile.bio': bio or '',
-                    'profile_completed': True
-                }
-            }
-        )
-        
-        # Update session
-        session['profile'] = {
+        profile = {
             'name': name,
             'location': location,
+            'location_point': gazetteer.locate(location),
             'bio': bio or ''
         }
+        profile_version = uuid.uuid4().hex[:12]
+        users_repository.update(user_id, dict(
+            {f'profile.{field}': value for field, value in profile.items()},
+            profile_completed=True,
+            profile_version=profile_version
+        ))
+        
+        # Update session
+        session['profile_version'] = profile_version
+        profile_cache.put(user_id, profile_version, profile)
+        
+        # Refresh the seller details copied onto this user's crop listings
+        seller_snapshots.queue(session.get('email'),
+                               seller_snapshot(profile, session.get('phone', ''), session.get('email', '')))
         
         # Add JavaScript to store user data in sessionStorage
         flash('🎉 Profile completed successfully! Welcome to CropMarket!', 'success')
@@ -449,40 +784,26 @@ def complete_profile():
         flash('❌ An error occurred. Please try again.', 'error')
         return redirect('/profile-setup')
 
-@app.route('/booking')
+@main.route('/booking')
 def booking_page():
     """Serve the booking page"""
     try:
-        logger.info(f"Booking page accessed. Session: {dict(session)}")
-        logger.info(f"Request method: {request.method}")
-        logger.info(f"Request URL: {request.url}")
-        
         # Check if user is logged in
         if 'user_id' not in session:
             logger.warning("Unauthorized access to booking page - redirecting to login")
             flash('Please login to access the booking page', 'error')
             return redirect('/login-page')
         
-        # Get user data from session
-        user_email = session.get('email', 'user@example.com')
-        user_phone = session.get('phone', '')
-        profile = session.get('profile', {})
-        user_name = profile.get('name', user_email.split('@')[0])
-        user_location = profile.get('location', '')
-        user_bio = profile.get('bio', '')
-        
-        logger.info(f"Serving booking page for user: {user_name}")
-        return render_template('booking.html', 
-                             user_email=user_email,
-                             user_phone=user_phone,
-                             user_name=user_name,
-                             user_location=user_location,
-                             user_bio=user_bio)
+        # Get user data from the session and profile cache
+        user = current_user()
+        
+        logger.info("Serving booking page for user: %s", user['user_name'])
+        return render_template('booking.html', **user)
     except Exception as e:
         logger.error(f"Error serving booking page: {e}")
         return "Error loading booking page.", 500
 
-@app.route('/sell')
+@main.route('/sell')
 def sell_page():
     """Sell crops page"""
     try:
@@ -492,64 +813,53 @@ def sell_page():
             flash('Please login to access the sell page', 'error')
             return redirect('/login-page')
         
-        # Get user data from session
-        user_email = session.get('email', 'user@example.com')
-        user_phone = session.get('phone', '')
-        profile = session.get('profile', {})
-        user_name = profile.get('name', user_email.split('@')[0])
-        user_location = profile.get('location', '')
-        user_bio = profile.get('bio', '')
+        # Get user data from the session and profile cache
+        user = current_user()
+        user_email, user_name = user['user_email'], user['user_name']
         
-        # Get user's own crop listings
-        user_crops = get_user_crops(user_email)
+        # Get user's own crop listings (cached until the crops change)
+        listing_cards, crops_count = render_cards(
+            'crops', 'partials/sell_cards.html', 'listing_card',
+            lambda: get_user_crops(user_email),
+            key_extra=(user_email,)
+        )
         
-        logger.info(f"Serving sell page for user: {user_name}")
+        logger.info("Serving sell page for user: %s", user_name)
         return render_template('sell.html', 
-                             user_email=user_email,
-                             user_phone=user_phone,
-                             user_name=user_name,
-                             user_location=user_location,
-                             user_bio=user_bio,
-                             user_crops=user_crops)
+                             **user,
+                             listing_cards=listing_cards,
+                             crops_count=crops_count)
     except Exception as e:
         logger.error(f"Error serving sell page: {e}")
         return "Error loading sell page.", 500
 
-@app.route('/market')
+@main.route('/market')
 def market_page():
     """Market updates page - accessible without login"""
     try:
         # Market page is accessible to everyone (no login required)
         # Get user data from session if available (optional)
-        user_email = session.get('email', '')
-        user_phone = session.get('phone', '')
-        profile = session.get('profile', {})
-        # Get user name from profile, or use email prefix, or 'Guest'
-        if user_email:
-            user_name = profile.get('name', '') if profile else ''
-            if not user_name or user_name == '':
-                user_name = user_email.split('@')[0]
-        else:
-            user_name = 'Guest'
-        user_location = profile.get('location', '') if profile else ''
-        user_bio = profile.get('bio', '') if profile else ''
-        
-        # Get market updates from database
-        market_updates = get_market_updates()
+        # User name from the profile, or the email prefix, or 'Guest'
+        user = current_user(default_email='')
+        user_email, user_name = user['user_email'], user['user_name']
+        
+        # Get market updates from database (cached until the updates change)
+        update_cards, updates_count = render_cards(
+            'market_updates', 'partials/market_cards.html', 'update_card',
+            get_market_updates,
+            owner_field='author_email', viewer_email=user_email
+        )
         
-        logger.info(f"Serving market page for user: {user_name} (email: {user_email})")
+        logger.info("Serving market page for user: %s (email: %s)", user_name, user_email)
         return render_template('market.html', 
-                             user_email=user_email,
-                             user_phone=user_phone,
-                             user_name=user_name,
-                             user_location=user_location,
-                             user_bio=user_bio,
-                             market_updates=market_updates)
+                             **user,
+                             update_cards=update_cards,
+                             updates_count=updates_count)
     except Exception as e:
         logger.error(f"Error serving market page: {e}")
         return "Error loading market page.", 500
 
-@app.route('/orders')
+@main.route('/orders')
 def orders_page():
     """My Orders page - shows user's purchase history"""
     try:
@@ -559,26 +869,28 @@ def orders_page():
             flash('Please login to access your orders', 'error')
             return redirect('/login-page')
         
-        # Get user data from session
-        user_email = session.get('email', 'user@example.com')
-        user_phone = session.get('phone', '')
-        profile = session.get('profile', {})
-        user_name = profile.get('name', user_email.split('@')[0])
-        user_location = profile.get('location', '')
-        user_bio = profile.get('bio', '')
+        # Get user data from the session and profile cache
+        user = current_user()
+        user_email, user_name = user['user_email'], user['user_name']
         
         # Get user's orders from payments collection
-        payments_collection = db.payments
-        orders = list(payments_collection.find({
-            'user_email': user_email,
-            'status': 'success'
-        }).sort("created_at", -1))
+        orders = payments_repository.successful_for(user_email)
+        
+        # Orders placed since seller snapshots were added carry their crop and seller details;
+        # older ones are enriched from their listings (which carry the seller snapshot) in one query
+        crops_by_id = {}
+        missing_crop_ids = [order['crop_id'] for order in orders if order.get('crop_id') and 'crop_details' not in order]
+        if missing_crop_ids:
+            try:
+                crops_by_id = {crop['_id']: crop for crop in crops_repository.by_ids(missing_crop_ids)}
+            except Exception as e:
+                logger.error(f"Error fetching crop details for orders: {e}")
         
         # Enrich orders with crop and seller details
         enriched_orders = []
         for order in orders:
             order_dict = {
-                '_id': str(order['_id']),
+                '_id': order['_id'],
                 'payment_id': order.get('payment_id', ''),
                 'order_id': order.get('order_id', ''),
                 'amount': order.get('amount', 0),
@@ -588,47 +900,23 @@ def orders_page():
                 'quantity_purchased': order.get('quantity_purchased', 0)
             }
             
-            # Get crop details if crop_id exists
-            if order.get('crop_id'):
-                try:
-                    from bson import ObjectId
-                    crop = crops_collection.find_one({"_id": ObjectId(order['crop_id'])})
-                    if crop:
-                        # Get seller details
-                        seller_email = crop.get('seller_email', '')
-                        seller = users_collection.find_one({'email': seller_email})
-                        
-                        order_dict['crop_details'] = {
-                            'name': crop.get('name', 'Unknown'),
-                            'category': crop.get('category', ''),
-                            'price_per_kg': crop.get('price_per_kg', 0),
-                            'location': crop.get('location', '')
-                        }
-                        
-                        order_dict['seller_details'] = {
-                            'name': crop.get('seller_name', 'Unknown Seller'),
-                            'email': seller_email,
-                            'phone': crop.get('seller_phone', ''),
-                            'location': seller.get('profile', {}).get('location', '') if seller else ''
-                        }
-                except Exception as e:
-                    logger.error(f"Error fetching crop details for order: {e}")
+            if order.get('crop_details'):
+                order_dict['crop_details'] = order['crop_details']
+                order_dict['seller_details'] = order.get('seller_details', {})
+            elif order.get('crop_id') in crops_by_id:
+                order_dict.update(crop_order_details(crops_by_id[order['crop_id']]))
             
             enriched_orders.append(order_dict)
         
-        logger.info(f"Serving orders page for user: {user_name} ({len(enriched_orders)} orders)")
+        logger.info("Serving orders page for user: %s (%d orders)", user_name, len(enriched_orders))
         return render_template('orders.html', 
-                             user_email=user_email,
-                             user_phone=user_phone,
-                             user_name=user_name,
-                             user_location=user_location,
-                             user_bio=user_bio,
+                             **user,
                              orders=enriched_orders)
     except Exception as e:
         logger.error(f"Error serving orders page: {e}")
         return "Error loading orders page.", 500
 
-@app.route('/buy')
+@main.route('/buy')
 def buy_page():
     """Buy crops page"""
     try:
@@ -638,13 +926,9 @@ def buy_page():
             flash('Please login to access the buy page', 'error')
             return redirect('/login-page')
         
-        # Get user data from session
-        user_email = session.get('email', 'user@example.com')
-        user_phone = session.get('phone', '')
-        profile = session.get('profile', {})
-        user_name = profile.get('name', user_email.split('@')[0])
-        user_location = profile.get('location', '')
-        user_bio = profile.get('bio', '')
+        # Get user data from the session and profile cache
+        user = current_user()
+        user_email, user_name, user_location = user['user_email'], user['user_name'], user['user_location']
         
         # Get crops from database with filters
         filters = {}
@@ -662,42 +946,60 @@ def buy_page():
         if price_max is not None:
             filters['price_max'] = price_max
         
-        crops = get_crops(filters)
+        # Crops within radius_km of 'near' (default: the buyer's own location), nearest first
+        radius_km = request.args.get('radius_km', type=float)
+        near = request.args.get('near') or (user_location if radius_km else None)
+        if near:
+            try:
+                filters.update(location_search_filters(near, radius_km))
+            except ValueError as e:
+                flash(f'❌ {e}', 'error')
+        
+        # Render crop cards (cached per filter until the crops or price bands change)
+        bands = current_price_bands()
+        crop_cards, crops_count = render_cards(
+            'crops', 'partials/buy_cards.html', 'crop_card',
+            lambda: bands.annotate(get_crops(filters)),
+            owner_field='seller_email', viewer_email=user_email,
+            key_extra=tuple(sorted((key, str(value)) for key, value in filters.items())) + (('price_bands', bands.version),)
+        )
         
-        logger.info(f"Serving buy page for user: {user_name}")
+        logger.info("Serving buy page for user: %s", user_name)
         return render_template('buy.html', 
-                             user_email=user_email,
-                             user_phone=user_phone,
-                             user_name=user_name,
-                             user_location=user_location,
-                             user_bio=user_bio,
-                             crops=crops)
+                             **user,
+                             crop_cards=crop_cards,
+                             crops_count=crops_count,
+                             radius_km=radius_km)
     except Exception as e:
         logger.error(f"Error serving buy page: {e}")
         return "Error loading buy page.", 500
 
-@app.route('/test-booking')
+@main.route('/test-booking')
 def test_booking():
     """Test route to check if booking page works"""
     return "Booking page test - this should work!"
 
-@app.route('/debug-session')
+@main.route('/debug-session')
 def debug_session():
     """Debug route to check session data"""
     return f"Session data: {dict(session)}"
 
 # Market Updates API Routes
-@app.route('/api/market-updates', methods=['GET'])
+@main.route('/api/market-updates', methods=['GET'])
 def api_get_market_updates():
     """Get all market updates"""
     try:
-        updates = get_market_updates()
-        return jsonify({"success": True, "updates": updates})
+        # Answer 304 from the data version without querying when the client copy is current
+        last_modified = data_versions.info('market_updates')[1]
+        return conditional_response(
+            version_etag('market_updates', catalog_version('market_updates')), last_modified,
+            lambda: jsonify({"success": True, "updates": get_market_updates()})
+        )
     except Exception as e:
         logger.error(f"Error getting market updates: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/market-updates', methods=['POST'])
+@main.route('/api/market-updates', methods=['POST'])
 def api_add_market_update():
     """Add a new market update"""
     try:
@@ -711,7 +1013,7 @@ def api_add_market_update():
         
         # Get user info from session
         user_email = session.get('email', 'anonymous@example.com')
-        user_name = session.get('profile', {}).get('name', user_email.split('@')[0])
+        user_name = current_profile().get('name') or user_email.split('@')[0]
         
         # Create update data
         update_data = {
@@ -738,7 +1040,7 @@ def api_add_market_update():
         logger.error(f"Error adding market update: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/market-updates/<update_id>', methods=['PUT'])
+@main.route('/api/market-updates/<update_id>', methods=['PUT'])
 def api_update_market_update(update_id):
     """Update a market update"""
     try:
@@ -748,8 +1050,7 @@ def api_update_market_update(update_id):
         user_email = session.get('email', 'anonymous@example.com')
         
         # Check if user is the author
-        from bson import ObjectId
-        update = market_updates_collection.find_one({"_id": ObjectId(update_id)})
+        update = market_updates_repository.get(update_id)
         if not update:
             return jsonify({"success": False, "error": "Market update not found"}), 404
         
@@ -777,7 +1078,7 @@ def api_update_market_update(update_id):
         logger.error(f"Error updating market update: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/market-updates/<update_id>', methods=['DELETE'])
+@main.route('/api/market-updates/<update_id>', methods=['DELETE'])
 def api_delete_market_update(update_id):
     """Delete a market update"""
     try:
@@ -785,8 +1086,7 @@ def api_delete_market_update(update_id):
         user_email = session.get('email', 'anonymous@example.com')
         
         # Check if user is the author
-        from bson import ObjectId
-        update = market_updates_collection.find_one({"_id": ObjectId(update_id)})
+        update = market_updates_repository.get(update_id)
         if not update:
             return jsonify({"success": False, "error": "Market update not found"}), 404
         
@@ -805,7 +1105,7 @@ def api_delete_market_update(update_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 # Crops API Routes
-@app.route('/api/crops', methods=['GET'])
+@main.route('/api/crops', methods=['GET'])
 def api_get_crops():
     """Get all crops with optional filters"""
     try:
@@ -825,18 +1125,31 @@ def api_get_crops():
         if price_max is not None:
             filters['price_max'] = price_max
         
-        crops = get_crops(filters)
-        return jsonify({"success": True, "crops": crops})
+        # Nearest-first search around a place name or 'lat,lon', optionally within radius_km
+        near = request.args.get('near')
+        radius_km = request.args.get('radius_km', type=float)
+        if near:
+            try:
+                filters.update(location_search_filters(near, radius_km))
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+        
+        # Answer 304 from the data version without querying when the client copy is current
+        last_modified = data_versions.info('crops')[1]
+        return conditional_response(
+            version_etag('crops', catalog_version('crops')), last_modified,
+            lambda: jsonify({"success": True, "crops": get_crops(filters)})
+        )
     except Exception as e:
         logger.error(f"Error getting crops: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/crops', methods=['POST'])
+@main.route('/api/crops', methods=['POST'])
 def api_add_crop():
     """Add a new crop listing"""
     try:
         data = request.get_json()
-        logger.info(f"Received crop data: {data}")
+        logger.debug("Received crop data: %s", data)
         
         # Validate required fields
         required_fields = ['name', 'category', 'quantity', 'price_per_kg', 'location', 'description']
@@ -847,7 +1160,8 @@ def api_add_crop():
         
         # Get user info from session
         user_email = session.get('email', 'anonymous@example.com')
-        user_name = session.get('profile', {}).get('name', user_email.split('@')[0])
+        profile = current_profile()
+        user_name = profile.get('name') or user_email.split('@')[0]
         
         # Create crop data
         crop_data = {
@@ -861,8 +1175,10 @@ def api_add_crop():
             'seller_name': user_name,
             'seller_email': user_email,
             'seller_phone': session.get('phone', ''),
+            'seller_location': profile.get('location', ''),
             'is_active': True,
-            'created_at': datetime.utcnow()
+            'created_at': datetime.utcnow(),
+            'location_point': gazetteer.locate(data['location'])
         }
         
         # Add to database
@@ -878,7 +1194,87 @@ def api_add_crop():
         logger.error(f"Error adding crop: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/crops/<crop_id>', methods=['PUT'])
+@main.route('/api/crops/bulk', methods=['POST'])
+def api_bulk_crops():
+    """Create and update many crop listings from a JSON array or CSV upload"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({"success": False, "error": "Please login to import crop listings"}), 401
+        
+        # JSON: a list of rows or {"crops": [...]}; CSV: a 'file' upload or a text/csv body
+        if request.is_json:
+            data = request.get_json()
+            rows = data.get('crops') if isinstance(data, dict) else data
+        elif 'file' in request.files:
+            rows = rows_from_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            rows = rows_from_csv(request.get_data(as_text=True))
+        else:
+            return jsonify({"success": False, "error": "Send a JSON array or a CSV file"}), 400
+        
+        if not isinstance(rows, list) or not rows:
+            return jsonify({"success": False, "error": "No crop listings to import"}), 400
+        if len(rows) > CROP_IMPORT_MAX_ROWS:
+            return jsonify({"success": False, "error": f"Too many rows: at most {CROP_IMPORT_MAX_ROWS} per request"}), 413
+        
+        user_email = session.get('email', 'anonymous@example.com')
+        profile = current_profile()
+        seller = {
+            'seller_name': profile.get('name') or user_email.split('@')[0],
+            'seller_email': user_email,
+            'seller_phone': session.get('phone', ''),
+            'seller_location': profile.get('location', ''),
+        }
+        
+        with bulk_timeout():
+            results, summary = import_crops(crops_repository, rows, seller, on_created=record_listings,
+                                            locate=gazetteer.locate)
+        if summary['created'] or summary['updated']:
+            bump_data_version('crops')
+            publish_imported_crops(results)
+        logger.info(f"Bulk crop import by {user_email}: {summary}")
+        
+        return jsonify({"success": summary['errors'] == 0, "summary": summary, "results": results})
+    except UnicodeDecodeError:
+        return jsonify({"success": False, "error": "CSV file must be UTF-8 encoded"}), 400
+    except Exception as e:
+        logger.error(f"Error importing crops: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def publish_imported_crops(results):
+    """Push the listings a bulk import created or updated, read back once for their current fields"""
+    if crop_feed.streaming:
+        return
+    statuses = {result['id']: result['status'] for result in results if result['status'] in ('created', 'updated')}
+    try:
+        for crop in crops_repository.list({'_id': {'$in': [as_object_id(crop_id) for crop_id in statuses]}},
+                                          CROP_PROJECTION):
+            fields = crop_record(crop)
+            event_type = 'new' if statuses[crop['_id']] == 'created' else change_type(fields)
+            publish_crop_change(event_type, crop['_id'], fields)
+    except Exception as e:
+        logger.error(f"Error publishing imported crops: {e}")
+
+@main.route('/api/crops/stream', methods=['GET'])
+def api_crop_stream():
+    """
+    Server-Sent Events stream of listing changes ('crop' events carrying {type, crop_id, fields}
+    with type new, updated, sold_out or removed). A 'reset' event means the client missed
+    changes and should reload the list once.
+    """
+    if not crop_feed.try_connect():
+        response = jsonify({"success": False, "error": "Too many live connections, try again shortly"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(crop_feed.stream(last_event_id), mimetype='text/event-stream')
+    response.call_on_close(crop_feed.disconnect)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+@main.route('/api/crops/<crop_id>', methods=['PUT'])
 def api_update_crop(crop_id):
     """Update a crop listing"""
     try:
@@ -888,8 +1284,7 @@ def api_update_crop(crop_id):
         user_email = session.get('email', 'anonymous@example.com')
         
         # Check if user is the seller
-        from bson import ObjectId
-        crop = crops_collection.find_one({"_id": ObjectId(crop_id)})
+        crop = crops_repository.get(crop_id)
         if not crop:
             return jsonify({"success": False, "error": "Crop listing not found"}), 404
         
@@ -908,6 +1303,7 @@ def api_update_crop(crop_id):
             update_data['price_per_kg'] = float(data['price_per_kg'])
         if 'location' in data:
             update_data['location'] = data['location']
+            update_data['location_point'] = gazetteer.locate(data['location'])
         if 'description' in data:
             update_data['description'] = data['description']
         if 'is_active' in data:
@@ -932,7 +1328,7 @@ def api_update_crop(crop_id):
         logger.error(f"Error updating crop: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/crops/<crop_id>', methods=['DELETE'])
+@main.route('/api/crops/<crop_id>', methods=['DELETE'])
 def api_delete_crop(crop_id):
     """Delete a crop listing"""
     try:
@@ -940,8 +1336,7 @@ def api_delete_crop(crop_id):
         user_email = session.get('email', 'anonymous@example.com')
         
         # Check if user is the seller
-        from bson import ObjectId
-        crop = crops_collection.find_one({"_id": ObjectId(crop_id)})
+        crop = crops_repository.get(crop_id)
         if not crop:
             return jsonify({"success": False, "error": "Crop listing not found"}), 404
         
@@ -959,12 +1354,13 @@ def api_delete_crop(crop_id):
         logger.error(f"Error deleting crop: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/test-booking-simple')
+@main.route('/test-booking-simple')
 def test_booking_simple():
     """Simple test route for booking page without auth"""
     return "Booking page test - accessible without auth"
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -972,42 +1368,49 @@ def login():
         
         if not email or not password:
             flash('Please fill in all fields', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # Find user in database by email
-        user = users_collection.find_one({'email': email})
+        user = users_repository.by_email(email)
         
         if user:
-            logger.info(f"User found: {email}")
-            logger.info(f"Stored password hash: {user['password'][:20]}...")
-            logger.info(f"Provided password: {password}")
-            
-            password_match = check_password_hash(user['password'], password)
-            logger.info(f"Password match: {password_match}")
+            try:
+                with password_timer('verify'):
+                    password_match = password_hasher.verify(user['password'], password)
+            except HasherBusy:
+                metrics.inc('farming_logins_total', (('result', 'busy'),))
+                logger.warning("Login for %s shed: password hashing is saturated", email)
+                return rejected_response(503, "The server is busy. Please try again in a few seconds.",
+                                         ADMISSION_RETRY_AFTER, 'main.index')
+            except Exception as e:
+                metrics.inc('farming_logins_total', (('result', 'error'),))
+                logger.error(f"Password check failed for {email}: {e}")
+                flash('❌ Login failed. Please try again.', 'error')
+                return redirect(url_for('main.index'))
             
             if password_match:
-                session['user_id'] = str(user['_id'])
-                session['email'] = user['email']
-                session['phone'] = user.get('phone', '')
-                session['username'] = user.get('username', user['email'])
-                session['profile'] = user.get('profile', {})
+                metrics.inc('farming_logins_total', (('result', 'success'),))
+                rehash_password(user, password)
+                start_user_session(str(user['_id']), user)
                 flash('🎉 Login successful! Welcome back!', 'success')
-                logger.info(f"✅ User {email} logged in successfully, redirecting to booking page")
-                logger.info(f"Session data: {dict(session)}")
+                logger.info("User %s logged in", email)
                 # Use direct URL redirect to booking page
                 return redirect('/booking')
             else:
+                metrics.inc('farming_logins_total', (('result', 'invalid_password'),))
                 flash('❌ Invalid password. Please check your password and try again.', 'error')
-                logger.warning(f"Password mismatch for user: {email}")
-                return redirect(url_for('index'))
+                logger.warning("Password mismatch for user: %s", email)
+                return redirect(url_for('main.index'))
         else:
+            metrics.inc('farming_logins_total', (('result', 'unknown_user'),))
             flash('❌ User not found. Please check your email or sign up for a new account.', 'error')
-            logger.warning(f"User not found: {email}")
-            return redirect(url_for('index'))
+            logger.warning("User not found: %s", email)
+            return redirect(url_for('main.index'))
     
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/signup', methods=['POST'])
+@main.route('/signup', methods=['POST'])
+@rate_limited('signup', redirect_endpoint='main.signup_page')
 def signup():
     email = request.form.get('email')
     phone = request.form.get('phone')
@@ -1020,36 +1423,31 @@ def signup():
     if not all([email, phone, password, confirm_password]):
         flash('Please fill in all fields', 'error')
         logger.warning("Signup failed: Missing fields")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     if not validate_email(email):
         flash('❌ Please enter a valid email address (e.g., user@example.com)', 'error')
         logger.warning(f"Signup failed: Invalid email: {email}")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     if not validate_phone(phone):
         flash('❌ Please enter a valid 10-digit phone number (e.g., 9876543210)', 'error')
         logger.warning(f"Signup failed: Invalid phone: {phone}")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     if password != confirm_password:
         flash('❌ Passwords do not match. Please make sure both password fields are identical.', 'error')
         logger.warning(f"Signup failed: Password mismatch for email: {email}")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     is_valid_password, password_error = validate_password(password)
     if not is_valid_password:
         flash(f'❌ {password_error}', 'error')
         logger.warning(f"Signup failed: {password_error} for email: {email}")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     # Check if user already exists
-    existing_user = users_collection.find_one({
-        '$or': [
-            {'email': email},
-            {'phone': phone}
-        ]
-    })
+    existing_user = users_repository.by_email_or_phone(email, phone)
     
     if existing_user:
         if existing_user['email'] == email:
@@ -1057,18 +1455,23 @@ def signup():
         else:
             flash('❌ This phone number is already registered. Please use a different phone number.', 'error')
         logger.warning(f"Signup failed: User already exists - email: {email}, phone: {phone}")
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
     
     # Create new user
     try:
-        hashed_password = generate_password_hash(password)
+        try:
+            with password_timer('hash'):
+                hashed_password = password_hasher.hash(password)
+        except HasherBusy:
+            logger.warning("Signup for %s shed: password hashing is saturated", email)
+            return rejected_response(503, "The server is busy. Please try again in a few seconds.",
+                                     ADMISSION_RETRY_AFTER, 'main.signup_page')
         logger.info(f"Creating user: {email}")
-        logger.info(f"Hashed password: {hashed_password[:20]}...")
         
         # Generate a unique username if email is already taken as username
         username = email
         counter = 1
-        while users_collection.find_one({'username': username}):
+        while users_repository.username_taken(username):
             username = f"{email}_{counter}"
             counter += 1
         
@@ -1087,21 +1490,17 @@ def signup():
             }
         }
         
-        result = users_collection.insert_one(user_data)
-        if result.inserted_id:
+        user_id = users_repository.insert(user_data)
+        if user_id:
             # Store user info in session for profile completion
-            session['user_id'] = str(result.inserted_id)
-            session['email'] = email
-            session['phone'] = phone
-            session['username'] = username
-            session['profile'] = user_data['profile']
+            start_user_session(user_id, user_data)
             flash('🎉 Account created successfully! Please complete your profile.', 'success')
             logger.info(f"✅ New user registered successfully: {email} ({phone})")
             return redirect('/profile-setup')
         else:
             flash('❌ Failed to create account. Please try again.', 'error')
             logger.error(f"❌ Failed to create account for: {email}")
-            return redirect(url_for('signup_page'))
+            return redirect(url_for('main.signup_page'))
             
     except Exception as e:
         error_msg = str(e)
@@ -1119,25 +1518,22 @@ def signup():
         else:
             flash('❌ An error occurred while creating your account. Please try again.', 'error')
         
-        return redirect(url_for('signup_page'))
+        return redirect(url_for('main.signup_page'))
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
         flash('Please login to access the dashboard', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # Update last login time
-    users_collection.update_one(
-        {'_id': session['user_id']},
-        {'$set': {'last_login': datetime.utcnow()}}
-    )
+    users_repository.update(session['user_id'], {'last_login': datetime.utcnow()})
     
     # Redirect to booking page after successful login
     logger.info(f"User {session.get('username', 'Unknown')} logged in - redirecting to booking page")
-    return redirect(url_for('booking_page'))
+    return redirect(url_for('main.booking_page'))
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     username = session.get('username', 'Unknown')
     logger.info(f"User {username} is logging out")
@@ -1149,23 +1545,24 @@ def logout():
     flash('👋 You have been successfully logged out!', 'success')
     
     logger.info(f"✅ User {username} logged out successfully")
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/api/users')
+@main.route('/api/users')
 def api_users():
     """API endpoint to get all users (for testing)"""
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    users = list(users_collection.find({}, {'password': 0}))
-    for user in users:
-        user['_id'] = str(user['_id'])
-        if user.get('created_at'):
-            user['created_at'] = user['created_at'].isoformat()
-        if user.get('last_login'):
-            user['last_login'] = user['last_login'].isoformat()
+    def iso_dates(users):
+        for user in users:
+            if user.get('created_at'):
+                user['created_at'] = user['created_at'].isoformat()
+            if user.get('last_login'):
+                user['last_login'] = user['last_login'].isoformat()
+            yield user
     
-    return jsonify(users)
+    # Stream the array so memory use doesn't grow with the number of users
+    return stream_json_array(iso_dates(users_repository.without_passwords()), current_app.json)
 
 def detect_language(text):
     """
@@ -1435,7 +1832,8 @@ def remove_repetitive_content(text):
     return cleaned_text
 
 # Chatbot API Route with Chain-of-Thought Reasoning
-@app.route('/api/chatbot', methods=['POST'])
+@main.route('/api/chatbot', methods=['POST'])
+@rate_limited('chatbot')
 def api_chatbot():
     """Chatbot endpoint using local LLM with chain-of-thought reasoning"""
     try:
@@ -1483,7 +1881,7 @@ def api_chatbot():
         
         # Detect language BEFORE processing with LLM
         detected_lang = detect_language(user_message)
-        logger.info(f"Detected language for message '{user_message[:50]}...': {detected_lang}")
+        logger.debug("Detected language for message '%.50s...': %s", user_message, detected_lang)
         
         # Get system prompt with language-specific instructions
         system_prompt = get_system_prompt(detected_lang)
@@ -1499,6 +1897,12 @@ def api_chatbot():
                 if crop_names:
                     context_info = f"\n\nNote: The platform currently has listings for: {', '.join(crop_names[:5])}. "
                     context_info += "When users ask about specific crops, you can mention checking the Buy Crops page for current listings."
+            typical_prices = [
+                f"{band['crop']} ₹{band['p25']:g}-{band['p75']:g}/kg (median ₹{band['median']:g})"
+                for band in current_price_bands().summary()
+            ]
+            if typical_prices:
+                context_info += f"\nTypical asking prices on the platform: {'; '.join(typical_prices)}."
         except:
             pass  # If database query fails, continue without context
         
@@ -1537,17 +1941,20 @@ def api_chatbot():
         model_name = os.getenv('OLLAMA_MODEL', 'llama3.2')
         
         try:
+            import ollama  # Imported on first use; slow to import and optional
+            
             # Call Ollama with chain-of-thought reasoning and full conversation history
-            response = ollama.chat(
-                model=model_name,
-                messages=messages,
-                options={
-                    'temperature': 0.7,  # Slightly higher for more detailed, comprehensive responses
-                    'top_p': 0.9,
-                    'num_predict': 2000,  # Increased limit for detailed, comprehensive responses
-                    'repeat_penalty': 1.2  # Penalty for repetition (higher = less repetition)
-                }
-            )
+            with metrics.external_call('ollama', 'chat'):
+                response = ollama.chat(
+                    model=model_name,
+                    messages=messages,
+                    options={
+                        'temperature': 0.7,  # Slightly higher for more detailed, comprehensive responses
+                        'top_p': 0.9,
+                        'num_predict': 2000,  # Increased limit for detailed, comprehensive responses
+                        'repeat_penalty': 1.2  # Penalty for repetition (higher = less repetition)
+                    }
+                )
             
             bot_response = response['message']['content'].strip()
             
@@ -1600,7 +2007,7 @@ def api_chatbot():
             if len(chatbot_sessions[session_id]) > 50:
                 chatbot_sessions[session_id] = chatbot_sessions[session_id][-50:]
             
-            logger.info(f"Chatbot response generated successfully for session: {session_id}")
+            logger.info("Chatbot response generated successfully for session: %s", session_id)
             return jsonify({
                 "success": True,
                 "response": bot_response,
@@ -1634,10 +2041,11 @@ def api_chatbot():
         }), 500
 
 # Razorpay Payment API Routes
-@app.route('/api/payment/create-order', methods=['POST'])
+@main.route('/api/payment/create-order', methods=['POST'])
 def create_payment_order():
     """Create a Razorpay payment order"""
     try:
+        razorpay_client = get_razorpay_client()
         if not razorpay_client:
             return jsonify({
                 "success": False,
@@ -1675,7 +2083,8 @@ def create_payment_order():
             }
         }
         
-        order = razorpay_client.order.create(data=order_data)
+        with metrics.external_call('razorpay', 'create_order'):
+            order = razorpay_client.order.create(data=order_data)
         
         logger.info(f"Payment order created: {order['id']} for amount {amount} paise")
         
@@ -1696,15 +2105,17 @@ def create_payment_order():
             "error": str(e)
         }), 500
 
-@app.route('/api/payment/verify', methods=['POST'])
+@main.route('/api/payment/verify', methods=['POST'])
 def verify_payment():
     """Verify Razorpay payment signature"""
     try:
+        razorpay_client = get_razorpay_client()
         if not razorpay_client:
             return jsonify({
                 "success": False,
                 "error": "Razorpay is not configured"
             }), 503
+        import razorpay  # Already imported by get_razorpay_client()
         
         data = request.get_json()
         razorpay_order_id = data.get('razorpay_order_id')
@@ -1725,7 +2136,8 @@ def verify_payment():
         }
         
         try:
-            razorpay_client.utility.verify_payment_signature(params_dict)
+            with metrics.external_call('razorpay', 'verify_signature'):
+                razorpay_client.utility.verify_payment_signature(params_dict)
             
             # Payment verified successfully
             # Store payment in database
@@ -1752,8 +2164,7 @@ def verify_payment():
             # Update crop quantity if this is a crop purchase
             if crop_id and quantity_purchased:
                 try:
-                    from bson import ObjectId
-                    crop = crops_collection.find_one({"_id": ObjectId(crop_id)})
+                    crop = crops_repository.get(crop_id)
                     
                     if crop:
                         current_quantity = crop.get('quantity', 0)
@@ -1762,6 +2173,7 @@ def verify_payment():
                         # Update crop quantity
                         update_data = {
                             'quantity': new_quantity,
+                            'total_price': new_quantity * crop.get('price_per_kg', 0),
                             'updated_at': datetime.utcnow()
                         }
                         
@@ -1771,10 +2183,10 @@ def verify_payment():
                             crop_sold_out = True
                             logger.info(f"Crop {crop_id} marked as sold out (quantity: {new_quantity})")
                         
-                        crops_collection.update_one(
-                            {"_id": ObjectId(crop_id)},
-                            {"$set": update_data}
-                        )
+                        crops_repository.update(crop_id, update_data)
+                        bump_data_version('crops')
+                        publish_crop_change(change_type(update_data), crop_id, update_data)
+                        record_sale(crop, quantity_purchased, amount_rupees)
                         
                         logger.info(f"Updated crop {crop_id}: quantity {current_quantity} -> {new_quantity}")
                         
@@ -1782,15 +2194,14 @@ def verify_payment():
                         payment_data['crop_id'] = crop_id
                         payment_data['crop_name'] = data.get('crop_name', crop.get('name', ''))
                         payment_data['quantity_purchased'] = quantity_purchased
+                        payment_data.update(crop_order_details(crop))
                     else:
                         logger.warning(f"Crop {crop_id} not found for payment update")
                 except Exception as crop_error:
                     logger.error(f"Error updating crop quantity: {crop_error}")
                     # Don't fail payment if crop update fails
             
-            # Create payments collection if it doesn't exist
-            payments_collection = db.payments
-            payments_collection.insert_one(payment_data)
+            payments_repository.insert(payment_data)
             
             logger.info(f"Payment verified successfully: {razorpay_payment_id}")
             
@@ -1815,9 +2226,48 @@ def verify_payment():
             "error": str(e)
         }), 500
 
+# ==================== ANALYTICS API ====================
+
+@main.route('/api/analytics/prices', methods=['GET'])
+def api_price_analytics():
+    """
+    Price and sales figures from the precomputed daily aggregates.
+    Query: crop, category, location (exact, case-insensitive), days (default 30),
+    group_by (day, crop, category or location; default day)
+    """
+    try:
+        crop = request.args.get('crop')
+        category = request.args.get('category')
+        location = request.args.get('location')
+        days = request.args.get('days', '30')
+        group_by = request.args.get('group_by', 'day')
+        
+        if not days.isdigit() or int(days) < 1:
+            return jsonify({"success": False, "error": "days must be a whole number of at least 1"}), 400
+        days = min(int(days), ANALYTICS_MAX_DAYS)
+        if group_by not in ('day', 'crop', 'category', 'location'):
+            return jsonify({"success": False, "error": f"Invalid group_by: {group_by}"}), 400
+        
+        last_modified = data_versions.info('price_stats')[1]
+        return conditional_response(
+            # The day is part of the ETag because the window moves at midnight
+            version_etag('price_stats', catalog_version('price_stats'), str(datetime.utcnow().date())),
+            last_modified,
+            lambda: jsonify({
+                "success": True,
+                "group_by": group_by,
+                "days": days,
+                "stats": market_analytics.prices(crop, category, location, days, group_by)
+            })
+        )
+    except Exception as e:
+        logger.error(f"Error getting price analytics: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 # ==================== STORIES API ====================
 
-@app.route('/api/stories/upload', methods=['POST'])
+@main.route('/api/stories/upload', methods=['POST'])
+@rate_limited('stories-upload')
 def upload_story():
     """Upload a story (image or video)"""
     try:
@@ -1834,20 +2284,16 @@ def upload_story():
         if not allowed_file(file.filename):
             return jsonify({"success": False, "error": "File type not allowed. Allowed: images (png, jpg, jpeg, gif) and videos (mp4, mov, avi, webm)"}), 400
         
-        # Generate unique filename
+        # Store file by content hash (duplicate uploads share one stored file)
         file_ext = file.filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        # Save file
-        file.save(filepath)
+        unique_filename = media_storage.save(file.stream, file_ext)
         
         # Determine media type
         media_type = 'video' if file_ext in ['mp4', 'mov', 'avi', 'webm'] else 'image'
         
         # Get user info
         user_email = session.get('email', '')
-        user_name = session.get('profile', {}).get('name', user_email.split('@')[0])
+        user_name = current_profile().get('name') or user_email.split('@')[0]
         user_id = session.get('user_id', '')
         
         # Create story document
@@ -1863,8 +2309,8 @@ def upload_story():
         }
         
         # Insert into database
-        result = stories_collection.insert_one(story_data)
-        story_data['_id'] = str(result.inserted_id)
+        story_data['_id'] = stories_repository.insert(story_data)
+        bump_data_version('stories')
         
         logger.info(f"Story uploaded by {user_email}: {unique_filename}")
         
@@ -1883,15 +2329,27 @@ def upload_story():
         logger.error(f"Error uploading story: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/stories', methods=['GET'])
+@main.route('/api/stories', methods=['GET'])
 def get_stories():
     """Get all active stories (not expired)"""
+    try:
+        # Stories also change as they expire, so the ETag rolls over every STORIES_ETAG_WINDOW seconds
+        version = catalog_version('stories')
+        expiry_window = int(time.time() // STORIES_ETAG_WINDOW)
+        return conditional_response(
+            version_etag('stories', version, expiry_window), None,
+            build_stories_response
+        )
+    except Exception as e:
+        logger.error(f"Error fetching stories: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def build_stories_response():
+    """Build the active stories response, grouped by user"""
     try:
         # Get all stories that haven't expired, grouped by user
         now = datetime.utcnow()
-        stories = list(stories_collection.find({
-            'expires_at': {'$gt': now}
-        }).sort("created_at", -1))
+        stories = stories_repository.active(now)
         
         # Group stories by user
         stories_by_user = {}
@@ -1925,55 +2383,230 @@ def get_stories():
         logger.error(f"Error fetching stories: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/uploads/stories/<filename>')
+@main.route('/uploads/stories/<filename>')
 def serve_story(filename):
     """Serve story files"""
     try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return media_storage.send(filename)
     except Exception as e:
         logger.error(f"Error serving story file: {e}")
         return "File not found", 404
 
 def cleanup_expired_stories():
     """Background job to delete expired stories"""
-    while True:
+    while not background_jobs_stop.is_set():
+        # Only one worker process per host runs the cleanup; the others retry every
+        # cycle so the job moves to another worker if the holder exits
+        if not story_cleanup_lock.try_acquire():
+            background_jobs_stop.wait(STORY_CLEANUP_INTERVAL)
+            continue
+        
         try:
             now = datetime.utcnow()
-            expired_stories = list(stories_collection.find({
-                'expires_at': {'$lte': now}
-            }))
+            expired_stories = stories_repository.expired(now)
             
             for story in expired_stories:
-                # Delete file from filesystem
+                # Delete from database
+                stories_repository.delete(story['_id'])
+                
+                # Delete file from storage unless another story shares the same content
                 filename = story.get('filename', '')
-                if filename:
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                if filename and not stories_repository.uses_file(filename):
                     try:
-                        if os.path.exists(filepath):
-                            os.remove(filepath)
+                        # A duplicate upload whose story is not inserted yet has just saved it again
+                        stored_at = media_storage.modified_at(filename)
+                        if stored_at and stored_at > datetime.utcnow() - STORY_FILE_GRACE:
+                            continue
+                        if media_storage.delete(filename):
                             logger.info(f"Deleted expired story file: {filename}")
                     except Exception as e:
                         logger.error(f"Error deleting story file {filename}: {e}")
-                
-                # Delete from database
-                stories_collection.delete_one({'_id': story['_id']})
             
             if expired_stories:
+                bump_data_version('stories')
                 logger.info(f"Cleaned up {len(expired_stories)} expired stories")
             
             # Run cleanup every hour
-            time.sleep(3600)
+            background_jobs_stop.wait(STORY_CLEANUP_INTERVAL)
             
         except Exception as e:
             logger.error(f"Error in story cleanup job: {e}")
-            time.sleep(3600)
+            background_jobs_stop.wait(STORY_CLEANUP_INTERVAL)
+
+def refresh_price_bands():
+    """Background job to recompute price bands from the active listings"""
+    while not background_jobs_stop.is_set():
+        # One worker per host computes; the others load the stored bands when the version changes
+        if not price_bands_lock.try_acquire():
+            background_jobs_stop.wait(PRICE_BANDS_INTERVAL)
+            continue
+        
+        try:
+            with job_timeout():
+                bands_count = price_bands.refresh()
+            price_bands.version = data_versions.bump('price_bands')
+            logger.info(f"Refreshed {bands_count} price bands")
+        except Exception as e:
+            logger.error(f"Error in price bands job: {e}")
+        background_jobs_stop.wait(PRICE_BANDS_INTERVAL)
 
-# Start cleanup thread
-cleanup_thread = threading.Thread(target=cleanup_expired_stories, daemon=True)
-cleanup_thread.start()
-log_success("Story cleanup background job started")
+def apply_migrations():
+    """Background job to apply pending database migrations (one worker per host)"""
+    if not migrations_lock.try_acquire():
+        return
+    try:
+        applied = run_migrations(mongo.db, logger)
+    except Exception as e:
+        logger.error(f"Error in migrations job: {e}")
+        return
+    finally:
+        migrations_lock.release()
+    if 'price-stats-v1' in applied:
+        bump_data_version('price_stats')  # Cached price analytics predate the backfill
+
+def job_lock_scope():
+    """Job locks are per database, so separate deployments on one host each run their own jobs"""
+    return f"{mongo.uri}/{mongo.db_name}"
+
+# Background jobs are started lazily in the process that serves requests (after any
+# fork), never at import time, so pre-fork servers can import the app safely
+STORY_CLEANUP_INTERVAL = 3600  # Seconds between story cleanup runs
+STORY_FILE_GRACE = timedelta(minutes=10)  # Story files saved this recently are never deleted
+story_cleanup_lock = ProcessLock('story-cleanup', scope=job_lock_scope)
+PRICE_BANDS_INTERVAL = int(os.getenv('PRICE_BANDS_INTERVAL', 600))  # Seconds between price band refreshes
+price_bands_lock = ProcessLock('price-bands', scope=job_lock_scope)
+migrations_lock = ProcessLock('migrations', scope=job_lock_scope)
+background_jobs_stop = threading.Event()
+background_jobs_lock = threading.Lock()
+background_jobs_pid = None
+
+def start_background_jobs():
+    """Start background jobs once per process"""
+    global background_jobs_pid
+    if background_jobs_pid == os.getpid():
+        return
+    with background_jobs_lock:
+        if background_jobs_pid == os.getpid():
+            return
+        background_jobs_pid = os.getpid()
+        background_jobs_stop.clear()
+        cleanup_thread = threading.Thread(target=cleanup_expired_stories, name='story-cleanup', daemon=True)
+        cleanup_thread.start()
+        log_success("Story cleanup background job started")
+        migrations_thread = threading.Thread(target=apply_migrations, name='migrations', daemon=True)
+        migrations_thread.start()
+        snapshot_thread = threading.Thread(target=seller_snapshots.run, args=(background_jobs_stop, logger),
+                                           name='seller-snapshots', daemon=True)
+        snapshot_thread.start()
+        price_bands_thread = threading.Thread(target=refresh_price_bands, name='price-bands', daemon=True)
+        price_bands_thread.start()
+        feed_thread = threading.Thread(target=crop_feed.watch, args=(crops_collection, background_jobs_stop, logger),
+                                       name='crop-feed', daemon=True)
+        feed_thread.start()
+        if metrics.directory:
+            metrics_thread = threading.Thread(target=flush_metrics, name='metrics-flush', daemon=True)
+            metrics_thread.start()
+
+@main.before_app_request
+def ensure_background_jobs():
+    """Start background jobs on the first request handled by this process"""
+    start_background_jobs()
+
+@main.before_app_request
+def start_request_metrics():
+    """Count the request as in flight and start its timers"""
+    # Label by URL rule ('/api/crops/<crop_id>'), not path, so every route is one series
+    g.metrics_route = (('route', request.url_rule.rule if request.url_rule else '<unmatched>'),)
+    g.metrics_started = time.perf_counter()
+    metrics.add('farming_http_requests_in_flight', g.metrics_route)
+    metrics.start_request()
+
+@main.before_app_request
+def start_request_profile():
+    """Sample this request's thread when it carries 'X-Profile: <PROFILING_TOKEN>'"""
+    header = request.headers.get('X-Profile')
+    token = current_app.config.get('PROFILING_TOKEN')
+    if not header or not token or not hmac.compare_digest(header, token):
+        return
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": "Another profile is running in this worker"}), 409
+    g.profiler = StackSampler(interval=0.001, thread_ids={native_thread_id()}).start()
+
+@main.after_app_request
+def finish_request_profile(response):
+    """Replace the response of a profiled request with its collapsed stacks"""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    try:
+        profiler.stop()
+    finally:
+        profile_lock.release()
+    logger.info("Profiled %s %s: %s samples in %.3fs", request.method, request.path, profiler.samples, profiler.seconds)
+    # Streamed bodies are not consumed yet, so only the view itself is profiled
+    profile = Response(profiler.collapsed(), mimetype='text/plain')
+    profile.headers['X-Profile-Status'] = str(response.status_code)
+    profile.headers['X-Profile-Samples'] = str(profiler.samples)
+    profile.headers['X-Profile-Seconds'] = f"{profiler.seconds:.3f}"
+    response.close()
+    return profile
+
+@main.teardown_app_request
+def stop_request_profile(error=None):
+    """Stop the sampler if the profiled request raised before finish_request_profile ran"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        profile_lock.release()
+
+# Registered after finish_request_profile so it runs first (after-request hooks run in
+# reverse order) and records the view's status, not that of a profile replacing it
+@main.after_app_request
+def note_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@main.teardown_app_request
+def record_request_metrics(error=None):
+    """Record latency, MongoDB time and status of the request (also when it raised)"""
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    route = g.metrics_route
+    metrics.add('farming_http_requests_in_flight', route, -1)
+    metrics.observe('farming_http_request_duration_seconds', route, time.perf_counter() - started)
+    metrics.observe('farming_http_request_mongodb_seconds', route, metrics.request_mongo_seconds())
+    metrics.inc('farming_http_requests_total', route + (('method', request.method),
+                                                        ('status', str(g.get('metrics_status', 500)))))
+    metrics.end_request()
+
+def flush_metrics():
+    """Write this worker's metrics to METRICS_DIR periodically (background thread)"""
+    while not background_jobs_stop.wait(METRICS_FLUSH_INTERVAL):
+        try:
+            metrics.flush()
+        except Exception as e:
+            logger.error(f"Error writing metrics: {e}")
+
+def shutdown():
+    """Stop background jobs and close MongoDB connections (called when a worker exits)"""
+    background_jobs_stop.set()
+    crop_feed.close()
+    story_cleanup_lock.release()
+    price_bands_lock.release()
+    try:
+        seller_snapshots.flush()
+    except Exception as e:
+        logger.error(f"Error updating seller snapshots on shutdown: {e}")
+    try:
+        metrics.flush()
+    except Exception as e:
+        logger.error(f"Error writing metrics on shutdown: {e}")
+    password_hasher.shutdown()
+    mongo.close()
+    flush_logs()
 
-@app.route('/api/payment/get-key', methods=['GET'])
+@main.route('/api/payment/get-key', methods=['GET'])
 def get_razorpay_key():
     """Get Razorpay public key for frontend"""
     try:
@@ -1994,9 +2627,171 @@ def get_razorpay_key():
             "error": str(e)
         }), 500
 
+@main.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """
+    Stream a whole collection as NDJSON (default) or CSV, for admin and analytics jobs.
+    Requires 'Authorization: Bearer <EXPORT_API_TOKEN>'.
+    
+    Query parameters:
+        format: 'ndjson' or 'csv'
+        since: ISO 8601 time; only documents created or updated since then (incremental pulls)
+        after: _id of the last document received, to resume an interrupted export
+    """
+    token = current_app.config.get('EXPORT_API_TOKEN')
+    if not token:
+        return jsonify({"success": False, "error": "Export API is not enabled"}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"success": False, "error": f"Unknown dataset: {dataset}"}), 404
+    
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "error": f"Unsupported format: {export_format}"}), 400
+    try:
+        since = parse_since(request.args.get('since'))
+        after = parse_after(request.args.get('after'))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    # Clients pass this back as 'since' on their next incremental pull
+    started_at = datetime.utcnow()
+    repository, projection, fields = EXPORT_DATASETS[dataset]
+    batches = repository.batches(export_query(since), projection, after, EXPORT_BATCH_SIZE)
+    chunks = ndjson_chunks(batches) if export_format == 'ndjson' else csv_chunks(batches, fields)
+    
+    def logged(chunks):
+        try:
+            yield from chunks
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated body and resumes with 'after'
+            logger.error(f"Error exporting {dataset}: {e}")
+            raise
+    
+    logger.info("Exporting %s as %s (since: %s, after: %s)", dataset, export_format, since, after)
+    response = Response(logged(chunks), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{dataset}.{export_format}"'
+    response.headers['X-Export-Started-At'] = started_at.isoformat() + 'Z'
+    return response
+
+@main.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Request, MongoDB and outbound call metrics in the Prometheus text format.
+    Requires 'Authorization: Bearer <METRICS_TOKEN>'; not found unless METRICS_TOKEN is set.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return jsonify({"success": False, "error": "Metrics are not enabled"}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def profiling_request_error():
+    """Error response if the request may not take a profile, else None"""
+    token = current_app.config.get('PROFILING_TOKEN')
+    if not token:
+        return jsonify({"success": False, "error": "Profiling is not enabled"}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return None
+
+def profile_seconds():
+    """Profile length from the 'seconds' query parameter (capped at PROFILE_MAX_SECONDS)"""
+    seconds = request.args.get('seconds', 10, type=float)
+    if seconds is None or not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise ValueError(f"seconds must be between 0 and {PROFILE_MAX_SECONDS}")
+    return seconds
+
+@main.route('/api/admin/profile/cpu', methods=['GET'])
+def profile_worker_cpu():
+    """
+    Sample every thread of the worker handling this request and return collapsed stacks
+    (for flamegraph.pl or speedscope). Requires 'Authorization: Bearer <PROFILING_TOKEN>'.
+    
+    Query parameters:
+        seconds: length of the profile (default 10)
+        interval: seconds between samples (default 0.005)
+    """
+    error = profiling_request_error()
+    if error:
+        return error
+    try:
+        seconds = profile_seconds()
+        interval = min(max(request.args.get('interval', 0.005, type=float) or 0.005, 0.001), 1.0)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": "Another profile is running in this worker"}), 409
+    try:
+        logger.info("CPU profile of worker %s for %ss", os.getpid(), seconds)
+        sampler = profile_cpu(seconds, interval)
+    finally:
+        profile_lock.release()
+    response = Response(sampler.collapsed(), mimetype='text/plain')
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    response.headers['X-Profile-Samples'] = str(sampler.samples)
+    return response
+
+@main.route('/api/admin/profile/memory', methods=['GET'])
+def profile_worker_memory():
+    """
+    Report allocations that grew while tracing the worker with tracemalloc.
+    Requires 'Authorization: Bearer <PROFILING_TOKEN>'.
+    
+    Query parameters:
+        seconds: length of the trace (default 10)
+        limit: lines listed (default 50)
+        format: 'text' (top lines) or 'collapsed' (stacks weighted by bytes, for flame graphs)
+    """
+    error = profiling_request_error()
+    if error:
+        return error
+    try:
+        seconds = profile_seconds()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    limit = min(max(request.args.get('limit', 50, type=int) or 50, 1), 1000)
+    collapsed = request.args.get('format', 'text').lower() == 'collapsed'
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": "Another profile is running in this worker"}), 409
+    try:
+        logger.info("Memory profile of worker %s for %ss", os.getpid(), seconds)
+        report = profile_memory(seconds, limit, collapsed=collapsed)
+    finally:
+        profile_lock.release()
+    response = Response(report, mimetype='text/plain')
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    return response
+
+@main.route('/api/health/db', methods=['GET'])
+def database_health():
+    """Ping MongoDB and report connection pool statistics"""
+    started = time.perf_counter()
+    try:
+        mongo.client.admin.command('ping')
+        status, code, error = 'ok', 200, None
+    except Exception as e:
+        logger.error(f"Database health check failed: {e}")
+        status, code, error = 'unavailable', 503, str(e)
+    
+    return jsonify({
+        "success": code == 200,
+        "status": status,
+        "error": error,
+        "ping_ms": round((time.perf_counter() - started) * 1000, 2),
+        "pool": mongo.pool_status()
+    }), code
+
 if __name__ == '__main__':
     # Show startup banner
     log_startup()
+    app = create_app()
     
     # Create indexes for better performance
     try:
@@ -2011,7 +2806,7 @@ if __name__ == '__main__':
         try:
             result = users_collection.update_many(
                 {"username": None},
-                {"$set": {"username": "$email"}}
+                {"$set": {"username": "$email", "updated_at": datetime.utcnow()}}
             )
             if result.modified_count > 0:
                 log_info(f"Updated {result.modified_count} users with null usernames")
@@ -2023,13 +2818,15 @@ if __name__ == '__main__':
         users_collection.create_index("phone", unique=True)
         # Create username index with sparse option to allow null values
         users_collection.create_index("username", unique=True, sparse=True)
+        # Seller snapshot propagation updates listings by seller
+        crops_collection.create_index("seller_email")
         log_success("Database indexes created successfully")
     except Exception as e:
         log_warning(f"Index creation warning: {e}")
     
 
     # Get configuration from environment variables
-    debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
     
@@ -0,0 +1,377 @@
+"""
+HTTP Endpoint Benchmark for Farming App
+Seeds a database with synthetic data (see seed_data.py) and measures the core marketplace
+endpoints: /buy, /api/crops, /market, /orders, /api/stories and /login. Reports
+throughput, latency percentiles and memory, and can save the results as a baseline or
+compare against one to catch regressions (exit status 1).
+
+Modes:
+    client  requests one at a time through Flask's test client (no network, no server)
+    load    concurrent keep-alive HTTP clients against a server: the app in a threaded
+            server inside this process, or --url (e.g. gunicorn via serve.py, which must
+            use the database seeded with --mongo-uri/--db-name, or one seeded earlier,
+            and run with RATE_LIMIT_ENABLED=False)
+
+Without --mongo-uri the app runs on mongomock (pip install mongomock), which measures the
+app's own overhead rather than real query costs. mongomock is not thread-safe, so use a
+real MongoDB for load mode.
+
+Usage:
+    python benchmarks/http_endpoints.py --scale small --save benchmarks/baseline.json
+    python benchmarks/http_endpoints.py --scale small --compare benchmarks/baseline.json
+    python benchmarks/http_endpoints.py --mode load --concurrency 16 --duration 10 --mongo-uri mongodb://localhost:27017
+    python benchmarks/http_endpoints.py --mode load --url http://localhost:5000 --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.seed_data import (BENCHMARK_PASSWORD, add_scale_arguments, benchmark_email, scale_counts,
+                                  seed)
+
+# resource is POSIX only; peak memory is not reported elsewhere
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+LOGIN_FORM = {'email': benchmark_email(0), 'password': BENCHMARK_PASSWORD}
+
+# name: (method, path, needs a logged-in session, expected status)
+ENDPOINTS = {
+    'buy': ('GET', '/buy', True, 200),
+    'api-crops': ('GET', '/api/crops', False, 200),
+    'market': ('GET', '/market', False, 200),
+    'orders': ('GET', '/orders', True, 200),
+    'api-stories': ('GET', '/api/stories', False, 200),
+    'login': ('POST', '/login', False, 302),
+}
+
+# Compared with a baseline: (result key, True if higher is worse)
+COMPARED = [('p50_ms', True), ('p99_ms', True), ('rps', False)]
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process in MiB (None where unavailable)"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(sorted_values, share):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency percentiles (ms) of one endpoint's run"""
+    latencies.sort()
+    as_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': as_ms(percentile(latencies, 0.50)),
+        'p90_ms': as_ms(percentile(latencies, 0.90)),
+        'p99_ms': as_ms(percentile(latencies, 0.99)),
+        'max_ms': as_ms(latencies[-1] if latencies else None),
+        'peak_rss_mib': peak_rss_mib(),
+    }
+
+
+def create_app(args):
+    """The Farming App on the benchmark database (mongomock unless --mongo-uri is given)"""
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')  # Per-request INFO lines would dominate the profile
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed. Install with: pip install mongomock (or pass --mongo-uri)")
+        import utils.database
+        utils.database.MongoClient = mongomock.MongoClient
+
+    from backend import app as farming_app
+    from utils.migrations import run_migrations
+
+    # Background jobs (migrations, snapshots, the change feed) would compete with the measured requests
+    farming_app.background_jobs_pid = os.getpid()
+    app = farming_app.create_app({
+        'MONGO_URI': args.mongo_uri or 'mongodb://benchmark',
+        'DB_NAME': args.db_name,
+        'RATE_LIMIT_ENABLED': False,  # Every benchmark client logs in from the same address
+    })
+    if not args.no_seed:
+        inserted = seed(farming_app.mongo.db, scale_counts(args), args.seed)
+        print('Seeded ' + ', '.join(f"{count} {name}" for name, count in inserted.items()))
+    if args.mongo_uri:
+        run_migrations(farming_app.mongo.db)  # Indexes, as a deployed database has them
+    return app
+
+
+def run_client(app, names, requests, warmup, trace_memory):
+    """Send requests one at a time through the Flask test client"""
+    results = {}
+    for name in names:
+        method, path, needs_login, expected = ENDPOINTS[name]
+        client = app.test_client()
+        if needs_login:
+            client.post('/login', data=LOGIN_FORM)
+        data = LOGIN_FORM if method == 'POST' else None
+        for _ in range(warmup):
+            client.open(path, method=method, data=data).close()
+
+        if trace_memory:
+            tracemalloc.start()
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code != expected
+            response.close()
+        elapsed = time.perf_counter() - started
+        results[name] = summarize(latencies, errors, elapsed)
+        if trace_memory:
+            results[name]['alloc_peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+    return results
+
+
+def start_server(app):
+    """Serve app from a threaded HTTP/1.1 server in this process. Returns (base URL, server)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+class HTTPWorker:
+    """One load-generating client with a keep-alive connection (and its own session)"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.hostname, parts.port, timeout=30)
+        self.connection = self.connect()
+        self.cookie = None
+
+    def send(self, method, path, form=None):
+        """Send a request and read the whole body. Returns the status code"""
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        body = None
+        if form:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server closed the kept-alive connection: reconnect once
+            self.connection.close()
+            self.connection = self.connect()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        response.read()
+        cookies = SimpleCookie(response.getheader('Set-Cookie') or '')
+        if 'session' in cookies:
+            self.cookie = f"session={cookies['session'].value}"
+        if response.will_close:
+            self.connection.close()
+            self.connection = self.connect()
+        return response.status
+
+    def close(self):
+        self.connection.close()
+
+
+def run_load(base_url, names, concurrency, duration, warmup):
+    """Run each endpoint with concurrent clients for duration seconds"""
+    results = {}
+    for name in names:
+        method, path, needs_login, expected = ENDPOINTS[name]
+        form = LOGIN_FORM if method == 'POST' else None
+        workers = [HTTPWorker(base_url) for _ in range(concurrency)]
+        latencies = [[] for _ in workers]
+        errors = [0] * concurrency
+        window = {}
+
+        def open_window():
+            # Runs once every client is logged in and warmed up, before any is released
+            window['started'] = time.perf_counter()
+            window['deadline'] = window['started'] + duration
+
+        start = threading.Barrier(concurrency + 1, action=open_window)
+
+        def work(index):
+            worker = workers[index]
+            if needs_login:
+                worker.send('POST', '/login', LOGIN_FORM)
+            for _ in range(warmup):
+                worker.send(method, path, form)
+            start.wait()
+            while time.perf_counter() < window['deadline']:
+                request_started = time.perf_counter()
+                try:
+                    status = worker.send(method, path, form)
+                except (http.client.HTTPException, OSError):
+                    status = None
+                latencies[index].append(time.perf_counter() - request_started)
+                errors[index] += status != expected
+
+        threads = [threading.Thread(target=work, args=(index,), daemon=True) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - window['started']
+        for worker in workers:
+            worker.close()
+        results[name] = summarize([latency for worker_latencies in latencies for latency in worker_latencies],
+                                  sum(errors), elapsed)
+    return results
+
+
+def print_results(results):
+    print(f"\n{'endpoint':<14}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}{'rss MiB':>10}{'alloc KiB':>11}")
+    fmt = lambda value: '-' if value is None else value
+    for name, result in results.items():
+        print(f"{name:<14}{result['requests']:>10}{result['errors']:>8}{fmt(result['rps']):>10}"
+              f"{fmt(result['p50_ms']):>10}{fmt(result['p90_ms']):>10}{fmt(result['p99_ms']):>10}"
+              f"{fmt(result['max_ms']):>10}{fmt(result['peak_rss_mib']):>10}{fmt(result.get('alloc_peak_kib')):>11}")
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Print changes against a baseline. Returns the list of regressions"""
+    regressions = []
+    print(f"\n{'endpoint':<14}{'metric':<10}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            continue
+        for key, higher_is_worse in COMPARED:
+            old, new = previous.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            if worse and key.endswith('_ms') and new - old < min_delta_ms:
+                worse = False  # Sub-millisecond noise on fast endpoints
+            if worse:
+                regressions.append((name, key, old, new))
+            print(f"{name:<14}{key:<10}{old:>12}{new:>12}{change:>+9.0%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['client', 'load'], default='client')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--mongo-uri', help='MongoDB to seed and use (default: in-process mongomock)')
+    parser.add_argument('--db-name', default='farming_bench', help='database name (default farming_bench)')
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in the database')
+    add_scale_arguments(parser)
+    parser.add_argument('--requests', type=int, default=200, help='client mode: requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per endpoint (per client)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='client mode: report peak Python allocations per endpoint (slower)')
+    parser.add_argument('--url', help='load mode: benchmark a running server instead of the app in this process')
+    parser.add_argument('--concurrency', type=int, default=8, help='load mode: concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='load mode: seconds per endpoint')
+    parser.add_argument('--save', help='write the results to this JSON file (a baseline)')
+    parser.add_argument('--compare', help='compare with a baseline JSON file; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative change (default 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='latency increases smaller than this are never regressions (default 1.0)')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+    if args.url and args.mode != 'load':
+        parser.error('--url requires --mode load')
+
+    server = None
+    if args.url:
+        if args.mongo_uri and not args.no_seed:
+            from pymongo import MongoClient
+            client = MongoClient(args.mongo_uri)
+            try:
+                seed(client[args.db_name], scale_counts(args), args.seed)
+            finally:
+                client.close()
+        base_url = args.url.rstrip('/')
+    else:
+        app = create_app(args)
+        if args.mode == 'load':
+            base_url, server = start_server(app)
+
+    try:
+        if args.mode == 'client':
+            results = run_client(app, names, args.requests, args.warmup, args.trace_memory)
+        else:
+            results = run_load(base_url, names, args.concurrency, args.duration, args.warmup)
+    finally:
+        if server:
+            server.shutdown()
+    print_results(results)
+
+    report = {
+        'meta': {
+            'mode': args.mode, 'url': args.url, 'database': 'mongodb' if args.mongo_uri else 'mongomock',
+            'counts': scale_counts(args), 'seed': args.seed, 'requests': args.requests,
+            'concurrency': args.concurrency, 'duration': args.duration,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'created_at': datetime.utcnow().isoformat() + 'Z',
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if {key: baseline['meta'].get(key) for key in ('mode', 'database', 'counts')} != \
+                {key: report['meta'][key] for key in ('mode', 'database', 'counts')}:
+            print("\nWarning: the baseline was recorded with a different mode, database or data scale")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+JSON Encoding Benchmark for Farming App
+Compares Flask's default JSON provider with FastJSONProvider (orjson) on payloads
+shaped like the /api/crops, /api/market-updates and /api/users responses.
+
+Usage:
+    python benchmarks/json_encoding.py [--rows 1000] [--repeat 20]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.json_provider import ORJSON_AVAILABLE, FastJSONProvider, iter_json_array
+
+CATEGORIES = ['vegetables', 'fruits', 'grains', 'pulses', 'spices']
+LOCATIONS = ['Pune, Maharashtra', 'Nashik, Maharashtra', 'Indore, Madhya Pradesh', 'Ludhiana, Punjab', 'गुंटूर, आंध्र प्रदेश']
+
+
+def crop_payload(rows):
+    """A /api/crops response with rows listings"""
+    now = datetime.utcnow()
+    crops = []
+    for i in range(rows):
+        quantity = random.randint(0, 500)
+        price = round(random.uniform(10, 200), 2)
+        crops.append({
+            '_id': str(ObjectId()),
+            'name': f'Crop {i}',
+            'category': random.choice(CATEGORIES),
+            'quantity': quantity,
+            'price_per_kg': price,
+            'total_price': quantity * price,
+            'location': random.choice(LOCATIONS),
+            'description': 'Freshly harvested, sorted and packed. ' * 3,
+            'seller_name': f'Farmer {i % 97}',
+            'seller_email': f'farmer{i % 97}@example.com',
+            'seller_phone': f'98{i:08d}',
+            'seller_location': random.choice(LOCATIONS),
+            'is_active': quantity > 0,
+            'created_at': now - timedelta(minutes=i),
+            'updated_at': now,
+        })
+    return {'success': True, 'crops': crops}
+
+
+def market_update_payload(rows):
+    """A /api/market-updates response with rows updates"""
+    now = datetime.utcnow()
+    return {'success': True, 'updates': [{
+        '_id': ObjectId(),
+        'title': f'Mandi prices update {i}',
+        'description': 'Arrivals were lower than last week and prices firmed up. ' * 2,
+        'category': random.choice(CATEGORIES),
+        'impact': random.choice(['high', 'medium', 'low']),
+        'author': f'Reporter {i % 13}',
+        'author_email': f'reporter{i % 13}@example.com',
+        'source': 'APMC',
+        'created_at': now - timedelta(hours=i),
+    } for i in range(rows)]}
+
+
+def time_call(function, repeat):
+    """Best-of-repeat wall time of function() in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='items per payload')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    if not ORJSON_AVAILABLE:
+        print("orjson is not installed; FastJSONProvider falls back to the stdlib encoder. Install with: pip install orjson")
+
+    app = Flask(__name__)
+    providers = {
+        'flask default': DefaultJSONProvider(app),
+        'orjson (http dates)': FastJSONProvider(app, datetime_format='http'),
+        'orjson (iso dates)': FastJSONProvider(app, datetime_format='iso'),
+    }
+    # Flask's default provider can't serialize ObjectId; give it the same fallback as the app
+    providers['flask default'].default = FastJSONProvider.default
+
+    payloads = {
+        f'crops x{args.rows}': crop_payload(args.rows),
+        f'market updates x{args.rows}': market_update_payload(args.rows),
+    }
+
+    print(f"{'payload':<26}{'provider':<24}{'response ms':>12}{'stream ms':>12}{'bytes':>12}{'speedup':>10}")
+    with app.app_context():
+        for payload_name, payload in payloads.items():
+            key = 'crops' if 'crops' in payload else 'updates'
+            baseline = None
+            for provider_name, provider in providers.items():
+                app.json = provider
+                response_ms = time_call(lambda: provider.response(payload), args.repeat)
+                stream_ms = time_call(
+                    lambda: b''.join(iter_json_array(payload[key], provider, {'success': True}, key)),
+                    args.repeat
+                )
+                size = len(provider.response(payload).get_data())
+                baseline = baseline or response_ms
+                print(f"{payload_name:<26}{provider_name:<24}{response_ms:>12.2f}{stream_ms:>12.2f}"
+                      f"{size:>12}{baseline / response_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Password Hashing Benchmark for Farming App
+Measures werkzeug hash methods at different costs, to choose PASSWORD_HASH_METHOD: the
+time one login spends verifying a password, and how many verifications per second a
+PasswordHasher pool of a given size sustains under concurrent logins.
+
+Pick the strongest method whose verify time stays under your login latency budget
+(--target-ms) on production hardware.
+
+Usage:
+    python benchmarks/password_hashing.py [--methods scrypt:32768:8:1,pbkdf2:sha256:600000]
+                                          [--workers 1] [--concurrency 8] [--target-ms 100]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.passwords import DEFAULT_METHOD, PasswordHasher
+
+METHODS = [
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+]
+PASSWORD = 'Bench@12345'
+
+
+def median_ms(function, repeat):
+    """Median wall time of function() in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def pool_throughput(method, workers, concurrency, seconds):
+    """Verifications per second through a PasswordHasher from concurrent threads"""
+    hasher = PasswordHasher(method, workers=workers, max_pending=concurrency)
+    password_hash = generate_password_hash(PASSWORD, method)
+    hasher.verify(password_hash, PASSWORD)  # Start the helper processes outside the measurement
+    done = [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def work(index):
+        while time.perf_counter() < deadline:
+            hasher.verify(password_hash, PASSWORD)
+            done[index] += 1
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    return sum(done) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', default=','.join(METHODS), help='comma-separated werkzeug hash methods')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per timing (median is reported)')
+    parser.add_argument('--workers', type=int, default=1, help='PasswordHasher helper processes (0: inline)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent logins for the throughput test')
+    parser.add_argument('--seconds', type=float, default=3, help='length of each throughput test')
+    parser.add_argument('--target-ms', type=float, default=100, help='login latency budget for the password check')
+    args = parser.parse_args()
+
+    print(f"{'method':<26}{'hash ms':>10}{'verify ms':>11}{'pool verify/s':>15}  within target")
+    for method in filter(None, (method.strip() for method in args.methods.split(','))):
+        password_hash = generate_password_hash(PASSWORD, method)
+        hash_ms = median_ms(lambda: generate_password_hash(PASSWORD, method), args.repeat)
+        verify_ms = median_ms(lambda: check_password_hash(password_hash, PASSWORD), args.repeat)
+        throughput = pool_throughput(method, args.workers, args.concurrency, args.seconds)
+        default = ' (default)' if method == DEFAULT_METHOD else ''
+        print(f"{method + default:<26}{hash_ms:>10.1f}{verify_ms:>11.1f}{throughput:>15.1f}  "
+              f"{'yes' if verify_ms <= args.target_ms else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Repository Benchmark for Farming App
+Runs the catalog reads behind the read-heavy JSON APIs (crop search, active stories,
+market updates) through the synchronous repositories, one thread per concurrent request
+as the Flask workers do, and through their asyncio twins on a single event loop. Also
+pages through every listing with batches() (the export path) on both, and checks that
+both flavours return the same documents.
+
+With --mongo-uri the async repositories use PyMongo's AsyncMongoClient (pymongo >= 4.9).
+Without it both run on mongomock (pip install mongomock), with the async calls in worker
+threads: that checks the two flavours agree, but says nothing about their speed, and
+runs one request at a time because mongomock is not thread-safe.
+
+Usage:
+    python benchmarks/repositories.py --mongo-uri mongodb://localhost:27017 --concurrency 32
+    python benchmarks/repositories.py --scale small
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.http_endpoints import summarize
+from benchmarks.seed_data import add_scale_arguments, scale_counts, seed
+from utils.repositories import (AsyncCropRepository, AsyncMarketUpdateRepository, AsyncStoryRepository,
+                                CropRepository, MarketUpdateRepository, StoryRepository)
+
+# name: read made through a set of repositories (the same call works on sync and async ones)
+READS = {
+    'crop-search': lambda repos: repos['crops'].search({'category': 'grains'}),
+    'active-stories': lambda repos: repos['stories'].active(datetime.utcnow()),
+    'market-updates': lambda repos: repos['market_updates'].latest(),
+}
+
+
+def open_database(args):
+    """A Database on the benchmark data (mongomock unless --mongo-uri is given)"""
+    from flask import Flask
+
+    import utils.database
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed. Install with: pip install mongomock (or pass --mongo-uri)")
+        utils.database.MongoClient = mongomock.MongoClient
+
+    app = Flask('benchmark')
+    app.config.update(MONGO_URI=args.mongo_uri or 'mongodb://benchmark', DB_NAME=args.db_name)
+    mongo = utils.database.Database()
+    mongo.init_app(app)
+    return mongo
+
+
+def sync_repositories(mongo):
+    return {
+        'crops': CropRepository(mongo.collection('crops'), catalog=mongo.catalog_collection('crops')),
+        'stories': StoryRepository(mongo.collection('stories'), catalog=mongo.catalog_collection('stories')),
+        'market_updates': MarketUpdateRepository(mongo.collection('market_updates'),
+                                                 catalog=mongo.catalog_collection('market_updates')),
+    }
+
+
+def async_repositories(mongo, native):
+    """Async repositories on AsyncMongoClient collections, or on the sync ones (run in threads)"""
+    repos = {}
+    for name, repository in (('crops', AsyncCropRepository), ('stories', AsyncStoryRepository),
+                             ('market_updates', AsyncMarketUpdateRepository)):
+        if native:
+            repos[name] = repository(mongo.async_collection(name), catalog=mongo.async_collection(name, catalog=True))
+        else:
+            repos[name] = repository(mongo.collection(name), catalog=mongo.catalog_collection(name))
+    return repos
+
+
+def run_sync(repos, read, requests, concurrency):
+    """Time requests reads from a pool of concurrency threads. Returns (latencies, elapsed, last result)"""
+    def timed(_):
+        started = time.perf_counter()
+        result = read(repos)
+        return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = list(pool.map(timed, range(requests)))
+    return [seconds for seconds, _ in timings], time.perf_counter() - started, timings[-1][1]
+
+
+async def run_async(repos, read, requests, concurrency):
+    """Time requests reads with at most concurrency in flight on this event loop"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with slots:
+            started = time.perf_counter()
+            result = await read(repos)
+            return time.perf_counter() - started, result
+
+    started = time.perf_counter()
+    timings = await asyncio.gather(*(timed() for _ in range(requests)))
+    return [seconds for seconds, _ in timings], time.perf_counter() - started, timings[-1][1]
+
+
+def sync_batches(crops, batch_size):
+    """(listings paged through, seconds)"""
+    started = time.perf_counter()
+    total = sum(len(batch) for batch in crops.batches(batch_size=batch_size))
+    return total, time.perf_counter() - started
+
+
+async def async_batches(crops, batch_size):
+    started = time.perf_counter()
+    total = 0
+    async for batch in crops.batches(batch_size=batch_size):
+        total += len(batch)
+    return total, time.perf_counter() - started
+
+
+def print_row(name, flavour, result):
+    print(f"{name:<16}{flavour:<7}{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}{result['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', help='MongoDB to seed and use (default: in-process mongomock)')
+    parser.add_argument('--db-name', default='farming_bench', help='database name (default farming_bench)')
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in the database')
+    add_scale_arguments(parser)
+    parser.add_argument('--requests', type=int, default=200, help='reads per query and flavour')
+    parser.add_argument('--concurrency', type=int, default=16, help='reads in flight at once')
+    parser.add_argument('--batch-size', type=int, default=1000, help='batches(): listings per page')
+    args = parser.parse_args()
+
+    from utils.database import ASYNC_CLIENT_AVAILABLE
+    native = bool(args.mongo_uri) and ASYNC_CLIENT_AVAILABLE
+    if args.mongo_uri and not native:
+        print("This PyMongo version has no AsyncMongoClient; async repositories run in threads")
+    concurrency = args.concurrency if args.mongo_uri else 1
+
+    mongo = open_database(args)
+    if not args.no_seed:
+        inserted = seed(mongo.db, scale_counts(args), args.seed)
+        print('Seeded ' + ', '.join(f"{count} {name}" for name, count in inserted.items()))
+    sync_repos = sync_repositories(mongo)
+
+    async def async_side():
+        repos = async_repositories(mongo, native)
+        try:
+            runs = {name: await run_async(repos, read, args.requests, concurrency) for name, read in READS.items()}
+            return runs, await async_batches(repos['crops'], args.batch_size)
+        finally:
+            if native:
+                await mongo.async_client.close()
+
+    sync_runs = {name: run_sync(sync_repos, read, args.requests, concurrency) for name, read in READS.items()}
+    sync_paged = sync_batches(sync_repos['crops'], args.batch_size)
+    async_runs, async_paged = asyncio.run(async_side())
+    mongo.close()
+
+    print(f"\n{'read':<16}{'':<7}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}   "
+          f"({args.requests} reads, {concurrency} in flight)")
+    mismatches = []
+    for name in READS:
+        for flavour, runs in (('sync', sync_runs), ('async', async_runs)):
+            latencies, elapsed, _ = runs[name]
+            print_row(name, flavour, summarize(latencies, 0, elapsed))
+        if sync_runs[name][2] != async_runs[name][2]:
+            mismatches.append(name)
+
+    for flavour, (total, seconds) in (('sync', sync_paged), ('async', async_paged)):
+        print(f"batches()       {flavour:<7}{total} listings in {seconds * 1000:.1f} ms")
+    if sync_paged[0] != async_paged[0]:
+        mismatches.append('batches')
+
+    if mismatches:
+        print(f"\nSync and async repositories returned different results for: {', '.join(mismatches)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
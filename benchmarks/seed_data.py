@@ -0,0 +1,204 @@
+"""
+Synthetic Benchmark Data for Farming App
+Fills a database with users, crop listings, payments, stories and market updates shaped
+like the ones the app writes. The same seed always produces the same documents: ids and
+timestamps come from the seeded RNG and a fixed base date (only password salts differ),
+so benchmark runs are comparable.
+
+Every user's password is BENCHMARK_PASSWORD. Payments are concentrated on the first
+users (the benchmark logs in as the first one), so /orders has a realistic history.
+
+Usage:
+    python benchmarks/seed_data.py --mongo-uri mongodb://localhost:27017 --db-name farming_bench [--scale medium]
+"""
+
+import argparse
+import calendar
+import csv
+import random
+import struct
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.gazetteer import GAZETTEER_PATH, geo_point
+
+BENCHMARK_PASSWORD = 'Bench@12345'
+BATCH_SIZE = 1000
+FREQUENT_BUYERS = 20  # Payments are spread over this many users
+
+# Timestamps are offsets back from BASE_DATE. Stories would normally expire 24 hours after
+# they are posted; benchmark stories stay active however long after BASE_DATE the run is.
+BASE_DATE = datetime(2025, 1, 1)
+STORIES_EXPIRE_AT = datetime(2100, 1, 1)
+
+# Documents per collection for each --scale
+SCALES = {
+    'small': {'users': 50, 'crops': 500, 'payments': 1000, 'stories': 100, 'market_updates': 200},
+    'medium': {'users': 500, 'crops': 5000, 'payments': 10000, 'stories': 1000, 'market_updates': 2000},
+    'large': {'users': 5000, 'crops': 50000, 'payments': 100000, 'stories': 5000, 'market_updates': 10000},
+}
+
+CROPS = {
+    'vegetables': ['Tomato', 'Onion', 'Potato', 'Brinjal', 'Cabbage', 'Cauliflower', 'Okra'],
+    'fruits': ['Mango', 'Banana', 'Grapes', 'Pomegranate', 'Guava', 'Papaya'],
+    'grains': ['Wheat', 'Rice', 'Maize', 'Bajra', 'Jowar'],
+    'spices': ['Turmeric', 'Chilli', 'Coriander', 'Cumin', 'Ginger'],
+}
+UPDATE_CATEGORIES = ['price', 'weather', 'policy', 'demand', 'export', 'technology', 'other']
+IMPACTS = ['positive', 'negative', 'neutral']
+FIRST_NAMES = ['Ramesh', 'Sita', 'Arjun', 'Lakshmi', 'Vijay', 'Anita', 'Suresh', 'Kavita', 'Mohan', 'Priya']
+LAST_NAMES = ['Patil', 'Sharma', 'Reddy', 'Singh', 'Yadav', 'Kumar', 'Naidu', 'Jadhav']
+
+
+def benchmark_email(index):
+    return f'bench{index}@example.com'
+
+
+def object_id(rng, created_at):
+    """An ObjectId timestamped created_at, its remaining bytes drawn from rng"""
+    return ObjectId(struct.pack('>I', calendar.timegm(created_at.timetuple())) + rng.randbytes(8))
+
+
+def load_places():
+    """(name, GeoJSON point) of the districts and cities in the gazetteer"""
+    with open(GAZETTEER_PATH, encoding='utf-8') as f:
+        return [(f"{row['name']}, {row['state']}", geo_point(float(row['lon']), float(row['lat'])))
+                for row in csv.DictReader(f) if row['kind'] != 'state']
+
+
+def generate(counts, seed=42, now=BASE_DATE):
+    """Build the documents for each collection: {collection name: [document, ...]}"""
+    rng = random.Random(seed)
+    places = load_places()
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+
+    users = []
+    for i in range(counts['users']):
+        location = rng.choice(places)[0]
+        created_at = now - timedelta(days=rng.randint(1, 700))
+        users.append({
+            '_id': object_id(rng, created_at), 'email': benchmark_email(i), 'phone': f'9{i:09d}',
+            'password': password_hash, 'username': benchmark_email(i), 'is_active': True, 'profile_completed': True,
+            'created_at': created_at, 'last_login': None,
+            'profile': {'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', 'location': location,
+                        'bio': 'Farming for three generations.'},
+        })
+
+    crops = []
+    for i in range(counts['crops']):
+        seller = users[rng.randrange(len(users))]
+        category = rng.choice(list(CROPS))
+        location, point = rng.choice(places)
+        quantity = rng.choice([0] + [rng.randint(1, 2000)] * 9)  # About a tenth are sold out
+        price = round(rng.uniform(8, 250), 2)
+        created_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))
+        crops.append({
+            '_id': object_id(rng, created_at), 'name': rng.choice(CROPS[category]), 'category': category,
+            'quantity': quantity, 'price_per_kg': price, 'total_price': quantity * price,
+            'location': location, 'location_point': point,
+            'description': f"Grade {rng.choice('ABC')}, harvested this week. " * rng.randint(1, 4),
+            'seller_name': seller['profile']['name'], 'seller_email': seller['email'],
+            'seller_phone': seller['phone'], 'seller_location': seller['profile']['location'],
+            'is_active': quantity > 0, 'created_at': created_at, 'updated_at': created_at,
+        })
+
+    payments = []
+    for i in range(counts['payments'] if crops else 0):
+        buyer = users[i % min(FREQUENT_BUYERS, len(users))]
+        crop = crops[rng.randrange(len(crops))]
+        quantity = rng.randint(1, 50)
+        created_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))
+        payments.append({
+            '_id': object_id(rng, created_at),
+            'order_id': f'order_bench{i}', 'payment_id': f'pay_bench{i}', 'user_id': str(buyer['_id']),
+            'user_email': buyer['email'], 'amount': int(quantity * crop['price_per_kg'] * 100),
+            'status': 'success', 'created_at': created_at,
+            'crop_id': str(crop['_id']), 'crop_name': crop['name'], 'quantity_purchased': quantity,
+            'crop_details': {'name': crop['name'], 'category': crop['category'],
+                             'price_per_kg': crop['price_per_kg'], 'location': crop['location']},
+            'seller_details': {'name': crop['seller_name'], 'email': crop['seller_email'],
+                               'phone': crop['seller_phone'], 'location': crop['seller_location']},
+        })
+
+    stories = []
+    for i in range(counts['stories']):
+        user = users[rng.randrange(len(users))]
+        created_at = now - timedelta(minutes=rng.randint(1, 60 * 23))
+        media_type = rng.choice(['image', 'image', 'video'])
+        stories.append({
+            '_id': object_id(rng, created_at), 'user_id': str(user['_id']), 'user_email': user['email'], 'user_name': user['profile']['name'],
+            'filename': f"{i:032x}.{'jpg' if media_type == 'image' else 'mp4'}",
+            'original_filename': f'field_{i}.jpg', 'media_type': media_type,
+            'created_at': created_at, 'expires_at': STORIES_EXPIRE_AT,
+        })
+
+    market_updates = []
+    for i in range(counts['market_updates']):
+        author = users[rng.randrange(len(users))]
+        category = rng.choice(UPDATE_CATEGORIES)
+        created_at = now - timedelta(hours=rng.randint(1, 24 * 60))
+        market_updates.append({
+            '_id': object_id(rng, created_at),
+            'title': f"{rng.choice([name for names in CROPS.values() for name in names])} {category} update",
+            'category': category, 'impact': rng.choice(IMPACTS),
+            'description': 'Arrivals at the mandi changed and traders expect prices to follow. ' * rng.randint(1, 3),
+            'source': rng.choice(['APMC', 'Agmarknet', 'IMD', '']), 'author': author['profile']['name'],
+            'author_email': author['email'], 'created_at': created_at,
+        })
+
+    return {'users': users, 'crops': crops, 'payments': payments, 'stories': stories,
+            'market_updates': market_updates}
+
+
+def seed(db, counts, seed=42):
+    """Replace the benchmark collections of db with generated data. Returns {collection: count}"""
+    inserted = {}
+    for name, documents in generate(counts, seed).items():
+        collection = db[name]
+        collection.delete_many({})
+        for start in range(0, len(documents), BATCH_SIZE):
+            collection.insert_many(documents[start:start + BATCH_SIZE], ordered=False)
+        inserted[name] = len(documents)
+    return inserted
+
+
+def add_scale_arguments(parser):
+    """--scale and per-collection count options, shared with the benchmark runner"""
+    parser.add_argument('--scale', choices=SCALES, default='small', help='preset document counts')
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name,
+                            help=f'number of {name.replace("_", " ")} (overrides --scale)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the generated data')
+
+
+def scale_counts(args):
+    return {name: getattr(args, name) if getattr(args, name) is not None else count
+            for name, count in SCALES[args.scale].items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', required=True, help='MongoDB to fill (its collections are replaced)')
+    parser.add_argument('--db-name', default='farming_bench', help='database name (default farming_bench)')
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    client = MongoClient(args.mongo_uri)
+    try:
+        inserted = seed(client[args.db_name], scale_counts(args), args.seed)
+    finally:
+        client.close()
+    for name, count in inserted.items():
+        print(f"{name:<16}{count:>10}")
+    print(f"Log in as {benchmark_email(0)} / {BENCHMARK_PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
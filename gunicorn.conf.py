@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration for the Farming App (production serving).
+
+Usage:
+    python serve.py
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment variables:
+    FLASK_HOST / FLASK_PORT   bind address (default 0.0.0.0:5000)
+    WORKER_CLASS              'gthread' (default), 'sync' or 'gevent' (pip install gevent)
+    WEB_CONCURRENCY           worker processes (default: 2 x CPU cores + 1, CPU cores + 1 for gevent)
+    WORKER_THREADS            threads per gthread worker (default 4)
+    WORKER_CONNECTIONS        concurrent clients per gevent worker (default 1000)
+    WORKER_TIMEOUT            seconds before a stuck worker is killed and replaced (default 60)
+    GRACEFUL_TIMEOUT          seconds workers get to drain in-flight requests on reload/stop (default 30)
+    MAX_REQUESTS              recycle a worker after this many requests, 0 disables (default 2000)
+    PRELOAD_APP               import the app once in the master before forking (default True)
+    METRICS_DIR               folder where workers share /metrics figures (default: a temp folder per port)
+
+Signals (send to the master process):
+    HUP         graceful reload: start new workers, let old workers drain and exit
+    TERM        graceful shutdown: stop accepting connections and drain in-flight requests
+    TTIN/TTOU   add/remove one worker
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # Each gevent worker multiplexes many connections, so one process per core is enough
+    workers = int(os.getenv('WEB_CONCURRENCY', cpu_count + 1))
+else:
+    workers = int(os.getenv('WEB_CONCURRENCY', cpu_count * 2 + 1))
+threads = int(os.getenv('WORKER_THREADS', 4))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+
+timeout = int(os.getenv('WORKER_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers periodically (with jitter so they don't all restart at once)
+max_requests = int(os.getenv('MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+# The app creates its MongoDB client with connect=False and starts background jobs
+# lazily, so importing it in the master before forking is safe
+preload_app = os.getenv('PRELOAD_APP', 'True').lower() == 'true'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+# Workers write their request metrics here so /metrics on any worker reports all of them.
+# Set before the app is imported, which reads it.
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"farming-metrics-{os.getenv('FLASK_PORT', '5000')}"))
+
+# Figures from a previous run of the server must not be added to this one's. This runs
+# before the app is imported (preload_app), and only once per master: the config is read
+# again on reload (HUP), when the running workers' figures must be kept.
+if os.environ.get('FARMING_METRICS_CLEARED_BY') != str(os.getpid()):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from utils.metrics import clear_directory
+    clear_directory(os.environ['METRICS_DIR'])
+    os.environ['FARMING_METRICS_CLEARED_BY'] = str(os.getpid())
+
+
+def when_ready(server):
+    server.log.info(
+        "Farming App serving on %s with %s %s worker(s)", bind, workers, worker_class
+    )
+
+
+def post_fork(server, worker):
+    # Start background jobs right away instead of waiting for the first request
+    from backend.app import start_background_jobs
+    start_background_jobs()
+
+
+def worker_exit(server, worker):
+    # Stop background jobs and close this worker's MongoDB connection pool
+    from backend.app import shutdown
+    shutdown()
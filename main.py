@@ -5,7 +5,8 @@ Main entry point for the Farming App.
 This script starts the Flask application with proper logging and error handling.
 
 Usage:
-    python main.py
+    python main.py      # development server (single process)
+    python serve.py     # production server (multi-process, see gunicorn.conf.py)
 
 Requirements:
     - .env file with required environment variables
@@ -24,8 +25,7 @@ sys.path.insert(0, str(current_dir))
 
 # Import and run the Flask app
 try:
-    from backend.app import app, logger, log_startup, log_success, log_error, log_info, log_warning
-    from pymongo import MongoClient
+    from backend.app import create_app, mongo, logger, log_startup, log_success, log_error, log_info, log_warning
     from dotenv import load_dotenv
 except ImportError as e:
     print(f"❌ Import Error: {e}")
@@ -60,29 +60,28 @@ if __name__ == '__main__':
         log_error("MONGO_URI environment variable is not set. Please check your .env file.")
         sys.exit(1)
 
-    # Test MongoDB connection
+    app = create_app()
+
+    # Test MongoDB connection (uses the app's shared client)
     try:
-        client = MongoClient(MONGO_URI)
-        db_name = os.getenv('DB_NAME', 'farming')
-        db = client[db_name]
-        # Test the connection
-        client.admin.command('ping')
-        log_success(f"Connected to MongoDB database: {db_name}")
+        mongo.client.admin.command('ping')
+        log_success(f"Connected to MongoDB database: {mongo.db_name}")
     except Exception as e:
         log_error(f"Failed to connect to MongoDB: {e}")
         sys.exit(1)
 
     # Create indexes for better performance
     try:
-        users_collection = db.users
+        users_collection = mongo.collection('users')
         users_collection.create_index("username", unique=True)
         users_collection.create_index("email", unique=True)
+        mongo.collection('crops').create_index("seller_email")
         log_success("Database indexes created successfully")
     except Exception as e:
         log_warning(f"Index creation warning: {e}")
 
     # Get configuration from environment variables
-    debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', 5000))
 
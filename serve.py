@@ -0,0 +1,34 @@
+"""
+🌱 FARMING APP - Production Server 🌱
+
+Runs the Farming App under gunicorn with multiple pre-forked worker processes.
+Configuration lives in gunicorn.conf.py and can be tuned with environment variables
+(WORKER_CLASS, WEB_CONCURRENCY, WORKER_THREADS, GRACEFUL_TIMEOUT, ...).
+
+Usage:
+    python serve.py [extra gunicorn options]
+
+Graceful reload:   kill -HUP <master pid>
+Graceful shutdown: kill -TERM <master pid>
+"""
+
+import sys
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from utils.logger import log_error, log_info, log_startup
+
+try:
+    from gunicorn.app.wsgiapp import run
+except ImportError:
+    log_error("gunicorn is not installed. Install with: pip install gunicorn")
+    log_info("On Windows, use 'python main.py' for local development instead.")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    log_startup()
+    config_path = current_dir / 'gunicorn.conf.py'
+    sys.argv = ['gunicorn', '--config', str(config_path), '--chdir', str(current_dir)] + sys.argv[1:] + ['wsgi:app']
+    run()
@@ -0,0 +1,41 @@
+// Live listing changes from /api/crops/stream (Server-Sent Events)
+//
+// subscribeCropFeed(onChange, onReset) calls onChange({type, crop_id, fields}) for every
+// change (type is 'new', 'updated', 'sold_out' or 'removed') and onReset() when the
+// page missed changes and should reload its list. The browser reconnects on its own and
+// resumes from the last event it received. Without EventSource support, or when the
+// server has no stream slot free (503), onReset is called on a slow timer instead.
+
+const CROP_FEED_URL = '/api/crops/stream';
+const CROP_FEED_FALLBACK_INTERVAL = 60000;  // ms between full reloads without a stream
+
+function subscribeCropFeed(onChange, onReset) {
+    if (typeof EventSource === 'undefined') {
+        const timer = setInterval(onReset, CROP_FEED_FALLBACK_INTERVAL);
+        return () => clearInterval(timer);
+    }
+
+    let timer = null;
+    const source = new EventSource(CROP_FEED_URL);
+    source.addEventListener('error', () => {
+        // A refused stream (e.g. 503) is not retried by the browser: fall back to polling
+        if (source.readyState === EventSource.CLOSED && timer === null) {
+            timer = setInterval(onReset, CROP_FEED_FALLBACK_INTERVAL);
+        }
+    });
+    source.addEventListener('crop', (event) => {
+        try {
+            onChange(JSON.parse(event.data));
+        } catch (error) {
+            console.error('Error applying listing change:', error);
+        }
+    });
+    source.addEventListener('reset', () => onReset());
+
+    return () => {
+        source.close();
+        if (timer !== null) {
+            clearInterval(timer);
+        }
+    };
+}
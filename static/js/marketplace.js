@@ -1,5 +1,10 @@
 // Crop Marketplace functionality
-// Note: Crop data is now fetched from the database via API calls
+// Note: Crop data is now fetched from the database via API calls, then kept current
+// from the listing change feed (static/js/crop_feed.js) instead of re-fetching
+
+// Crops shown in the buy tab, by id
+const cropsById = new Map();
+let stopCropFeed = null;
 
 // Tab Switching Functionality
 function switchTab(tabName) {
@@ -40,9 +45,11 @@ function loadCrops() {
         .then(response => response.json())
         .then(data => {
             cropsGrid.innerHTML = '';
+            cropsById.clear();
             
             if (data.success && data.crops.length > 0) {
                 data.crops.forEach(crop => {
+                    cropsById.set(crop._id, crop);
                     const cropCard = createCropCard(crop);
                     cropsGrid.appendChild(cropCard);
                 });
@@ -52,6 +59,11 @@ function loadCrops() {
             
             // Re-attach event listeners for new crop cards
             attachEventListeners();
+            
+            // Follow listing changes from now on (a reset from the feed reloads the list)
+            if (!stopCropFeed && typeof subscribeCropFeed === 'function') {
+                stopCropFeed = subscribeCropFeed(applyCropChange, loadCrops);
+            }
         })
         .catch(error => {
             console.error('Error loading crops:', error);
@@ -59,10 +71,40 @@ function loadCrops() {
         });
 }
 
+// Apply one listing change from the feed to the buy tab
+function applyCropChange(change) {
+    const cropsGrid = document.getElementById('crops-grid');
+    if (!cropsGrid) return;
+    
+    const card = cropsGrid.querySelector(`[data-crop-id="${change.crop_id}"]`);
+    if (change.type === 'removed') {
+        cropsById.delete(change.crop_id);
+        if (card) card.remove();
+        return;
+    }
+    
+    // Updates carry only the changed fields; listings not shown here are ignored
+    const known = cropsById.get(change.crop_id);
+    if (!known && change.type !== 'new') return;
+    const crop = Object.assign({}, known, change.fields, { _id: change.crop_id });
+    cropsById.set(crop._id, crop);
+    
+    const newCard = createCropCard(crop);
+    if (card) {
+        card.replaceWith(newCard);
+    } else {
+        cropsGrid.querySelector('.no-crops')?.remove();
+        cropsGrid.prepend(newCard);
+    }
+    attachEventListeners();
+}
+
 // Create crop card element
 function createCropCard(crop) {
     const card = document.createElement('div');
     card.className = 'crop-card';
+    card.dataset.cropId = crop._id;
+    if (!crop.is_active || crop.quantity === 0) card.classList.add('sold-out');
     
     // Get appropriate emoji based on category
     let emoji = '🌱';
@@ -276,11 +318,8 @@ function deleteListing(cropId) {
         .then(data => {
             if (data.success) {
                 alert('Listing deleted successfully!');
-                // Refresh both my listings and buy tab
+                // The buy tab drops the listing when the change feed reports it removed
                 loadMyListings();
-                if (document.getElementById('buy-content') && !document.getElementById('buy-content').classList.contains('hidden')) {
-                    loadCrops();
-                }
             } else {
                 alert('Error: ' + data.error);
             }
@@ -0,0 +1,199 @@
+"""
+Static Asset Pipeline for Farming App
+Loads CSS/JS assets into memory once, precompresses them and serves them with
+content-hash fingerprinted URLs and long-lived caching headers.
+
+Usage:
+    assets = AssetRegistry(base_dir, {'': 'webpage', 'static/js/': 'static/js'})
+    assets.url_for('static/js/main.js')   # -> /static/js/main.1a2b3c4d.js
+    assets.serve('static/js/main.1a2b3c4d.js')
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import request, Response
+
+# Brotli is optional; gzip is always available
+BROTLI_AVAILABLE = False
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+FINGERPRINT_LENGTH = 8
+FINGERPRINT_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<fingerprint>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH)
+ASSET_EXTENSIONS = {'.css', '.js'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+MIN_COMPRESS_SIZE = 512  # Tiny files are not worth compressing
+
+
+class Asset:
+    """A single in-memory asset with its precompressed variants"""
+
+    def __init__(self, name, path, body, mtime):
+        self.name = name
+        self.path = path  # None for assets generated in memory
+        self.mtime = mtime
+        self.body = body
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type.endswith('javascript'):
+            self.content_type += '; charset=utf-8'
+        digest = hashlib.sha256(body).hexdigest()
+        self.fingerprint = digest[:FINGERPRINT_LENGTH]
+        self.etag = digest[:16]
+
+        # Precompress once; keep a variant only if it is actually smaller
+        self.encoded = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.encoded['gzip'] = gzipped
+            if BROTLI_AVAILABLE:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encoded['br'] = compressed
+
+    @property
+    def fingerprinted_name(self):
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.fingerprint}{ext}"
+
+
+class AssetRegistry:
+    """In-memory registry of static assets.
+
+    Args:
+        base_dir: project root directory
+        mounts: {url prefix: directory relative to base_dir}
+        watch: reload assets from disk when they change (development mode)
+    """
+
+    def __init__(self, base_dir, mounts, watch=False):
+        self.base_dir = base_dir
+        self.mounts = mounts
+        self.watch = watch
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        """Load every asset under the mounted directories. Returns number of assets loaded"""
+        assets = {}
+        for prefix, directory in self.mounts.items():
+            root = os.path.join(self.base_dir, directory)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1] not in ASSET_EXTENSIONS:
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    name = prefix + os.path.relpath(path, root).replace(os.sep, '/')
+                    assets[name] = self._load(name, path)
+        with self._lock:
+            # Keep generated assets; they are not backed by files
+            assets.update({name: asset for name, asset in self._assets.items() if asset.path is None})
+            self._assets = assets
+        return len(assets)
+
+    def add(self, name, body):
+        """Register an asset generated in memory (e.g. a JSON bundle)"""
+        asset = Asset(name, None, body, None)
+        with self._lock:
+            self._assets[name] = asset
+        return asset
+
+    def _load(self, name, path):
+        with open(path, 'rb') as f:
+            body = f.read()
+        return Asset(name, path, body, os.path.getmtime(path))
+
+    def _path_for(self, name):
+        """Map an asset name back to a file path (used in watch mode for new files)"""
+        for prefix, directory in self.mounts.items():
+            if prefix and not name.startswith(prefix):
+                continue
+            relative = name[len(prefix):]
+            root = os.path.abspath(os.path.join(self.base_dir, directory))
+            path = os.path.abspath(os.path.join(root, relative))
+            if path.startswith(root + os.sep) and os.path.splitext(path)[1] in ASSET_EXTENSIONS:
+                return path
+        return None
+
+    def get(self, name):
+        """Get an asset by name, reloading it first in watch mode if the file changed"""
+        asset = self._assets.get(name)
+        if not self.watch or (asset and asset.path is None):
+            return asset
+
+        path = asset.path if asset else self._path_for(name)
+        if not path:
+            return None
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            with self._lock:
+                self._assets.pop(name, None)
+            return None
+        if asset is None or mtime != asset.mtime:
+            asset = self._load(name, path)
+            with self._lock:
+                self._assets[name] = asset
+        return asset
+
+    def resolve(self, requested):
+        """Resolve a requested name. Returns (asset, fingerprint matched)"""
+        asset = self.get(requested)
+        if asset:
+            return asset, False
+
+        match = FINGERPRINT_PATTERN.match(requested)
+        if not match:
+            return None, False
+        asset = self.get(match.group('stem') + match.group('ext'))
+        if not asset:
+            return None, False
+        # A stale fingerprint still gets the current content, but must not be cached forever
+        return asset, match.group('fingerprint') == asset.fingerprint
+
+    def url_for(self, name):
+        """Get the fingerprinted URL of an asset (falls back to the plain URL if unknown)"""
+        asset = self.get(name)
+        if not asset:
+            return '/' + name
+        return '/' + asset.fingerprinted_name
+
+    def serve(self, requested):
+        """Build a response for a requested asset name, or None if there is no such asset"""
+        asset, immutable = self.resolve(requested)
+        if not asset:
+            return None
+
+        headers = {
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding',
+        }
+
+        body = asset.body
+        etag = asset.etag
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.encoded and accepted[encoding]:
+                body = asset.encoded[encoding]
+                headers['Content-Encoding'] = encoding
+                # Each encoding is a different representation, so caches must not mix them up
+                etag = f"{asset.etag}-{encoding}"
+                break
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            return response
+
+        response = Response(body, status=200, headers=headers, content_type=asset.content_type)
+        response.set_etag(etag)
+        return response
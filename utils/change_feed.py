@@ -0,0 +1,184 @@
+"""
+Listing Change Feed for Farming App
+Pushes small crop listing diffs (new, updated, sold out, removed) to marketplace pages
+over Server-Sent Events, so clients don't re-fetch the whole list to stay fresh.
+
+Every worker process keeps a short buffer of recent events. It is filled from a MongoDB
+change stream on the crops collection when the database supports them (replica sets),
+which also carries writes made by other workers and nodes. Without change streams the
+write paths publish directly into the buffer, which only reaches clients of the same
+process.
+
+Event ids are '<process token>-<sequence>', so a reconnecting client (Last-Event-ID)
+resumes where it left off, or is told to reload when it lands on another process or
+fell too far behind.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.json_provider import encode_json
+from utils.repositories import CROP_FIELDS, crop_record
+
+EVENT_TYPES = ('new', 'updated', 'sold_out', 'removed')
+BUFFER_SIZE = 1000  # Recent events kept for resuming clients
+
+
+def crop_event(change):
+    """Turn a crops change stream document into a feed event (None for other operations)"""
+    operation = change['operationType']
+    crop_id = str(change['documentKey']['_id'])
+    if operation == 'insert':
+        return {'type': 'new', 'crop_id': crop_id, 'fields': crop_record(change['fullDocument'])}
+    if operation == 'delete':
+        return {'type': 'removed', 'crop_id': crop_id, 'fields': {}}
+    if operation == 'replace':
+        fields = crop_record(change['fullDocument'])
+    elif operation == 'update':
+        updated = change.get('updateDescription', {}).get('updatedFields', {})
+        fields = {field: value for field, value in updated.items() if field in CROP_FIELDS}
+        if not fields:
+            return None
+    else:
+        return None
+    return {'type': change_type(fields), 'crop_id': crop_id, 'fields': fields}
+
+
+def change_type(fields):
+    """'sold_out' if an update takes a listing off the market, otherwise 'updated'"""
+    if fields.get('is_active') is False or fields.get('quantity') == 0:
+        return 'sold_out'
+    return 'updated'
+
+
+class ChangeFeed:
+    """Per-process buffer of listing events with blocking subscribers.
+
+    Args:
+        max_clients: concurrent SSE streams served by this process (each holds a worker thread)
+        heartbeat: seconds between keep-alive comments on an idle stream
+        max_seconds: seconds before a stream is closed so the client reconnects (and frees the thread)
+    """
+
+    def __init__(self, max_clients=50, heartbeat=15, max_seconds=300):
+        self.max_clients = max_clients
+        self.heartbeat = heartbeat
+        self.max_seconds = max_seconds
+        self.streaming = False  # True while a change stream feeds this process
+        self.clients = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._events = deque(maxlen=BUFFER_SIZE)
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def publish(self, event_type, crop_id, fields=None):
+        """Add an event and wake every subscriber. Returns the event id"""
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, encode_json({
+                'type': event_type, 'crop_id': str(crop_id), 'fields': fields or {}
+            })))
+            self._condition.notify_all()
+            return f"{self._token}-{self._seq}"
+
+    def publish_local(self, event_type, crop_id, fields=None):
+        """Publish a change made by this process, unless the change stream will deliver it"""
+        if not self.streaming:
+            self.publish(event_type, crop_id, fields)
+
+    def _resume_from(self, last_event_id):
+        """Sequence number to resume after, or None if the client must reload"""
+        if not last_event_id:
+            return self._seq
+        token, _, seq = last_event_id.partition('-')
+        if token != self._token or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if not oldest - 1 <= seq <= self._seq:
+            return None  # Events after seq were dropped from the buffer
+        return seq
+
+    def try_connect(self):
+        """Reserve a client slot. Returns False when this process is serving max_clients streams"""
+        with self._condition:
+            if self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+            return True
+
+    def disconnect(self):
+        """Release the slot reserved by try_connect() (when the response is closed)"""
+        with self._condition:
+            self.clients -= 1
+
+    def stream(self, last_event_id=None):
+        """SSE text for one client, starting after last_event_id (a generator)"""
+        with self._condition:
+            cursor = self._resume_from(last_event_id)
+            reset = cursor is None
+            if reset:
+                # The client missed events it can't get back: have it reload the full list once
+                cursor = self._seq
+        return self._events_after(cursor, reset)
+
+    def _events_after(self, cursor, reset):
+        yield "retry: 3000\n\n"
+        if reset:
+            yield f"id: {self._token}-{cursor}\nevent: reset\ndata: {{}}\n\n"
+
+        deadline = time.monotonic() + self.max_seconds
+        while not self._closed and time.monotonic() < deadline:
+            with self._condition:
+                self._condition.wait_for(lambda: self._seq > cursor or self._closed, timeout=self.heartbeat)
+                events = [(seq, data) for seq, data in self._events if seq > cursor]
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            cursor = events[-1][0]
+            yield ''.join(f"id: {self._token}-{seq}\nevent: crop\ndata: {data.decode('utf-8')}\n\n"
+                          for seq, data in events)
+
+    def close(self):
+        """End every open stream (on shutdown)"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def watch(self, collection, stop_event, logger, retry_seconds=5):
+        """
+        Feed events from a change stream on collection until stop_event is set (background
+        thread target). Returns early, leaving the write paths to publish, if the database
+        doesn't support change streams.
+        """
+        resume_token = None
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        while not stop_event.is_set():
+            try:
+                with collection.watch(pipeline, full_document='updateLookup', resume_after=resume_token,
+                                      max_await_time_ms=1000) as changes:
+                    self.streaming = True
+                    logger.info("Listing change feed is following the crops change stream")
+                    while changes.alive and not stop_event.is_set():
+                        change = changes.try_next()
+                        if change is None:
+                            continue
+                        resume_token = changes.resume_token
+                        event = crop_event(change)
+                        if event:
+                            self.publish(event['type'], event['crop_id'], event['fields'])
+            except (OperationFailure, NotImplementedError) as e:
+                # Standalone servers (and test fakes) have no change streams
+                self.streaming = False
+                logger.info(f"Change streams unavailable ({e}); listing changes are published in-process")
+                return
+            except PyMongoError as e:
+                self.streaming = False
+                logger.error(f"Listing change stream interrupted: {e}")
+                stop_event.wait(retry_seconds)
+        self.streaming = False
@@ -0,0 +1,51 @@
+"""
+Conditional GET Helpers for Farming App
+Answers If-None-Match / If-Modified-Since on read APIs from a cheap dataset version
+token, without querying or serializing the payload when the client is up to date.
+"""
+
+import hashlib
+
+from flask import request, make_response
+
+# Clients may reuse a cached copy but must revalidate it on every use
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def version_etag(name, version, extra=''):
+    """Build an ETag from a dataset name, its version and request-specific parts (filters)"""
+    token = f"{name}:{version}:{extra}:{request.query_string.decode('latin-1')}"
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:20]
+
+
+def is_not_modified(etag, last_modified=None):
+    """Check the request's conditional headers against an ETag and last-modified time"""
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(tzinfo=request.if_modified_since.tzinfo) <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag, last_modified, build_response):
+    """
+    Return 304 if the client copy is current, otherwise build the full response.
+
+    Args:
+        etag: version token for the requested data
+        last_modified: naive UTC datetime of the last write, or None
+        build_response: callable returning the full response (only called on a miss)
+    """
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build_response())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    return response
@@ -0,0 +1,178 @@
+"""
+Bulk Crop Import for Farming App
+Creates and updates many crop listings from one JSON array or CSV upload.
+
+Rows are validated column by column, then written in two unordered batches: new
+listings with insert_many and updates with bulk_write. Every row gets its own result,
+so one bad row doesn't fail the rest.
+"""
+
+import csv
+import io
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+TEXT_FIELDS = ('name', 'category', 'location', 'description')
+NUMBER_FIELDS = {'quantity': int, 'price_per_kg': float}
+IMPORT_FIELDS = TEXT_FIELDS + tuple(NUMBER_FIELDS)
+ID_FIELDS = ('_id', 'id')
+
+
+def rows_from_csv(text):
+    """Parse CSV text with a header row into a list of dicts (blank cells are dropped)"""
+    reader = csv.DictReader(io.StringIO(text))
+    return [{key.strip(): value for key, value in row.items() if key and value not in (None, '')} for row in reader]
+
+
+def _to_number(value, convert):
+    """Convert a JSON or CSV value to int/float, or raise ValueError"""
+    if isinstance(value, bool):
+        raise ValueError
+    if convert is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    if convert is int and isinstance(value, str):
+        value = float(value.strip())
+        if not value.is_integer():
+            raise ValueError
+    number = convert(value)
+    if number != number or number < 0:  # NaN or negative
+        raise ValueError
+    return number
+
+
+def validate_rows(rows):
+    """
+    Validate import rows column by column.
+
+    Returns (creates, updates, errors):
+        creates: [(row index, fields)] for rows without an id (all fields required)
+        updates: [(row index, ObjectId, fields)] for rows with an id (only the given fields)
+        errors: {row index: message}
+    """
+    errors = {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = "Row must be an object"
+    row_ids = {}
+    for index, row in enumerate(rows):
+        if index in errors:
+            continue
+        raw_id = next((row[key] for key in ID_FIELDS if row.get(key)), None)
+        if raw_id is None:
+            continue
+        if not ObjectId.is_valid(str(raw_id)):
+            errors[index] = f"Invalid id: {raw_id}"
+        else:
+            row_ids[index] = ObjectId(str(raw_id))
+
+    fields = {index: {} for index in range(len(rows)) if index not in errors}
+
+    for field in TEXT_FIELDS:
+        for index in list(fields):
+            value = rows[index].get(field)
+            if value is None:
+                if index not in row_ids:
+                    errors[index] = f"Missing required field: {field}"
+                    del fields[index]
+                continue
+            if not isinstance(value, str) or not value.strip():
+                errors[index] = f"Invalid {field}: must be a non-empty string"
+                del fields[index]
+                continue
+            fields[index][field] = value.strip()
+
+    for field, convert in NUMBER_FIELDS.items():
+        for index in list(fields):
+            value = rows[index].get(field)
+            if value is None:
+                if index not in row_ids:
+                    errors[index] = f"Missing required field: {field}"
+                    del fields[index]
+                continue
+            try:
+                fields[index][field] = _to_number(value, convert)
+            except (TypeError, ValueError):
+                kind = 'whole number' if convert is int else 'number'
+                errors[index] = f"Invalid {field}: must be a non-negative {kind}"
+                del fields[index]
+
+    for index in list(fields):
+        if index in row_ids and not fields[index]:
+            errors[index] = f"Nothing to update: give at least one of {', '.join(IMPORT_FIELDS)}"
+            del fields[index]
+
+    creates = [(index, values) for index, values in fields.items() if index not in row_ids]
+    updates = [(index, row_ids[index], values) for index, values in fields.items() if index in row_ids]
+    return creates, updates, errors
+
+
+def _literal_pipeline(values):
+    """Update pipeline that sets values and recomputes total_price from the stored document"""
+    return [
+        {'$set': {field: {'$literal': value} for field, value in values.items()}},
+        {'$set': {'total_price': {'$multiply': ['$quantity', '$price_per_kg']}}},
+    ]
+
+
+def import_crops(repository, rows, seller, now=None, on_created=None, locate=None):
+    """
+    Create and update crop listings for one seller.
+
+    Args:
+        repository: CropRepository
+        rows: list of row dicts (from JSON or rows_from_csv)
+        seller: seller snapshot fields (seller_name, seller_email, seller_phone, seller_location)
+        on_created: optional callback, called with the inserted listings
+        locate: optional function mapping a location to a GeoJSON point, stored as location_point
+    Returns (results, summary) where results has one {"row", "status", "id"/"error"} per row
+    """
+    now = now or datetime.utcnow()
+    creates, updates, errors = validate_rows(rows)
+    if locate:
+        for values in [values for _, values in creates] + [values for _, _, values in updates]:
+            if 'location' in values:
+                values['location_point'] = locate(values['location'])
+    results = {index: {'row': index, 'status': 'error', 'error': message} for index, message in errors.items()}
+
+    if creates:
+        documents = [
+            dict(values, total_price=values['quantity'] * values['price_per_kg'],
+                 is_active=True, created_at=now, **seller)
+            for _, values in creates
+        ]
+        failed = repository.insert_many(documents)
+        for position, (index, _) in enumerate(creates):
+            if position in failed:
+                results[index] = {'row': index, 'status': 'error', 'error': failed[position]}
+            else:
+                results[index] = {'row': index, 'status': 'created', 'id': str(documents[position]['_id'])}
+        if on_created and len(failed) < len(documents):
+            on_created([doc for position, doc in enumerate(documents) if position not in failed])
+
+    if updates:
+        crop_ids = [crop_id for _, crop_id, _ in updates]
+        # Sellers can only update their own listings
+        owned = {crop['_id'] for crop in repository.list(
+            {'_id': {'$in': crop_ids}, 'seller_email': seller['seller_email']}, {'_id': 1}
+        )}
+        requests = [
+            UpdateOne({'_id': crop_id, 'seller_email': seller['seller_email']},
+                      _literal_pipeline(dict(values, updated_at=now)))
+            for _, crop_id, values in updates
+        ]
+        failed = repository.bulk_write(requests)
+        for position, (index, crop_id, _) in enumerate(updates):
+            if str(crop_id) not in owned:
+                results[index] = {'row': index, 'status': 'error', 'id': str(crop_id), 'error': "Crop listing not found"}
+            elif position in failed:
+                results[index] = {'row': index, 'status': 'error', 'id': str(crop_id), 'error': failed[position]}
+            else:
+                results[index] = {'row': index, 'status': 'updated', 'id': str(crop_id)}
+
+    ordered_results = [results[index] for index in range(len(rows))]
+    summary = {'total': len(rows), 'created': 0, 'updated': 0, 'errors': 0}
+    for result in ordered_results:
+        summary['errors' if result['status'] == 'error' else result['status']] += 1
+    return ordered_results, summary
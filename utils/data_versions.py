@@ -0,0 +1,59 @@
+"""
+Data Versions for Farming App
+Keeps a version counter and last-modified time per dataset (crops, market_updates, ...)
+in a small MongoDB collection. Write paths bump the version; caches and ETags key on it,
+so every app node sees an invalidation as soon as its local copy of the version expires.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+
+class DataVersions:
+    """Shared per-dataset version counters.
+
+    Args:
+        collection: MongoDB collection holding one {_id: name, version: n} document per dataset
+        ttl: seconds a version read from MongoDB is trusted locally (bumps on this node are seen immediately)
+    """
+
+    def __init__(self, collection, ttl=1.0):
+        self.collection = collection
+        self.ttl = ttl
+        self._local = {}  # {name: (version, updated_at, fetched_at)}
+        self._lock = threading.Lock()
+
+    def info(self, name):
+        """Get (version, last modified datetime or None) of a dataset"""
+        cached = self._local.get(name)
+        now = time.monotonic()
+        if cached and now - cached[2] < self.ttl:
+            return cached[0], cached[1]
+
+        doc = self.collection.find_one({'_id': name}, {'version': 1, 'updated_at': 1})
+        version = doc.get('version', 0) if doc else 0
+        updated_at = doc.get('updated_at') if doc else None
+        with self._lock:
+            self._local[name] = (version, updated_at, now)
+        return version, updated_at
+
+    def get(self, name):
+        """Get the current version of a dataset"""
+        return self.info(name)[0]
+
+    def bump(self, name):
+        """Increment the version of a dataset after a write. Returns the new version"""
+        doc = self.collection.find_one_and_update(
+            {'_id': name},
+            # HTTP dates have second resolution, so store whole seconds
+            {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow().replace(microsecond=0)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        version = doc['version']
+        with self._lock:
+            self._local[name] = (version, doc['updated_at'], time.monotonic())
+        return version
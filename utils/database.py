@@ -0,0 +1,358 @@
+"""
+MongoDB Access for Farming App
+One shared MongoClient per process, created lazily on first use.
+
+Collections are handed out as LazyCollection proxies, so modules can hold references
+to them at import time without connecting to MongoDB (fast startup, fork-safe).
+
+The client is tuned from the environment (see client_options): pool size and wait
+queue, per-operation timeouts and write concern. Catalog reads (public listings) can be
+routed to secondaries with catalog_collection(), and pool statistics are collected by
+a connection pool listener.
+"""
+
+import os
+import threading
+import time
+
+import pymongo
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# PyMongo >= 4.9 ships a native asyncio client (used by the async repositories)
+try:
+    from pymongo import AsyncMongoClient
+    ASYNC_CLIENT_AVAILABLE = True
+except ImportError:
+    ASYNC_CLIENT_AVAILABLE = False
+
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primarypreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondarypreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def client_options():
+    """
+    MongoClient options from the environment.
+
+    Environment variables:
+        MONGO_MAX_POOL_SIZE: connections per server per process (default 50)
+        MONGO_MIN_POOL_SIZE: connections kept open when idle (default 0)
+        MONGO_MAX_IDLE_TIME_MS: close connections idle this long (default 60000)
+        MONGO_TIMEOUT_MS: deadline for each operation, including waiting for a pooled
+            connection, server selection and the network round trip (default 5000)
+        MONGO_SERVER_SELECTION_TIMEOUT_MS: give up finding a server after this long (default 3000)
+        MONGO_CONNECT_TIMEOUT_MS: TCP connect timeout (default 3000)
+        MONGO_WRITE_CONCERN: 'majority' (default) or a number of nodes, e.g. 1
+        MONGO_WRITE_JOURNAL: 'True' to wait for the journal on writes (default: server default)
+    Settings given here take precedence over the same options in MONGO_URI.
+
+    MONGO_TIMEOUT_MS suits request handlers. Work that scans or writes many documents
+    replaces it with its own deadline for the whole block: background jobs (migrations,
+    aggregate rebuilds, price bands, seller snapshots) run under job_timeout() and bulk
+    endpoints (crop import) under bulk_timeout().
+    """
+    options = {
+        'maxPoolSize': _env_int('MONGO_MAX_POOL_SIZE', 50),
+        'minPoolSize': _env_int('MONGO_MIN_POOL_SIZE', 0),
+        'maxIdleTimeMS': _env_int('MONGO_MAX_IDLE_TIME_MS', 60000),
+        'timeoutMS': _env_int('MONGO_TIMEOUT_MS', 5000),
+        'serverSelectionTimeoutMS': _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 3000),
+        'connectTimeoutMS': _env_int('MONGO_CONNECT_TIMEOUT_MS', 3000),
+        'retryWrites': True,
+        'retryReads': True,
+    }
+
+    write_concern = os.getenv('MONGO_WRITE_CONCERN', 'majority')
+    options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+    journal = os.getenv('MONGO_WRITE_JOURNAL')
+    if journal:
+        options['journal'] = journal.lower() == 'true'
+    return options
+
+
+def job_timeout():
+    """
+    Deadline for a block of background work that scans whole collections (migrations,
+    aggregate rebuilds), used as `with job_timeout():` in place of MONGO_TIMEOUT_MS.
+
+    Environment variables:
+        MONGO_JOB_TIMEOUT_MS: deadline for the whole block (default 600000)
+    """
+    return pymongo.timeout(_env_int('MONGO_JOB_TIMEOUT_MS', 600000) / 1000)
+
+
+def bulk_timeout():
+    """
+    Deadline for the database work of one bulk request (e.g. importing thousands of
+    listings), used as `with bulk_timeout():` in place of MONGO_TIMEOUT_MS.
+
+    Environment variables:
+        MONGO_BULK_TIMEOUT_MS: deadline for the whole block (default 30000, within the
+            gunicorn worker timeout)
+    """
+    return pymongo.timeout(_env_int('MONGO_BULK_TIMEOUT_MS', 30000) / 1000)
+
+
+def catalog_read_preference():
+    """
+    Read preference for catalog reads (public crop, market update and story listings).
+
+    Environment variables:
+        MONGO_CATALOG_READ_PREFERENCE: primary, primaryPreferred, secondary,
+            secondaryPreferred (default) or nearest
+        MONGO_MAX_STALENESS_SECONDS: skip secondaries lagging more than this (min 90, default off)
+    """
+    name = os.getenv('MONGO_CATALOG_READ_PREFERENCE', 'secondaryPreferred')
+    mode = READ_PREFERENCES.get(name.lower())
+    if mode is None:
+        raise ValueError(f"Unknown MONGO_CATALOG_READ_PREFERENCE: {name}")
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=_env_int('MONGO_MAX_STALENESS_SECONDS', -1))
+
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool counters, summed over every server the client talks to"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = {}  # {thread id: perf_counter}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.in_use = 0
+            self.created = 0
+            self.closed = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_wait_seconds = 0.0
+            self.max_checkout_wait_seconds = 0.0
+            self.pool_clears = 0
+
+    def snapshot(self):
+        """Get the counters as a dict"""
+        with self._lock:
+            return {
+                'open': self.open,
+                'in_use': self.in_use,
+                'created': self.created,
+                'closed': self.closed,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_checkout_wait_ms': round(self.checkout_wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_checkout_wait_ms': round(self.max_checkout_wait_seconds * 1000, 3),
+                'pool_clears': self.pool_clears,
+            }
+
+    def _checkout_finished(self):
+        started = self._checkout_started.pop(threading.get_ident(), None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        self._checkout_started[threading.get_ident()] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._checkout_finished()
+        with self._lock:
+            self.checkout_failures += 1
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, waited)
+
+    def connection_checked_out(self, event):
+        waited = self._checkout_finished()
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.checkout_wait_seconds += waited
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+
+class Database:
+    """Lazily created, shared MongoDB client and database.
+
+    Usage:
+        mongo = Database()
+        users_collection = mongo.collection('users')   # no connection yet
+        mongo.init_app(app)                            # reads MONGO_URI / DB_NAME
+        users_collection.find_one({...})               # client created here
+    """
+
+    def __init__(self):
+        self.uri = None
+        self.db_name = None
+        self.options = {}
+        self.catalog_read_preference = Primary()
+        self.pool_stats = PoolStats()
+        self.event_listeners = []  # Extra PyMongo listeners (e.g. command metrics)
+        self._client = None
+        self._pid = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read connection settings from the app config and environment (does not connect)"""
+        uri = app.config['MONGO_URI']
+        options = dict(client_options(), **app.config.get('MONGO_OPTIONS', {}))
+        if (uri, options) != (self.uri, self.options):
+            # Clients made with the old settings would keep talking to the old server
+            self.close()
+        self.uri = uri
+        self.options = options
+        self.db_name = app.config.get('DB_NAME', 'farming')
+        self.catalog_read_preference = catalog_read_preference()
+        app.extensions['mongo'] = self
+
+    def add_event_listener(self, listener):
+        """Register a PyMongo event listener for clients created from now on"""
+        self.event_listeners.append(listener)
+
+    @property
+    def client(self):
+        """The shared MongoClient, created on first use (and again after a fork)"""
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    if not self.uri:
+                        raise RuntimeError("Database is not initialized. Call init_app() first.")
+                    # A forked child inherits the parent's counters but none of its connections
+                    self.pool_stats.reset()
+                    self._client = MongoClient(self.uri, connect=False,
+                                               event_listeners=[self.pool_stats, *self.event_listeners], **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def collection(self, name):
+        """Get a lazy proxy for a collection (reads go to the primary)"""
+        return LazyCollection(self, name)
+
+    def catalog_collection(self, name):
+        """Get a lazy proxy for a collection whose reads use the catalog read preference.
+
+        Catalog reads may trail recent writes by the replication lag; use collection()
+        wherever a user must see their own write immediately.
+        """
+        return LazyCollection(self, name, catalog=True)
+
+    @property
+    def async_client(self):
+        """Shared AsyncMongoClient for asyncio code, created on first use.
+
+        It is bound to the event loop it is first used on, so use it from a single loop.
+        """
+        if not ASYNC_CLIENT_AVAILABLE:
+            raise RuntimeError("This PyMongo version has no AsyncMongoClient. Install with: pip install 'pymongo>=4.9'")
+        if self._async_client is None or self._async_client[1] != os.getpid():
+            with self._lock:
+                if self._async_client is None or self._async_client[1] != os.getpid():
+                    if not self.uri:
+                        raise RuntimeError("Database is not initialized. Call init_app() first.")
+                    client = AsyncMongoClient(self.uri, connect=False, event_listeners=self.event_listeners,
+                                              **self.options)
+                    self._async_client = (client, os.getpid())
+        return self._async_client[0]
+
+    def async_collection(self, name, catalog=False):
+        """Get an asyncio collection (optionally with the catalog read preference)"""
+        collection = self.async_client[self.db_name][name]
+        if catalog:
+            collection = collection.with_options(read_preference=self.catalog_read_preference)
+        return collection
+
+    def pool_status(self):
+        """Pool configuration and counters for health checks"""
+        return {
+            'max_pool_size': self.options.get('maxPoolSize'),
+            'min_pool_size': self.options.get('minPoolSize'),
+            'timeout_ms': self.options.get('timeoutMS'),
+            'catalog_read_preference': self.catalog_read_preference.mongos_mode,
+            **self.pool_stats.snapshot()
+        }
+
+    def close(self):
+        """Close the client; the next use creates new clients"""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+            # The async client can only be closed from its event loop; dropping it lets it be collected
+            self._async_client = None
+
+
+class LazyCollection:
+    """Proxy that resolves to a pymongo Collection on first attribute access"""
+
+    def __init__(self, database, name, catalog=False):
+        self._database = database
+        self._name = name
+        self._catalog = catalog
+        self._resolved = (None, None)  # ((client, db name, read preference), collection)
+
+    @property
+    def name(self):
+        return self._name
+
+    def _collection(self):
+        database = self._database
+        read_preference = database.catalog_read_preference if self._catalog else None
+        key = (database.client, database.db_name, read_preference)
+        cached_key, collection = self._resolved
+        # Identity checks keep the hot path cheap; init_app() replaces all three when settings change
+        if cached_key is None or any(a is not b for a, b in zip(cached_key, key)):
+            collection = key[0][key[1]][self._name]
+            if self._catalog:
+                collection = collection.with_options(read_preference=read_preference)
+            self._resolved = (key, collection)
+        return collection
+
+    def __getattr__(self, attr):
+        return getattr(self._collection(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
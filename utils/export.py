@@ -0,0 +1,91 @@
+"""
+Data Export for Farming App
+Streams whole collections as NDJSON or CSV with constant memory.
+
+Documents are read in _id order, one short query per batch (Repository.batches), so
+an export never holds a long-lived cursor and can be resumed after the last _id received.
+A 'since' time limits the export to documents created or updated after it, for
+incremental pulls.
+"""
+
+import csv
+import io
+from datetime import date, datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from utils.json_provider import encode_json
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def parse_since(value):
+    """Parse an ISO 8601 'since' value into a naive UTC datetime (None if empty)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def parse_after(value):
+    """Parse an 'after' resume token (the last _id received) into an ObjectId (None if empty)"""
+    if not value:
+        return None
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid 'after' value: {value}")
+
+
+def export_query(since=None, time_fields=('created_at', 'updated_at')):
+    """Build the filter for documents created or updated at or after since"""
+    if since is None:
+        return {}
+    return {'$or': [{field: {'$gte': since}} for field in time_fields]}
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return encode_json(value).decode('utf-8')
+    return value
+
+
+def _field(doc, path):
+    """Get a possibly dotted field (e.g. 'profile.location') from a document"""
+    for part in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def ndjson_chunks(batches):
+    """One NDJSON chunk (bytes) per batch of documents"""
+    for batch in batches:
+        yield b''.join(encode_json(doc) + b'\n' for doc in batch)
+
+
+def csv_chunks(batches, fields):
+    """A header row, then one CSV chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['_id'] + list(fields))
+    for batch in batches:
+        for doc in batch:
+            writer.writerow([doc['_id']] + [_csv_value(_field(doc, field)) for field in fields])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
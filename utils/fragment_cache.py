@@ -0,0 +1,51 @@
+"""
+Template Fragment Cache for Farming App
+A small in-process LRU cache for rendered HTML fragments (listing cards, update cards).
+Keys include the dataset version, so writes invalidate entries without explicit purges.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered fragments.
+
+    Args:
+        max_entries: maximum number of fragments kept in memory
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """Get a cached fragment, or render and cache it"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Render outside the lock; concurrent misses render the same value, which is harmless
+        value = render()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace):
+        """Drop every fragment whose key starts with a namespace"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
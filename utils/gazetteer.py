@@ -0,0 +1,131 @@
+"""
+Gazetteer for Farming App
+Turns free-text locations ("Nashik, Maharashtra", "गुंटूर, आंध्र प्रदेश", "near Karnal")
+into coordinates offline, from the place list shipped in utils/data/gazetteer.csv
+(states and union territories plus major cities and market towns, with English
+spellings and Hindi names as aliases).
+
+Points are GeoJSON ({"type": "Point", "coordinates": [lon, lat]}) so they can be stored
+on documents and queried through a 2dsphere index.
+"""
+
+import csv
+import math
+import re
+from pathlib import Path
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+EARTH_RADIUS_KM = 6371.0088
+
+# Words that describe a place rather than name it
+_NOISE_WORDS = {'near', 'district', 'dist', 'city', 'town', 'village', 'taluka', 'tehsil', 'india', 'bharat'}
+_SEPARATORS = re.compile(r'[,;/()\n]|\s-\s')
+_NON_WORD = re.compile(r"[^\w&\s]")
+
+
+def normalize(text):
+    """Lowercase a place name and drop punctuation and noise words"""
+    words = _NON_WORD.sub(' ', str(text or '').lower()).split()
+    return ' '.join(word for word in words if word not in _NOISE_WORDS)
+
+
+def geo_point(lon, lat):
+    return {'type': 'Point', 'coordinates': [round(lon, 5), round(lat, 5)]}
+
+
+def parse_point(text):
+    """Parse 'lat,lon' into a GeoJSON point, or None if text is not a coordinate pair"""
+    try:
+        lat, lon = (float(part) for part in str(text).split(','))
+    except (TypeError, ValueError):
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return geo_point(lon, lat)
+    return None
+
+
+def distance_km(point, other):
+    """Great-circle distance between two GeoJSON points"""
+    (lon1, lat1), (lon2, lat2) = point['coordinates'], other['coordinates']
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class Gazetteer:
+    """Offline place-name lookup.
+
+    Args:
+        path: CSV with kind (state/place), name, state, lat, lon and '|'-separated aliases
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.path = path
+        self._places = None  # {normalized name: [entry, ...]}
+        self._states = None  # {normalized name: entry}
+        self._longest = 1  # Words in the longest name, for scanning free text
+
+    def _load(self):
+        places, states = {}, {}
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                entry = {'name': row['name'], 'state': row['state'], 'kind': row['kind'],
+                         'point': geo_point(float(row['lon']), float(row['lat']))}
+                names = [row['name']] + [alias for alias in row['aliases'].split('|') if alias]
+                for name in filter(None, map(normalize, names)):
+                    self._longest = max(self._longest, len(name.split()))
+                    if row['kind'] == 'state':
+                        states[name] = entry
+                    else:
+                        places.setdefault(name, []).append(entry)
+        self._places, self._states = places, states
+
+    def _ensure_loaded(self):
+        if self._places is None:
+            self._load()
+
+    def _phrases(self, part):
+        """Every run of words in a location part, longest first"""
+        words = part.split()
+        for size in range(min(len(words), self._longest), 0, -1):
+            for start in range(len(words) - size + 1):
+                yield ' '.join(words[start:start + size])
+
+    def lookup(self, text):
+        """
+        Find the place a free-text location refers to.
+
+        Comma-separated parts are tried most specific first: a city or town beats a
+        state. Returns {'name', 'state', 'kind' ('place' or 'state'), 'point'} or None.
+        """
+        if not text:
+            return None
+        self._ensure_loaded()
+        parts = [normalize(part) for part in _SEPARATORS.split(str(text))]
+        parts = [part for part in parts if part]
+        states = {self._states[phrase]['state'] for part in parts
+                  for phrase in self._phrases(part) if phrase in self._states}
+
+        for part in parts:
+            for phrase in self._phrases(part):
+                candidates = self._places.get(phrase, [])
+                if states:
+                    # Same name in several states: take the one the text mentions, and never
+                    # one from a different state than the text says
+                    candidates = [entry for entry in candidates if entry['state'] in states]
+                if candidates:
+                    return candidates[0]
+        for part in parts:
+            for phrase in self._phrases(part):
+                if phrase in self._states:
+                    return self._states[phrase]
+        return None
+
+    def locate(self, text):
+        """GeoJSON point of a free-text location or 'lat,lon' pair, or None"""
+        point = parse_point(text)
+        if point:
+            return point
+        place = self.lookup(text)
+        return place['point'] if place else None
@@ -0,0 +1,148 @@
+"""
+Translation Bundles for Farming App
+Builds per-language, per-page translation bundles from static/i18n/translations.json.
+
+Each page gets only the keys it uses: the keys referenced by its own template (and by
+its partials, templates/partials/<page>_*.html), plus the shared keys referenced by
+base.html and the JavaScript files. The current language's bundle is inlined into
+the page; other languages are served as fingerprinted JSON bundles through the
+asset registry and fetched on demand.
+"""
+
+import json
+import os
+import re
+
+from flask import request
+from jinja2 import pass_context
+
+# Translation keys look like 'section.key' inside quotes (data-translate="buy.title", t('nav.home'))
+KEY_PATTERN = re.compile(r'''["']([A-Za-z]+\.[A-Za-z][A-Za-z0-9]*)["']''')
+LANGUAGE_COOKIE = 'appLanguage'
+SHARED_TEMPLATES = {'base.html'}
+PARTIALS_DIR = 'partials'
+COMMON_PAGE = 'common'
+
+
+class TranslationBundles:
+    """Per-language, per-page translation bundles built once at startup.
+
+    Args:
+        source_path: JSON file of {language: {key: text}}
+        template_dir: directory containing the Jinja templates
+        script_dirs: directories whose .js files may reference keys (shared by all pages)
+        assets: AssetRegistry the JSON bundles are published to
+        default_language: language used when the visitor has not chosen one
+    """
+
+    def __init__(self, source_path, template_dir, script_dirs, assets, default_language='en'):
+        self.source_path = source_path
+        self.template_dir = template_dir
+        self.script_dirs = script_dirs
+        self.assets = assets
+        self.default_language = default_language
+        self.languages = []
+        self._strings = {}      # {(language, page): {key: text}}
+        self._source_mtime = None
+
+    def _scan_keys(self, path, known_keys):
+        """Collect the known translation keys referenced in a file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            keys = set(KEY_PATTERN.findall(f.read())) & known_keys
+        # translation.js looks up '<key>Placeholder' for form labels
+        keys |= {key + 'Placeholder' for key in keys if key + 'Placeholder' in known_keys}
+        return keys
+
+    def build(self):
+        """Build every bundle from the source file. Returns number of bundles built"""
+        with open(self.source_path, 'r', encoding='utf-8') as f:
+            source = json.load(f)
+        self._source_mtime = os.path.getmtime(self.source_path)
+
+        fallback = source.get(self.default_language, {})
+        known_keys = set(fallback)
+        for strings in source.values():
+            known_keys |= set(strings)
+
+        # Keys every page needs: base layout and JavaScript
+        shared_keys = set()
+        for template in SHARED_TEMPLATES:
+            shared_keys |= self._scan_keys(os.path.join(self.template_dir, template), known_keys)
+        for directory in self.script_dirs:
+            for filename in os.listdir(directory):
+                if filename.endswith('.js'):
+                    shared_keys |= self._scan_keys(os.path.join(directory, filename), known_keys)
+
+        page_keys = {COMMON_PAGE: shared_keys}
+        for filename in os.listdir(self.template_dir):
+            if filename.endswith('.html') and filename not in SHARED_TEMPLATES:
+                page = filename[:-len('.html')]
+                page_keys[page] = shared_keys | self._scan_keys(os.path.join(self.template_dir, filename), known_keys)
+
+        partials_dir = os.path.join(self.template_dir, PARTIALS_DIR)
+        if os.path.isdir(partials_dir):
+            for filename in os.listdir(partials_dir):
+                page = filename.split('_', 1)[0]
+                if filename.endswith('.html') and page in page_keys:
+                    page_keys[page] |= self._scan_keys(os.path.join(partials_dir, filename), known_keys)
+
+        strings_by_bundle = {}
+        for language, strings in source.items():
+            for page, keys in page_keys.items():
+                # Missing translations fall back to the default language, then to the key itself
+                bundle = {key: strings.get(key) or fallback.get(key, key) for key in sorted(keys)}
+                strings_by_bundle[(language, page)] = bundle
+                body = json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                self.assets.add(self.bundle_name(language, page), body)
+
+        self._strings = strings_by_bundle
+        self.languages = list(source)
+        return len(strings_by_bundle)
+
+    def _refresh(self):
+        """Rebuild bundles if the source file changed (watch mode only)"""
+        if not self.assets.watch:
+            return
+        try:
+            if os.path.getmtime(self.source_path) != self._source_mtime:
+                self.build()
+        except OSError:
+            pass
+
+    @staticmethod
+    def bundle_name(language, page):
+        return f"i18n/{language}/{page}.json"
+
+    def page_for_template(self, template_name):
+        """Map a template name (e.g. 'market.html') to its bundle page"""
+        page = os.path.splitext(os.path.basename(template_name or ''))[0]
+        return page if (self.default_language, page) in self._strings else COMMON_PAGE
+
+    def current_language(self):
+        """Language chosen by the visitor (cookie set by translation.js)"""
+        language = request.cookies.get(LANGUAGE_COOKIE, self.default_language)
+        return language if language in self.languages else self.default_language
+
+    def strings(self, language, page):
+        """Get the {key: text} dictionary of a bundle"""
+        self._refresh()
+        return self._strings.get((language, page)) or self._strings.get((self.default_language, COMMON_PAGE), {})
+
+    def payload(self, template_name):
+        """Build the data inlined into a page: current strings plus URLs of every language bundle"""
+        page = self.page_for_template(template_name)
+        language = self.current_language()
+        return {
+            'lang': language,
+            'strings': self.strings(language, page),
+            'bundles': {lang: self.assets.url_for(self.bundle_name(lang, page)) for lang in self.languages}
+        }
+
+    def init_app(self, app):
+        """Expose i18n_payload() to templates"""
+
+        @pass_context
+        def i18n_payload(context):
+            return self.payload(context.name)
+
+        app.jinja_env.globals['i18n_payload'] = i18n_payload
@@ -0,0 +1,165 @@
+"""
+JSON Provider for Farming App
+Serializes API responses with orjson when it is installed (several times faster than
+the stdlib encoder on large lists) and falls back to Flask's default provider otherwise.
+
+Both paths handle ObjectId and datetime values. Datetimes keep Flask's HTTP date format
+by default so existing clients see the same payloads; set JSON_DATETIME_FORMAT=iso to
+let orjson emit ISO 8601 natively (faster still).
+
+stream_json_array() streams very large arrays in chunks instead of building the whole
+document in memory.
+"""
+
+import json
+import os
+from datetime import date, datetime, timezone
+
+from bson import ObjectId
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional
+ORJSON_AVAILABLE = False
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+STREAM_CHUNK_ITEMS = 500  # Items encoded per streamed chunk
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _http_date(value):
+    """Format a date/datetime like werkzeug.http.http_date (naive values are UTC), without its overhead"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        hour, minute, second = value.hour, value.minute, value.second
+    else:
+        hour = minute = second = 0
+    return (f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{hour:02d}:{minute:02d}:{second:02d} GMT")
+
+
+def _default(obj):
+    """Serialize the extra types found in MongoDB documents"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return _http_date(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, with the stdlib encoder as fallback.
+
+    Install with app.json = FastJSONProvider(app).
+    """
+
+    default = staticmethod(_default)
+
+    def __init__(self, app, datetime_format=None):
+        super().__init__(app)
+        self.datetime_format = (datetime_format or os.getenv('JSON_DATETIME_FORMAT', 'http')).lower()
+        self.use_orjson = ORJSON_AVAILABLE and os.getenv('JSON_ENCODER', 'orjson').lower() == 'orjson'
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.datetime_format != 'iso':
+            # Hand datetimes to _default so they keep the HTTP date format
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serialize to UTF-8 bytes (no str round trip on the orjson path)"""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+        if indent:
+            return self.dumps(obj, indent=2).encode('utf-8')
+        return self.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def encode_json(obj, datetime_format='iso'):
+    """Encode a value to compact JSON bytes without an app (orjson when installed)"""
+    if ORJSON_AVAILABLE:
+        options = orjson.OPT_NON_STR_KEYS
+        if datetime_format != 'iso':
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=_default, option=options)
+    default = _default if datetime_format != 'iso' else _iso_default
+    return json.dumps(obj, default=default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _iso_default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return _default(obj)
+
+
+def _encoder(provider):
+    """Get a function encoding one value to bytes with the app's provider (or the stdlib)"""
+    if isinstance(provider, FastJSONProvider):
+        return provider.dumps_bytes
+    return lambda obj: json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def iter_json_array(items, provider=None, envelope=None, key=None, chunk_items=STREAM_CHUNK_ITEMS):
+    """
+    Encode an iterable as a JSON array, yielding bytes chunks.
+
+    Args:
+        items: iterable of JSON-serializable values (e.g. a MongoDB cursor mapped to dicts)
+        provider: JSON provider used to encode items (defaults to the stdlib encoder)
+        envelope: optional dict wrapped around the array, e.g. {"success": True}
+        key: key of the array inside the envelope, e.g. "crops"
+        chunk_items: number of items encoded per yielded chunk
+    """
+    encode = _encoder(provider)
+    if envelope is not None:
+        head = encode(envelope)
+        # Re-open the encoded envelope object and append the array under key
+        opening = head[:-1] + (b',' if len(envelope) else b'') + encode(key) + b':['
+        closing = b']}'
+    else:
+        opening, closing = b'[', b']'
+
+    yield opening
+    buffer = []
+    first = True
+    for item in items:
+        buffer.append(encode(item))
+        if len(buffer) >= chunk_items:
+            yield (b'' if first else b',') + b','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield (b'' if first else b',') + b','.join(buffer)
+    yield closing + b'\n'
+
+
+def stream_json_array(items, provider=None, envelope=None, key=None, mimetype='application/json'):
+    """Build a streamed response of a JSON array (optionally inside an envelope object)"""
+    return Response(iter_json_array(items, provider, envelope, key), mimetype=mimetype)
@@ -1,13 +1,61 @@
+"""
+Logging for Farming App
+Application logs go to stdout as colored text (development) or JSON lines (production).
+
+With LOG_ASYNC (the default) handlers only put records on an in-memory queue and a
+listener thread formats and writes them, so request threads never wait on stdout and
+'%s'-style messages are only formatted if they are written. When the queue is full,
+records are dropped rather than blocking a request. Repeated messages can be sampled
+or rate limited per logger.
+
+Environment variables:
+    LOG_LEVEL         minimum level (default INFO)
+    LOG_FORMAT        'text' (default) or 'json'
+    LOG_COLOR         'auto' (default: only on a terminal), 'true' or 'false'; NO_COLOR also disables colors
+    LOG_ASYNC         write from a background thread (default True)
+    LOG_QUEUE_SIZE    records buffered before new ones are dropped (default 10000)
+    LOG_RATE_LIMIT    records per second allowed for each message of a logger, 0 disables (default 0)
+    LOG_SAMPLE        per-logger share of INFO/DEBUG records kept, e.g. 'FarmingApp=0.1,werkzeug=0.5'
+"""
+
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
-from colorama import Fore, Back, Style, init
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.json_provider import encode_json
+
+def _color_enabled():
+    setting = os.getenv('LOG_COLOR', 'auto').lower()
+    if setting == 'auto':
+        return 'NO_COLOR' not in os.environ and sys.stdout.isatty()
+    return setting == 'true'
+
+COLOR_ENABLED = _color_enabled()
 
-# Initialize colorama for cross-platform colored output
-init(autoreset=True)
+if COLOR_ENABLED:
+    from colorama import Fore, Back, Style, init
+
+    # Initialize colorama for cross-platform colored output
+    init(autoreset=True)
+else:
+    class _NoColor:
+        """Stands in for colorama's Fore/Back/Style: every color is an empty string"""
+
+        def __getattr__(self, name):
+            return ''
+
+    Fore = Back = Style = _NoColor()
 
 class ColoredFormatter(logging.Formatter):
     """Custom formatter with colored output for different log levels"""
-    
+
     COLORS = {
         'DEBUG': Fore.CYAN,
         'INFO': Fore.GREEN,
@@ -15,41 +63,209 @@ class ColoredFormatter(logging.Formatter):
         'ERROR': Fore.RED,
         'CRITICAL': Fore.RED + Back.WHITE + Style.BRIGHT,
     }
-    
+
     def format(self, record):
         # Get the original formatted message
         log_message = super().format(record)
-        
+
         # Add color based on log level
         color = self.COLORS.get(record.levelname, '')
         return f"{color}{log_message}{Style.RESET_ALL}"
 
-def setup_logger(name="FarmingApp", level=logging.INFO):
-    """Setup a colored logger for the Farming App"""
-    
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and exception"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        return encode_json(entry).decode('utf-8')
+
+class SampleFilter(logging.Filter):
+    """Keep a random share of INFO and DEBUG records; warnings and errors always pass.
+
+    Args:
+        rates: {logger name: share kept (0-1)}; a logger uses the rate of its nearest configured parent
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self._rate(record.name)
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `rate` records per second for each (logger, message template).
+
+    Records over the limit are dropped and counted; the next record let through for that
+    message carries the count as record.suppressed.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._windows = {}  # {(logger, msg): [window start, count, suppressed]}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg if isinstance(record.msg, str) else id(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                if len(self._windows) > 10000:
+                    self._windows.clear()  # Unbounded message variety (f-strings); start over
+                self._windows[key] = [now, 1, 0]
+                record.suppressed = suppressed
+                return True
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and leaves formatting to the listener thread"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record (and its args) can be passed as is
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _AsyncLogging:
+    """The process-wide queue and listener thread behind DroppingQueueHandler"""
+
+    def __init__(self):
+        self.handlers = []  # Output handlers used by the listener
+        self.queue_handler = None
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def handler(self, output_handlers, queue_size):
+        with self._lock:
+            if self.queue_handler is None:
+                self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+                os.register_at_fork(after_in_child=self._after_fork)
+                atexit.register(self.stop)
+            self.handlers = output_handlers
+            self._start()
+            return self.queue_handler
+
+    def _start(self):
+        if self.listener is not None:
+            self.listener.handlers = tuple(self.handlers)
+            return
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, *self.handlers,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def _after_fork(self):
+        # The listener thread doesn't survive fork(): start a new one in the child
+        self._lock = threading.Lock()
+        self.queue_handler.queue = queue.Queue(self.queue_handler.queue.maxsize)
+        self.listener = None
+        self._start()
+
+    def stop(self):
+        """Write every queued record and stop the listener (on shutdown)"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+_async_logging = _AsyncLogging()
+
+def _parse_rates(text):
+    rates = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, rate = part.partition('=')
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+def setup_logger(name="FarmingApp", level=None):
+    """Setup the Farming App logger from the LOG_* environment variables"""
+    level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
-    # Remove existing handlers to avoid duplicates
+    logger.propagate = False
+
+    # Remove existing handlers and filters to avoid duplicates
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-    
+    for log_filter in logger.filters[:]:
+        logger.removeFilter(log_filter)
+
     # Create console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
-    
+
     # Create formatter
-    formatter = ColoredFormatter(
-        '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JSONFormatter()
+    else:
+        formatter_class = ColoredFormatter if COLOR_ENABLED else logging.Formatter
+        formatter = formatter_class(
+            '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+
+    # Sampling and rate limits run on the calling thread, before a record is queued
+    rates = _parse_rates(os.getenv('LOG_SAMPLE', ''))
+    if rates:
+        logger.addFilter(SampleFilter(rates))
+    rate_limit = float(os.getenv('LOG_RATE_LIMIT', 0))
+    if rate_limit > 0:
+        logger.addFilter(RateLimitFilter(rate_limit))
+
+    if os.getenv('LOG_ASYNC', 'True').lower() == 'true':
+        logger.addHandler(_async_logging.handler([console_handler], int(os.getenv('LOG_QUEUE_SIZE', 10000))))
+    else:
+        logger.addHandler(console_handler)
+
     return logger
 
+def flush_logs():
+    """Write out queued log records (call before a worker exits)"""
+    _async_logging.stop()
+
+def dropped_logs():
+    """Records dropped because the log queue was full"""
+    handler = _async_logging.queue_handler
+    return handler.dropped if handler else 0
+
 def log_startup():
     """Log startup banner for Farming App"""
     print(f"\n{Fore.CYAN}{'='*60}")
@@ -0,0 +1,231 @@
+"""
+Market Analytics for Farming App
+Daily price and sales aggregates per crop, category and location, kept in the
+'price_stats' collection so price trends are served without scanning crops or payments.
+
+Each document covers one day for one (category, crop name, location) and is updated
+incrementally from the write paths (new listings, verified payments). A backfill
+rebuilds the documents of past days from the crops and payments collections with two
+aggregation pipelines; today's documents are left to the write paths, whose updates
+a rebuild would otherwise overwrite.
+"""
+
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne, UpdateOne
+
+PRICE_SAMPLES = 200  # Listing prices kept per document for the median
+BATCH_SIZE = 500
+GROUP_FIELDS = ('day', 'crop', 'category', 'location')
+
+
+def _key(value):
+    """Normalize a crop name, category or location for grouping"""
+    return ' '.join(str(value or '').split()).lower()
+
+
+def _day(moment):
+    return (moment or datetime.utcnow()).strftime('%Y-%m-%d')
+
+
+def stats_id(day, category, crop, location):
+    return f"{day}|{category}|{crop}|{location}"
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def _empty_totals():
+    return {'listings': 0, 'quantity_listed': 0, 'price_sum': 0, 'price_min': None, 'price_max': None,
+            'prices': [], 'sales': 0, 'volume_sold': 0, 'revenue': 0}
+
+
+def _add(totals, figures):
+    """Add one set of aggregate figures (a stats document or pipeline group) to running totals"""
+    for field in ('listings', 'quantity_listed', 'price_sum', 'sales', 'volume_sold', 'revenue'):
+        totals[field] += figures.get(field) or 0
+    for field, pick in (('price_min', min), ('price_max', max)):
+        if figures.get(field) is not None:
+            current = totals[field]
+            totals[field] = figures[field] if current is None else pick(current, figures[field])
+    totals['prices'].extend(figures.get('prices') or [])
+
+
+class MarketAnalytics:
+    """Maintains and serves the daily price aggregates.
+
+    Args:
+        collection: the price_stats collection (writes)
+        catalog: optional secondary-preferred view of it for reads
+    """
+
+    def __init__(self, collection, catalog=None):
+        self.collection = collection
+        self.catalog = catalog if catalog is not None else collection
+
+    def record_listings(self, crops):
+        """Add new crop listings to their day's aggregates (one upsert per group)"""
+        groups = {}
+        for crop in crops:
+            key = (_day(crop.get('created_at')), _key(crop.get('category')),
+                   _key(crop.get('name')), _key(crop.get('location')))
+            group = groups.setdefault(key, {'listings': 0, 'quantity': 0, 'prices': []})
+            group['listings'] += 1
+            group['quantity'] += crop.get('quantity', 0)
+            group['prices'].append(crop.get('price_per_kg', 0))
+
+        requests = []
+        for (day, category, crop, location), group in groups.items():
+            requests.append(UpdateOne(
+                {'_id': stats_id(day, category, crop, location)},
+                {
+                    '$setOnInsert': {'day': day, 'category': category, 'crop': crop, 'location': location},
+                    '$inc': {'listings': group['listings'], 'quantity_listed': group['quantity'],
+                             'price_sum': sum(group['prices'])},
+                    '$min': {'price_min': min(group['prices'])},
+                    '$max': {'price_max': max(group['prices'])},
+                    '$push': {'prices': {'$each': group['prices'], '$slice': -PRICE_SAMPLES}},
+                    '$currentDate': {'updated_at': True},
+                },
+                upsert=True
+            ))
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        return len(requests)
+
+    def record_sale(self, crop_details, quantity, amount, moment=None):
+        """Add a verified sale (quantity in kg, amount in rupees) to its day's aggregates"""
+        day = _day(moment)
+        category, crop, location = (_key(crop_details.get(field)) for field in ('category', 'name', 'location'))
+        self.collection.update_one(
+            {'_id': stats_id(day, category, crop, location)},
+            {
+                '$setOnInsert': {'day': day, 'crop': crop, 'category': category, 'location': location},
+                '$inc': {'sales': 1, 'volume_sold': quantity, 'revenue': amount},
+                '$currentDate': {'updated_at': True},
+            },
+            upsert=True
+        )
+
+    def rebuild(self, crops, payments, before=None):
+        """
+        Recompute the aggregates of the days before `before` (default: today) from the crops
+        and payments collections. Returns the number written
+        """
+        if before is None:
+            before = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        stats = {}
+
+        listing_groups = crops.aggregate([
+            {'$match': {'created_at': {'$lt': before}}},
+            {'$group': {
+                '_id': {
+                    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                    'category': {'$toLower': '$category'},
+                    'crop': {'$toLower': '$name'},
+                    'location': {'$toLower': '$location'},
+                },
+                'listings': {'$sum': 1},
+                'quantity_listed': {'$sum': '$quantity'},
+                'price_sum': {'$sum': '$price_per_kg'},
+                'price_min': {'$min': '$price_per_kg'},
+                'price_max': {'$max': '$price_per_kg'},
+                'prices': {'$push': '$price_per_kg'},
+            }}
+        ], allowDiskUse=True)
+        for group in listing_groups:
+            self._add_group(stats, group)
+
+        sale_groups = payments.aggregate([
+            {'$match': {'status': 'success', 'crop_details': {'$exists': True}, 'created_at': {'$lt': before}}},
+            {'$group': {
+                '_id': {
+                    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                    'category': {'$toLower': '$crop_details.category'},
+                    'crop': {'$toLower': '$crop_details.name'},
+                    'location': {'$toLower': '$crop_details.location'},
+                },
+                'sales': {'$sum': 1},
+                'volume_sold': {'$sum': '$quantity_purchased'},
+                'revenue': {'$sum': '$amount'},  # paise
+            }}
+        ], allowDiskUse=True)
+        for group in sale_groups:
+            group['revenue'] = (group['revenue'] or 0) / 100
+            self._add_group(stats, group)
+
+        now = datetime.utcnow()
+        requests = []
+        for doc in stats.values():
+            doc['prices'] = doc['prices'][-PRICE_SAMPLES:]
+            doc['updated_at'] = now
+            requests.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+            if len(requests) >= BATCH_SIZE:
+                self.collection.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        return len(stats)
+
+    @staticmethod
+    def _add_group(stats, group):
+        """Add a rebuild pipeline group to its stats document (names are normalized further here)"""
+        key = group.pop('_id')
+        if not key.get('day'):
+            return  # No created_at
+        day = key['day']
+        category, crop, location = (_key(key.get(field)) for field in ('category', 'crop', 'location'))
+        doc_id = stats_id(day, category, crop, location)
+        if doc_id not in stats:
+            stats[doc_id] = dict(_empty_totals(), _id=doc_id, day=day, category=category, crop=crop, location=location)
+        _add(stats[doc_id], group)
+
+    def ensure_indexes(self):
+        for field in ('crop', 'category', 'location'):
+            self.collection.create_index([(field, 1), ('day', 1)])
+        self.collection.create_index('day')
+
+    def prices(self, crop=None, category=None, location=None, days=30, group_by='day', today=None):
+        """
+        Price and sales figures for the last days days, combined per group_by value.
+
+        Args:
+            crop, category, location: optional exact filters (case-insensitive)
+            group_by: 'day', 'crop', 'category' or 'location'
+        Returns a list of {group_by value, listings, quantity_listed, price_min, price_median,
+        price_avg, price_max, sales, volume_sold, revenue}, sorted by group_by value
+        """
+        if group_by not in GROUP_FIELDS:
+            raise ValueError(f"Invalid group_by: {group_by}")
+        if days < 1:
+            raise ValueError("days must be at least 1")
+        first_day = _day((today or datetime.utcnow()) - timedelta(days=days - 1))
+        query = {'day': {'$gte': first_day}}
+        for field, value in (('crop', crop), ('category', category), ('location', location)):
+            if value:
+                query[field] = _key(value)
+
+        combined = {}
+        for doc in self.catalog.find(query, {'_id': 0, 'updated_at': 0}):
+            _add(combined.setdefault(doc[group_by], _empty_totals()), doc)
+
+        rows = []
+        for value in sorted(combined):
+            group = combined[value]
+            prices = group.pop('prices')
+            price_sum = group.pop('price_sum')
+            rows.append(dict(
+                {group_by: value},
+                price_median=_median(prices),
+                price_avg=round(price_sum / group['listings'], 2) if group['listings'] else None,
+                revenue=round(group.pop('revenue'), 2),
+                **group
+            ))
+        return rows
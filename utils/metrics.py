@@ -0,0 +1,350 @@
+"""
+Request Metrics for Farming App
+Per-route latency histograms, request counts by status, in-flight requests, MongoDB
+time per request and outbound call durations (Ollama, Razorpay), exposed in the
+Prometheus text format.
+
+Recording is cheap and takes no lock: every thread updates its own shard of counters,
+and a scrape sums the shards. Under gunicorn each worker process also writes its
+figures to METRICS_DIR every few seconds, so whichever worker answers /metrics reports
+the totals of all of them (figures of exited workers are folded into an archive file).
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo.monitoring import CommandListener
+
+from utils.json_provider import encode_json
+
+# fcntl is POSIX only; elsewhere only one process serves the app
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DESCRIPTIONS = {
+    'farming_http_requests_total': 'HTTP requests handled, by route, method and status',
+    'farming_http_requests_in_flight': 'HTTP requests being handled, by route',
+    'farming_http_request_duration_seconds': 'Time to handle a request, by route',
+    'farming_http_request_mongodb_seconds': 'MongoDB time spent per request, by route',
+    'farming_mongodb_command_duration_seconds': 'MongoDB command durations, by command',
+    'farming_mongodb_command_errors_total': 'Failed MongoDB commands, by command',
+    'farming_external_call_duration_seconds': 'Outbound call durations, by service and operation',
+    'farming_external_call_errors_total': 'Failed outbound calls, by service and operation',
+    'farming_requests_rejected_total': 'Requests refused by rate limits or load shedding, by route and reason',
+    'farming_logins_total': 'Login attempts, by result',
+    'farming_password_hash_seconds': 'Password hash and check durations including queueing, by operation',
+}
+
+ARCHIVE_FILE = 'archive.json'
+
+
+def clear_directory(directory):
+    """Remove figures left in directory by a previous run of the server (only files this module writes)"""
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        stem = filename[:-len('.tmp')] if filename.endswith('.tmp') else filename
+        pid, _, extension = stem.partition('.')
+        if extension == 'json' and (pid.isdigit() or stem == ARCHIVE_FILE):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def _greenlet_threads():
+    """True when gevent has patched threading (thread-locals are then per greenlet)"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class _Shard:
+    """Figures recorded by one thread"""
+
+    __slots__ = ('counters', 'gauges', 'histograms')
+
+    def __init__(self):
+        self.counters = {}  # {(name, labels): value}
+        self.gauges = {}  # {(name, labels): value}
+        self.histograms = {}  # {(name, labels): [count per bucket..., +Inf count, sum]}
+
+
+def _merge(totals, snapshot, gauges=True):
+    """Add a snapshot ({'counters': [[name, labels, value]], ...}) to totals keyed by (name, labels)"""
+    for kind in ('counters', 'gauges') if gauges else ('counters',):
+        for name, labels, value in snapshot.get(kind, []):
+            key = (name, tuple(map(tuple, labels)))
+            totals[kind][key] = totals[kind].get(key, 0) + value
+    for name, labels, values in snapshot.get('histograms', []):
+        key = (name, tuple(map(tuple, labels)))
+        current = totals['histograms'].get(key)
+        totals['histograms'][key] = values[:] if current is None else [a + b for a, b in zip(current, values)]
+
+
+def _serialize(totals):
+    """Totals keyed by (name, labels) as JSON-friendly lists of [name, labels, value(s)]"""
+    return {kind: [[name, [list(pair) for pair in labels], value] for (name, labels), value in entries.items()]
+            for kind, entries in totals.items()}
+
+
+def _labels(labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Process-wide metrics registry.
+
+    Args:
+        directory: folder shared by the worker processes of one server (None: this process only)
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._local = threading.local()
+        self._shards = []
+        self._shared_shard = None  # Used by every greenlet under gevent
+        self._lock = threading.Lock()  # Only taken to register a shard or write a snapshot
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A forked worker starts from zero; the parent's figures are reported by the parent
+        self._local = threading.local()
+        self._shards = []
+        self._shared_shard = None
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            with self._lock:
+                if _greenlet_threads():
+                    # Greenlets never interleave within a recording, so they can share one shard
+                    if self._shared_shard is None:
+                        self._shared_shard = _Shard()
+                        self._shards.append(self._shared_shard)
+                    shard = self._shared_shard
+                else:
+                    shard = _Shard()
+                    self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Add to a counter. labels is a tuple of (name, value) pairs"""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def add(self, name, labels=(), value=1):
+        """Add to (or, with a negative value, subtract from) a gauge"""
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        """Record a duration in a histogram"""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(BUCKETS) + 2)
+        values[bisect.bisect_left(BUCKETS, seconds)] += 1
+        values[-1] += seconds
+
+    @contextmanager
+    def external_call(self, service, operation):
+        """Time an outbound call: with metrics.external_call('razorpay', 'create_order'): ..."""
+        labels = (('service', service), ('operation', operation))
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('farming_external_call_errors_total', labels)
+            raise
+        finally:
+            self.observe('farming_external_call_duration_seconds', labels, time.perf_counter() - started)
+
+    # MongoDB time of the current request (per thread, or per greenlet under gevent)
+
+    def start_request(self):
+        self._local.mongo_seconds = 0.0
+
+    def request_mongo_seconds(self):
+        return getattr(self._local, 'mongo_seconds', 0.0)
+
+    def add_mongo_seconds(self, seconds):
+        if getattr(self._local, 'mongo_seconds', None) is not None:
+            self._local.mongo_seconds += seconds
+
+    def end_request(self):
+        self._local.mongo_seconds = None
+
+    def snapshot(self):
+        """This process's figures as lists of [name, labels, value(s)]"""
+        totals = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # dict.copy() is atomic, so recording threads never need to wait for a scrape
+            for kind in ('counters', 'gauges'):
+                for key, value in getattr(shard, kind).copy().items():
+                    totals[kind][key] = totals[kind].get(key, 0) + value
+            for key, values in shard.histograms.copy().items():
+                current = totals['histograms'].get(key)
+                values = list(values)
+                totals['histograms'][key] = values if current is None else [a + b for a, b in zip(current, values)]
+        return _serialize(totals)
+
+    def flush(self):
+        """Write this process's figures to the shared directory"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)  # In case it was removed while the server runs
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encode_json(self.snapshot()))
+        os.replace(temp_path, path)
+
+    @contextmanager
+    def _directory_lock(self):
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def collect(self):
+        """Figures of every worker: {'counters'|'gauges'|'histograms': {(name, labels): value(s)}}"""
+        totals = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        if not self.directory:
+            _merge(totals, self.snapshot())
+            return totals
+
+        self.flush()
+        with self._directory_lock():
+            archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+            archive = {'counters': {}, 'gauges': {}, 'histograms': {}}
+            if os.path.exists(archive_path):
+                with open(archive_path) as f:
+                    _merge(archive, json.load(f), gauges=False)
+            archived = False
+            for filename in os.listdir(self.directory):
+                pid, _, extension = filename.partition('.')
+                if extension != 'json' or not pid.isdigit():
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if _alive(int(pid)):
+                    _merge(totals, snapshot)
+                else:
+                    # An exited worker: keep its counts, drop its gauges and its file
+                    _merge(archive, snapshot, gauges=False)
+                    os.remove(path)
+                    archived = True
+            if archived:
+                with open(f"{archive_path}.tmp", 'wb') as f:
+                    f.write(encode_json(_serialize(archive)))
+                os.replace(f"{archive_path}.tmp", archive_path)
+        for kind in ('counters', 'histograms'):
+            for key, value in archive[kind].items():
+                current = totals[kind].get(key)
+                if current is None:
+                    totals[kind][key] = value
+                elif kind == 'counters':
+                    totals[kind][key] = current + value
+                else:
+                    totals[kind][key] = [a + b for a, b in zip(current, value)]
+        return totals
+
+    def render(self):
+        """All figures in the Prometheus text exposition format"""
+        totals = self.collect()
+        lines = []
+        by_name = {}
+        for kind, entries in totals.items():
+            for (name, labels), value in entries.items():
+                by_name.setdefault((name, kind), []).append((labels, value))
+
+        for (name, kind), series in sorted(by_name.items()):
+            metric_type = {'counters': 'counter', 'gauges': 'gauge', 'histograms': 'histogram'}[kind]
+            lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(series):
+                label_text = _labels(labels)
+                if kind != 'histograms':
+                    lines.append(f"{name}{{{label_text}}} {_format_number(value)}")
+                    continue
+                cumulative = 0
+                prefix = f"{label_text}," if label_text else ''
+                for bound, count in zip(BUCKETS + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {_format_number(float(value[-1]))}")
+                lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MongoCommandMetrics(CommandListener):
+    """PyMongo command listener recording command durations and MongoDB time per request"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        self.metrics.observe('farming_mongodb_command_duration_seconds', (('command', event.command_name),), seconds)
+        self.metrics.add_mongo_seconds(seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        labels = (('command', event.command_name),)
+        self.metrics.observe('farming_mongodb_command_duration_seconds', labels, seconds)
+        self.metrics.inc('farming_mongodb_command_errors_total', labels)
+        self.metrics.add_mongo_seconds(seconds)
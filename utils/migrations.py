@@ -0,0 +1,177 @@
+"""
+Database Migrations for Farming App
+One-time data fixes and schema changes, applied in order and recorded in the
+'migrations' collection so each runs only once per database.
+
+Every migration is idempotent, so two app nodes starting at the same time may both
+run one without harm. Each runs under job_timeout() rather than the per-operation
+MongoDB timeout, since most of them scan whole collections.
+"""
+
+from datetime import datetime
+
+from pymongo import UpdateMany, UpdateOne
+
+from utils.database import job_timeout
+from utils.gazetteer import Gazetteer
+from utils.market_analytics import MarketAnalytics
+from utils.rate_limit import MongoBuckets
+from utils.sessions import MongoSessionInterface
+
+BATCH_SIZE = 500
+
+NUMBER_TYPES = ['int', 'long', 'double', 'decimal']
+
+# Crop listings as the app writes them (api_add_crop). 'moderate' validation leaves
+# updates of legacy documents alone but rejects incomplete new listings.
+CROP_SCHEMA = {
+    '$jsonSchema': {
+        'bsonType': 'object',
+        'required': ['name', 'category', 'quantity', 'price_per_kg', 'total_price', 'location',
+                     'description', 'seller_name', 'seller_email', 'seller_phone', 'is_active', 'created_at'],
+        'properties': {
+            'name': {'bsonType': 'string'},
+            'category': {'bsonType': 'string'},
+            'quantity': {'bsonType': NUMBER_TYPES, 'minimum': 0},
+            'price_per_kg': {'bsonType': NUMBER_TYPES, 'minimum': 0},
+            'total_price': {'bsonType': NUMBER_TYPES, 'minimum': 0},
+            'location': {'bsonType': 'string'},
+            'description': {'bsonType': 'string'},
+            'seller_name': {'bsonType': 'string'},
+            'seller_email': {'bsonType': 'string'},
+            'seller_phone': {'bsonType': 'string'},
+            'seller_location': {'bsonType': 'string'},
+            'is_active': {'bsonType': 'bool'},
+            'created_at': {'bsonType': 'date'},
+            'updated_at': {'bsonType': 'date'},
+        }
+    }
+}
+
+
+def complete_crop_documents(db):
+    """Fill in fields that older crop listings are missing, so reads need no fixups"""
+    crops = db['crops']
+    incomplete = crops.find({'$or': [
+        {field: {'$exists': False}}
+        for field in ('total_price', 'seller_name', 'seller_phone', 'description', 'is_active', 'created_at')
+    ]})
+
+    requests = []
+    modified = 0
+    now = datetime.utcnow()  # Marks the backfilled listings for incremental exports
+    for crop in incomplete:
+        quantity = crop.get('quantity', 0)
+        fields = {
+            'total_price': crop.get('total_price', quantity * crop.get('price_per_kg', 0)),
+            'seller_name': crop.get('seller_name', 'Unknown'),
+            'seller_phone': crop.get('seller_phone', ''),
+            'description': crop.get('description', ''),
+            # Listings without a flag were shown as sold out unless they still have stock
+            'is_active': crop.get('is_active', quantity > 0),
+            'created_at': crop.get('created_at', crop['_id'].generation_time.replace(tzinfo=None)),
+            'updated_at': now,
+        }
+        requests.append(UpdateOne({'_id': crop['_id']}, {'$set': fields}))
+        if len(requests) >= BATCH_SIZE:
+            modified += crops.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        modified += crops.bulk_write(requests, ordered=False).modified_count
+    return modified
+
+
+def apply_crop_schema(db):
+    """Attach the $jsonSchema validator to the crops collection"""
+    options = {'validator': CROP_SCHEMA, 'validationLevel': 'moderate', 'validationAction': 'error'}
+    if 'crops' not in db.list_collection_names():
+        db.create_collection('crops', **options)
+    else:
+        db.command({'collMod': 'crops', **options})
+    return 1
+
+
+def build_price_stats(db):
+    """Index the price_stats collection and backfill it from existing listings and payments"""
+    analytics = MarketAnalytics(db['price_stats'])
+    analytics.ensure_indexes()
+    return analytics.rebuild(db['crops'], db['payments'])
+
+
+def add_location_points(db):
+    """Geocode crop and profile locations with the offline gazetteer and index the points"""
+    gazetteer = Gazetteer()
+    crops, users = db['crops'], db['users']
+    modified = 0
+    now = datetime.utcnow()  # Marks the geocoded documents for incremental exports
+    # Listings share few distinct locations: geocode each once and update them together
+    requests = [
+        UpdateMany({'location': location, 'location_point': {'$exists': False}},
+                   {'$set': {'location_point': gazetteer.locate(location), 'updated_at': now}})
+        for location in crops.distinct('location', {'location_point': {'$exists': False}})
+    ]
+    for start in range(0, len(requests), BATCH_SIZE):
+        modified += crops.bulk_write(requests[start:start + BATCH_SIZE], ordered=False).modified_count
+
+    requests = [
+        UpdateOne({'_id': user['_id']}, {'$set': {'profile.location_point': gazetteer.locate(user['profile']['location']),
+                                                  'updated_at': now}})
+        for user in users.find({'profile.location': {'$exists': True}, 'profile.location_point': {'$exists': False}},
+                               {'profile.location': 1})
+    ]
+    for start in range(0, len(requests), BATCH_SIZE):
+        modified += users.bulk_write(requests[start:start + BATCH_SIZE], ordered=False).modified_count
+
+    crops.create_index([('location_point', '2dsphere')])
+    users.create_index([('profile.location_point', '2dsphere')])
+    return modified
+
+
+def index_sessions(db):
+    """Let MongoDB remove expired server-side sessions"""
+    MongoSessionInterface(db['sessions']).ensure_indexes()
+    return 0
+
+
+def index_rate_limits(db):
+    """Let MongoDB remove idle shared rate limit buckets"""
+    MongoBuckets(db['rate_limits']).ensure_indexes()
+    return 0
+
+
+# (name, function) in the order they are applied. Never rename an applied migration;
+# add a new one instead.
+MIGRATIONS = [
+    ('crops-complete-documents', complete_crop_documents),
+    ('crops-schema-v1', apply_crop_schema),
+    ('price-stats-v1', build_price_stats),
+    ('location-points-v1', add_location_points),
+    ('sessions-ttl-v1', index_sessions),
+    ('rate-limits-ttl-v1', index_rate_limits),
+]
+
+
+def run_migrations(db, logger=None):
+    """Apply every migration not yet recorded in db.migrations. Returns the names applied"""
+    applied = {doc['_id'] for doc in db['migrations'].find({}, {'_id': 1})}
+    ran = []
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            with job_timeout():
+                result = migrate(db)
+        except Exception as e:
+            # Leave it unrecorded so the next start retries; later migrations may depend on it
+            if logger:
+                logger.error(f"Migration {name} failed: {e}")
+            break
+        db['migrations'].update_one(
+            {'_id': name},
+            {'$set': {'applied_at': datetime.utcnow(), 'result': result}},
+            upsert=True
+        )
+        ran.append(name)
+        if logger:
+            logger.info(f"Applied migration {name} ({result})")
+    return ran
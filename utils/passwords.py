@@ -0,0 +1,110 @@
+"""
+Password Hashing for Farming App
+Password hashing and verification run in a small pool of helper processes, so a burst
+of logins or signups uses at most that many CPU cores and can't starve the worker
+threads serving other pages. When too many operations are already waiting, new ones are
+refused (HasherBusy) instead of queueing without bound.
+
+The key-derivation cost is configurable (PASSWORD_HASH_METHOD, any werkzeug method such
+as 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'; see benchmarks/password_hashing.py to
+pick one). Hashes made with other parameters keep working and are replaced with the
+configured method on the user's next successful login.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'  # werkzeug's default
+
+# Helper processes are started from a clean fork server (or spawned) rather than forked
+# from a multi-threaded worker, which could copy locks held by other threads. Either way
+# they import the main module, so entry scripts need an `if __name__ == '__main__'` guard.
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class HasherBusy(Exception):
+    """Too many password operations are already waiting"""
+
+
+def hash_method(password_hash):
+    """The method and parameters a hash was made with, e.g. 'scrypt:32768:8:1'"""
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a bounded process pool.
+
+    Args:
+        method: werkzeug hash method and parameters for new hashes
+        workers: helper processes (0 hashes on the calling thread)
+        max_pending: operations allowed to run or wait at once before HasherBusy is raised
+        timeout: seconds to wait for one operation
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=1, max_pending=16, timeout=10):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pid = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Created on first use, and again in a forked worker (pools don't survive fork)
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(START_METHOD))
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+        if not self._pending.acquire(blocking=False):
+            raise HasherBusy(f"{self.max_pending} password operations already pending")
+        try:
+            future = self._executor().submit(function, *args)
+        except BaseException:
+            self._pending.release()
+            raise
+        # The slot is held until the operation finishes, even if the caller stops waiting
+        # for it, so operations abandoned after a timeout still count towards max_pending
+        future.add_done_callback(lambda _: self._pending.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A helper process died (e.g. killed for memory); start a new pool next time
+            with self._lock:
+                self._pool = None
+            raise
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash (any method werkzeug supports)"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if a hash was made with a different method or parameters than the configured ones"""
+        if self._method_prefix is None:
+            # 'scrypt' and 'scrypt:32768:8:1' are the same method: compare what werkzeug writes
+            self._method_prefix = hash_method(self.hash(''))
+        return hash_method(password_hash) != self._method_prefix
+
+    def shutdown(self):
+        """Stop the helper processes (on worker exit)"""
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
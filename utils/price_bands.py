@@ -0,0 +1,249 @@
+"""
+Price Bands for Farming App
+Fair-price bands per crop and location, and flags for listings whose price_per_kg is
+far from what others ask for the same crop.
+
+A batch job loads the prices of active listings into columnar arrays, computes grouped
+percentiles and robust z-scores (distance from the group median in units of the median
+absolute deviation) in one vectorized pass, and stores the results in the
+'price_bands' collection. Every worker keeps them in memory, so rendering a listing is a
+dict lookup.
+
+NumPy is optional: without it the same figures are computed group by group in Python.
+"""
+
+import math
+import threading
+from datetime import datetime
+
+from pymongo import ReplaceOne
+
+# NumPy is optional
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MIN_GROUP_SIZE = 5  # Listings a group needs before its band is trusted
+OUTLIER_Z = 3.5  # |robust z| above which a price is flagged (Iglewicz and Hoaglin)
+MAD_SCALE = 0.6745  # Makes MAD-based z-scores comparable to standard z-scores for normal data
+MEAN_AD_SCALE = 1.2533  # Same, for the mean absolute deviation used when the MAD is 0
+QUANTILES = {'p10': 0.10, 'p25': 0.25, 'median': 0.50, 'p75': 0.75, 'p90': 0.90}
+ANY_LOCATION = '*'
+BATCH_SIZE = 500
+
+
+def _key(value):
+    """Normalize a crop name or location for grouping"""
+    return ' '.join(str(value or '').split()).lower()
+
+
+def _group_stats_numpy(group_ids, prices, n_groups):
+    """
+    Grouped statistics for every group at once.
+
+    Returns (counts, {quantile name: per-group values}, mad, mean_ad, z) where z is the
+    robust z-score of every price within its group.
+    """
+    order = np.lexsort((prices, group_ids))
+    sorted_prices = prices[order]
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    def quantile(values, q):
+        # Linear interpolation within each group's sorted slice (numpy.percentile's default)
+        position = starts + q * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    quantiles = {name: quantile(sorted_prices, q) for name, q in QUANTILES.items()}
+    deviations = np.abs(prices - quantiles['median'][group_ids])
+    sorted_deviations = deviations[np.lexsort((deviations, group_ids))]
+    mad = quantile(sorted_deviations, 0.5)
+    mean_ad = np.bincount(group_ids, weights=deviations, minlength=n_groups) / counts
+
+    spread = np.where(mad > 0, mad / MAD_SCALE, mean_ad * MEAN_AD_SCALE)[group_ids]
+    z = np.divide(prices - quantiles['median'][group_ids], spread,
+                  out=np.zeros_like(prices), where=spread > 0)
+    return counts, quantiles, mad, mean_ad, z
+
+
+def _quantile(sorted_values, q):
+    position = q * (len(sorted_values) - 1)
+    low, high = math.floor(position), math.ceil(position)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def _group_stats_python(group_ids, prices, n_groups):
+    """Same as _group_stats_numpy, one group at a time"""
+    members = [[] for _ in range(n_groups)]
+    for index, group in enumerate(group_ids):
+        members[group].append(index)
+
+    counts = [len(indexes) for indexes in members]
+    quantiles = {name: [0.0] * n_groups for name in QUANTILES}
+    mad, mean_ad, z = [0.0] * n_groups, [0.0] * n_groups, [0.0] * len(prices)
+    for group, indexes in enumerate(members):
+        values = sorted(prices[index] for index in indexes)
+        for name, q in QUANTILES.items():
+            quantiles[name][group] = _quantile(values, q)
+        median = quantiles['median'][group]
+        deviations = [abs(prices[index] - median) for index in indexes]
+        mad[group] = _quantile(sorted(deviations), 0.5)
+        mean_ad[group] = sum(deviations) / len(deviations)
+        spread = mad[group] / MAD_SCALE if mad[group] > 0 else mean_ad[group] * MEAN_AD_SCALE
+        for index in indexes:
+            z[index] = (prices[index] - median) / spread if spread > 0 else 0.0
+    return counts, quantiles, mad, mean_ad, z
+
+
+def compute_price_bands(crop_ids, names, locations, prices):
+    """
+    Price bands and outliers from columns of listing data.
+
+    Bands are computed per (crop, location) and per crop across all locations. Each
+    listing is scored against its (crop, location) band when that has at least
+    MIN_GROUP_SIZE listings, otherwise against the crop-wide band.
+
+    Returns {band id: band document}, with flagged listings under band['outliers']
+    """
+    # Factorize the raw (name, location) pairs first so each distinct one is normalized once
+    pairs = {}
+    pair_ids = [pairs.setdefault(pair, len(pairs)) for pair in zip(names, locations)]
+    pair_keys = (
+        [f"{_key(name)}|{_key(location)}" for name, location in pairs],
+        [f"{_key(name)}|{ANY_LOCATION}" for name, _ in pairs],
+    )
+
+    levels = []
+    for keys in pair_keys:
+        band_ids = sorted(set(keys))
+        position = {band_id: index for index, band_id in enumerate(band_ids)}
+        pair_groups = [position[key] for key in keys]
+        levels.append((band_ids, pair_groups))
+
+    if NUMPY_AVAILABLE:
+        prices = np.asarray(prices, dtype=np.float64)
+        pair_ids = np.asarray(pair_ids, dtype=np.int64)
+        levels = [(band_ids, np.asarray(pair_groups, dtype=np.int64)[pair_ids]) for band_ids, pair_groups in levels]
+        levels = [(band_ids, group_ids, _group_stats_numpy(group_ids, prices, len(band_ids)))
+                  for band_ids, group_ids in levels]
+        (_, local_groups, local_stats), (_, crop_groups, crop_stats) = levels
+        # Score against the local band when it is large enough, else the crop-wide one
+        use_local = local_stats[0][local_groups] >= MIN_GROUP_SIZE
+        use_crop = ~use_local & (crop_stats[0][crop_groups] >= MIN_GROUP_SIZE)
+        z = np.where(use_local, local_stats[4], crop_stats[4])
+        flagged = np.flatnonzero((use_local | use_crop) & (np.abs(z) > OUTLIER_Z))
+        outliers = [(int(index), bool(use_local[index]), float(z[index])) for index in flagged]
+    else:
+        prices = [float(price) for price in prices]
+        levels = [(band_ids, [pair_groups[pair] for pair in pair_ids]) for band_ids, pair_groups in levels]
+        levels = [(band_ids, group_ids, _group_stats_python(group_ids, prices, len(band_ids)))
+                  for band_ids, group_ids in levels]
+        (_, local_groups, local_stats), (_, crop_groups, crop_stats) = levels
+        outliers = []
+        for index in range(len(prices)):
+            if local_stats[0][local_groups[index]] >= MIN_GROUP_SIZE:
+                use_local, z = True, local_stats[4][index]
+            elif crop_stats[0][crop_groups[index]] >= MIN_GROUP_SIZE:
+                use_local, z = False, crop_stats[4][index]
+            else:
+                continue
+            if abs(z) > OUTLIER_Z:
+                outliers.append((index, use_local, z))
+
+    bands = {}
+    for band_ids, _, (counts, quantiles, mad, _, _) in levels:
+        for group, band_id in enumerate(band_ids):
+            crop, location = band_id.split('|', 1)
+            band = {'_id': band_id, 'crop': crop, 'location': location, 'count': int(counts[group]),
+                    'mad': round(float(mad[group]), 2), 'outliers': []}
+            for name in QUANTILES:
+                band[name] = round(float(quantiles[name][group]), 2)
+            bands[band_id] = band
+
+    (local_ids, _, _), (crop_band_ids, _, _) = levels
+    for index, use_local, z in outliers:
+        band_id = local_ids[local_groups[index]] if use_local else crop_band_ids[crop_groups[index]]
+        bands[band_id]['outliers'].append({'id': str(crop_ids[index]), 'z': round(float(z), 2)})
+    return bands
+
+
+class PriceBands:
+    """Computes, stores and serves price bands.
+
+    Args:
+        crops: crops collection (read by the batch job)
+        collection: the price_bands collection
+    """
+
+    def __init__(self, crops, collection):
+        self.crops = crops
+        self.collection = collection
+        self.version = None
+        self._bands = {}  # {(crop, location): band}
+        self._outliers = {}  # {crop id: robust z}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Recompute every band from the active listings and store them. Returns the number of bands"""
+        crop_ids, names, locations, prices = [], [], [], []
+        listings = self.crops.find({'is_active': True, 'price_per_kg': {'$gt': 0}},
+                                   {'name': 1, 'location': 1, 'price_per_kg': 1})
+        for crop in listings:
+            crop_ids.append(crop['_id'])
+            names.append(crop.get('name'))
+            locations.append(crop.get('location'))
+            prices.append(crop['price_per_kg'])
+
+        bands = compute_price_bands(crop_ids, names, locations, prices) if crop_ids else {}
+        now = datetime.utcnow()
+        requests = [ReplaceOne({'_id': band_id}, dict(band, updated_at=now), upsert=True)
+                    for band_id, band in bands.items()]
+        for start in range(0, len(requests), BATCH_SIZE):
+            self.collection.bulk_write(requests[start:start + BATCH_SIZE], ordered=False)
+        # Bands of crops that are no longer listed
+        self.collection.delete_many({'updated_at': {'$lt': now}})
+        self._install(bands.values())
+        return len(bands)
+
+    def load(self, version=None):
+        """Load the stored bands into memory (call when another process refreshed them)"""
+        self._install(self.collection.find())
+        self.version = version
+
+    def _install(self, bands):
+        by_group, outliers = {}, {}
+        for band in bands:
+            by_group[(band['crop'], band['location'])] = band
+            for outlier in band.get('outliers', []):
+                outliers[outlier['id']] = outlier['z']
+        with self._lock:
+            self._bands, self._outliers = by_group, outliers
+
+    def band_for(self, name, location):
+        """The trusted band for a crop in a location (falling back to all locations), or None"""
+        crop = _key(name)
+        for key in ((crop, _key(location)), (crop, ANY_LOCATION)):
+            band = self._bands.get(key)
+            if band and band['count'] >= MIN_GROUP_SIZE:
+                return band
+        return None
+
+    def annotate(self, crops):
+        """Add 'price_band' (p25, median, p75) and 'price_flag' ('high'/'low'/None) to crop records"""
+        for crop in crops:
+            band = self.band_for(crop.get('name'), crop.get('location'))
+            crop['price_band'] = {'low': band['p25'], 'median': band['median'], 'high': band['p75']} if band else None
+            z = self._outliers.get(crop.get('_id'))
+            crop['price_flag'] = None if z is None else ('high' if z > 0 else 'low')
+        return crops
+
+    def summary(self, limit=5):
+        """Crop-wide bands with the most listings, for the chatbot context"""
+        bands = [band for (_, location), band in self._bands.items()
+                 if location == ANY_LOCATION and band['count'] >= MIN_GROUP_SIZE]
+        return sorted(bands, key=lambda band: band['count'], reverse=True)[:limit]
@@ -0,0 +1,69 @@
+"""
+Process Lock for Farming App
+A non-blocking, host-wide lock used so that only one worker process on a machine runs
+a background job (e.g. story cleanup) when the app is served by several workers.
+The lock is released automatically by the OS when the holding process exits.
+
+Locks are scoped (e.g. to the database the jobs work on), so separate deployments on
+one machine don't block each other's jobs.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+# fcntl is POSIX only; on other platforms every process runs its own jobs
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+class ProcessLock:
+    """Host-wide exclusive lock backed by a lock file.
+
+    Args:
+        name: job the lock is for
+        scope: what the job works on (a string, or a callable returning one, read when the
+            lock is taken); processes only contend for locks with the same name and scope
+    """
+
+    def __init__(self, name, scope=None):
+        self.name = name
+        self.scope = scope
+        self._file = None
+
+    @property
+    def path(self):
+        scope = self.scope() if callable(self.scope) else self.scope
+        if scope:
+            # Hashed: scopes may contain credentials or characters not allowed in file names
+            name = f"{hashlib.sha256(scope.encode('utf-8')).hexdigest()[:12]}-{self.name}"
+        else:
+            name = self.name
+        return os.path.join(tempfile.gettempdir(), f"farming-app-{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.lock")
+
+    @property
+    def held(self):
+        return self._file is not None or not FCNTL_AVAILABLE
+
+    def try_acquire(self):
+        """Try to take the lock without blocking. Returns True if this process holds it"""
+        if self.held:
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
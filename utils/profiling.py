@@ -0,0 +1,175 @@
+"""
+Live Profiling for Farming App
+Time-boxed CPU and memory profiles of a running worker, without restarting it.
+
+CPU profiles come from a sampling profiler: a helper thread records the Python stack of
+the profiled threads every few milliseconds, so the profiled code runs unmodified (no
+tracing overhead). Results are in the collapsed stack format ('frame;frame;frame count'
+per line) read by flamegraph.pl, speedscope and inferno.
+
+Memory profiles use tracemalloc: allocations that grew during the window, grouped by
+line, or as collapsed stacks weighted by bytes.
+"""
+
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# The sampler must be a real OS thread even when gevent has patched threading and time
+# (a greenlet would only run when the profiled code yields)
+try:
+    from gevent import monkey
+    _start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+    _allocate_lock = monkey.get_original('_thread', 'allocate_lock')
+    _get_ident = monkey.get_original('_thread', 'get_ident')
+    _sleep = monkey.get_original('time', 'sleep')
+except ImportError:
+    import _thread
+    _start_new_thread = _thread.start_new_thread
+    _allocate_lock = _thread.allocate_lock
+    _get_ident = _thread.get_ident
+    _sleep = time.sleep
+
+# One profile at a time per process: they are not free, and overlapping ones would see each other
+profile_lock = threading.Lock()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def native_thread_id():
+    """Identifier of the OS thread running the caller (as used by sys._current_frames)"""
+    return _get_ident()
+
+
+def _short_path(filename):
+    """Path relative to the project or to site-packages/the standard library"""
+    if filename.startswith(PROJECT_ROOT):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return filename[len(path) + 1:]
+    return filename
+
+
+class StackSampler:
+    """Sampling CPU profiler.
+
+    Args:
+        interval: seconds between samples
+        thread_ids: OS thread ids to sample (None: every thread but the sampler)
+    """
+
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = Counter()  # {(frame label, ...) from the root: samples}
+        self.samples = 0
+        self.started = None
+        self.seconds = 0.0
+        self._labels = {}  # {code object: frame label}
+        self._running = False
+        self._done = _allocate_lock()
+
+    def start(self):
+        self._running = True
+        self.started = time.perf_counter()
+        self._done.acquire()
+        _start_new_thread(self._run, ())
+        return self
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to finish"""
+        if self._running:
+            self._running = False
+            self._done.acquire()
+            self._done.release()
+            self.seconds = time.perf_counter() - self.started
+        return self
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        own_id = _get_ident()
+        try:
+            while self._running:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id or (self.thread_ids and thread_id not in self.thread_ids):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    if not self.thread_ids:
+                        # Whole-process profiles get one tree per thread
+                        stack.append(f"thread {names.get(thread_id, thread_id)}")
+                    self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+                _sleep(self.interval)
+        finally:
+            self._done.release()
+
+    def collapsed(self):
+        """Samples in the collapsed stack format, most frequent first"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_cpu(seconds, interval=0.005):
+    """Sample every thread of this process for the given number of seconds"""
+    sampler = StackSampler(interval).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler
+
+
+def profile_memory(seconds, limit=50, frames=16, collapsed=False):
+    """
+    Trace allocations for the given number of seconds and report what grew.
+
+    Returns text: the top `limit` lines by allocated size, or collapsed stacks weighted by
+    bytes when collapsed is True. Uses the running trace if tracemalloc is already on
+    (PYTHONTRACEMALLOC), otherwise traces only for the window.
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, linecache.__file__)]
+    before = before.filter_traces(ignore)
+    after = after.filter_traces(ignore)
+    if collapsed:
+        lines = []
+        for stat in after.compare_to(before, 'traceback'):
+            if stat.size_diff <= 0:
+                continue
+            stack = ';'.join(f"{_short_path(frame.filename)}:{frame.lineno}" for frame in reversed(stat.traceback))
+            lines.append(f"{stack} {stat.size_diff}\n")
+        return ''.join(lines)
+
+    stats = after.compare_to(before, 'lineno')
+    total = sum(stat.size for stat in stats)
+    grown = sum(stat.size_diff for stat in stats)
+    lines = [f"Traced memory: {total / 1024:.1f} KiB ({grown / 1024:+.1f} KiB in {seconds:g}s)\n"]
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                     f"{_short_path(frame.filename)}:{frame.lineno}  "
+                     f"{linecache.getline(frame.filename, frame.lineno).strip()}\n")
+    return ''.join(lines)
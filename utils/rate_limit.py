@@ -0,0 +1,160 @@
+"""
+Rate Limiting and Admission Control for Farming App
+Keeps one client (or a traffic spike) from tying up the workers on expensive endpoints
+such as the chatbot, story uploads, signup and login.
+
+Each limited route has a token bucket per client (user id, or IP address for anonymous
+requests): `capacity` requests in a burst, refilled at `capacity / period` per second.
+Buckets live in memory (per worker process) or in MongoDB (shared by every worker and
+node). On top of that, a per-process admission cap bounds how many expensive requests run
+at once; requests over it are shed with 503 instead of queueing behind the slow ones, so
+the remaining threads keep serving everything else.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+
+class RateLimit:
+    """A budget of `capacity` requests per `period` seconds (also the burst size)"""
+
+    def __init__(self, capacity, period):
+        if capacity <= 0 or period <= 0:
+            raise ValueError("Rate limit capacity and period must be positive")
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period  # Tokens refilled per second
+
+    @classmethod
+    def parse(cls, text):
+        """Parse '<requests>/<seconds>', e.g. '10/60'"""
+        try:
+            capacity, period = text.split('/')
+            return cls(int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{text}' (expected '<requests>/<seconds>')")
+
+    def __repr__(self):
+        return f"{self.capacity}/{self.period:g}"
+
+
+class MemoryBuckets:
+    """Token buckets of this process, least recently used dropped beyond max_keys"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # {key: [tokens, updated at (monotonic)]}
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, cost=1):
+        """Take cost tokens if available. Returns (allowed, tokens left)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [limit.capacity, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)  # A forgotten bucket is a full one
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+                bucket[1] = now
+            allowed = bucket[0] >= cost
+            if allowed:
+                bucket[0] -= cost
+            return allowed, bucket[0]
+
+
+class MongoBuckets:
+    """Token buckets in a MongoDB collection, shared by every process.
+
+    Each check is one atomic find_one_and_update with an update pipeline (MongoDB 4.2+).
+    Buckets idle for a full period are removed by a TTL index (see ensure_indexes).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def take(self, key, limit, cost=1):
+        now = datetime.utcnow()
+        refilled = {'$min': [limit.capacity, {'$add': [
+            {'$ifNull': ['$tokens', limit.capacity]},
+            {'$multiply': [{'$subtract': [now, {'$ifNull': ['$updated_at', now]}]}, limit.rate / 1000]},
+        ]}]}
+        doc = self.collection.find_one_and_update(
+            {'_id': key},
+            [
+                {'$set': {'tokens': refilled, 'updated_at': now,
+                          'expires_at': now + timedelta(seconds=limit.period)}},
+                {'$set': {'allowed': {'$gte': ['$tokens', cost]}}},
+                {'$set': {'tokens': {'$cond': ['$allowed', {'$subtract': ['$tokens', cost]}, '$tokens']}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['allowed'], doc['tokens']
+
+    def ensure_indexes(self):
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+
+class RateLimiter:
+    """Per-route token buckets.
+
+    Args:
+        buckets: MemoryBuckets or MongoBuckets
+        limits: {route name: RateLimit}
+        logger: used to report backend errors (requests are let through when the store fails)
+    """
+
+    def __init__(self, buckets, limits, logger=None):
+        self.buckets = buckets
+        self.limits = limits
+        self.logger = logger
+
+    def check(self, route, client):
+        """Returns (allowed, seconds until the next request is allowed)"""
+        limit = self.limits.get(route)
+        if limit is None:
+            return True, 0
+        try:
+            allowed, tokens = self.buckets.take(f"{route}:{client}", limit)
+        except Exception as e:
+            # Fail open: an unavailable store must not take the endpoints down with it
+            if self.logger:
+                self.logger.error(f"Rate limit check failed for {route}: {e}")
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((1 - tokens) / limit.rate))
+
+
+class AdmissionControl:
+    """Cap on concurrently running expensive requests in this process.
+
+    Args:
+        max_concurrent: requests allowed to run at once (0 disables the cap)
+        queue_timeout: seconds a request may wait for a slot before it is shed
+    """
+
+    def __init__(self, max_concurrent, queue_timeout=0.0):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+
+    def try_enter(self):
+        """Take a slot. Returns False if the request should be shed"""
+        if self._slots is None:
+            return True
+        if self.queue_timeout > 0:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        return self._slots.acquire(blocking=False)
+
+    def leave(self):
+        if self._slots is not None:
+            self._slots.release()
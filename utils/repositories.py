@@ -0,0 +1,449 @@
+"""
+Data Repositories for Farming App
+One repository per collection (crops, market updates, stories, payments, users) so
+request handlers don't build MongoDB queries themselves.
+
+Every repository comes in two flavours that share the same query methods:
+    - CropRepository, ...: synchronous, for the Flask app (PyMongo or mongomock collections)
+    - AsyncCropRepository, ...: asyncio, for async stacks. Methods return awaitables; they
+      use PyMongo's AsyncMongoClient or Motor collections natively and run any other
+      (synchronous) collection in a worker thread, so they also work against a fake.
+
+Usage:
+    crops = CropRepository(mongo.collection('crops'), catalog=mongo.catalog_collection('crops'))
+    crops.search({'category': 'grains'})
+
+    crops = AsyncCropRepository(mongo.async_collection('crops'))
+    await crops.search({'category': 'grains'})
+"""
+
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateMany
+from pymongo.errors import BulkWriteError
+
+# Native async collections are optional: PyMongo >= 4.9 ships AsyncMongoClient, older
+# installs may have Motor
+ASYNC_COLLECTION_TYPES = ()
+try:
+    from pymongo.asynchronous.collection import AsyncCollection
+    ASYNC_COLLECTION_TYPES += (AsyncCollection,)
+except ImportError:
+    pass
+try:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+    ASYNC_COLLECTION_TYPES += (AsyncIOMotorCollection,)
+except ImportError:
+    pass
+
+NEWEST_FIRST = [('created_at', -1)]
+
+# Crop fields served to templates and JSON; reads project to exactly these
+CROP_FIELDS = ('name', 'category', 'quantity', 'price_per_kg', 'total_price', 'location', 'description',
+               'seller_name', 'seller_email', 'seller_phone', 'seller_location', 'is_active',
+               'created_at', 'updated_at', 'location_point')
+CROP_PROJECTION = dict.fromkeys(CROP_FIELDS, 1)
+
+
+def as_object_id(doc_id):
+    """Convert a string id to an ObjectId (raises bson.errors.InvalidId if malformed)"""
+    return doc_id if isinstance(doc_id, ObjectId) else ObjectId(doc_id)
+
+
+def write_errors(error):
+    """Map a BulkWriteError to {request position: error message}"""
+    return {item['index']: item.get('errmsg', 'Write failed') for item in error.details.get('writeErrors', [])}
+
+
+def crop_record(doc):
+    """Map a stored crop listing to the dict used by templates and JSON.
+
+    Listings are stored complete (see utils/migrations.py); the defaults only cover
+    documents written before the migration ran.
+    """
+    get = doc.get
+    quantity = get('quantity', 0)
+    price_per_kg = get('price_per_kg', 0)
+    return {
+        '_id': str(doc['_id']),
+        'name': get('name', ''),
+        'category': get('category', ''),
+        'quantity': quantity,
+        'price_per_kg': price_per_kg,
+        'total_price': get('total_price', quantity * price_per_kg),
+        'location': get('location', ''),
+        'description': get('description', ''),
+        'seller_name': get('seller_name', 'Unknown'),
+        'seller_email': get('seller_email', ''),
+        'seller_phone': get('seller_phone', ''),
+        'seller_location': get('seller_location', ''),
+        'is_active': get('is_active', False),
+        'created_at': get('created_at'),
+        'updated_at': get('updated_at'),
+        'location_point': get('location_point'),
+    }
+
+
+def _cursor(collection, query, projection, sort, limit):
+    """Build a find cursor; works the same for sync and async collections"""
+    cursor = collection.find(query or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+class Repository:
+    """Synchronous data access for one collection.
+
+    Args:
+        collection: collection used for writes and reads that must see the latest data
+        catalog: collection used for catalog reads (e.g. routed to secondaries); defaults to collection
+    """
+
+    def __init__(self, collection, catalog=None):
+        self.collection = collection
+        self.catalog = catalog if catalog is not None else collection
+
+    def serialize(self, doc):
+        """Prepare a document for templates/JSON (string ids)"""
+        doc['_id'] = str(doc['_id'])
+        return doc
+
+    def _source(self, catalog):
+        return self.catalog if catalog else self.collection
+
+    def list(self, query=None, projection=None, sort=None, limit=0, catalog=False):
+        """Find documents, serialized"""
+        return [self.serialize(doc) for doc in _cursor(self._source(catalog), query, projection, sort, limit)]
+
+    def iter(self, query=None, projection=None, sort=None, limit=0, catalog=False):
+        """Find documents, serialized one at a time (for streaming large results)"""
+        for doc in _cursor(self._source(catalog), query, projection, sort, limit):
+            yield self.serialize(doc)
+
+    def batches(self, query=None, projection=None, after=None, batch_size=1000):
+        """
+        Yield every matching document in _id order as lists of serialized documents.
+        Each batch is its own short query (keyset pagination on _id), so no cursor has to
+        outlive the per-operation timeout; after resumes past a previously seen _id.
+        """
+        query = dict(query or {})
+        while True:
+            page_query = dict(query, _id={'$gt': as_object_id(after)}) if after is not None else query
+            docs = list(_cursor(self.collection, page_query, projection, [('_id', 1)], batch_size))
+            if docs:
+                after = docs[-1]['_id']
+                yield [self.serialize(doc) for doc in docs]
+            if len(docs) < batch_size:
+                return
+
+    def find_one(self, query, projection=None, catalog=False):
+        """Find one raw document, or None"""
+        return self._source(catalog).find_one(query, projection)
+
+    def get(self, doc_id, projection=None):
+        """Get one raw document by id, or None"""
+        return self.collection.find_one({'_id': as_object_id(doc_id)}, projection)
+
+    def exists(self, query):
+        return self.collection.find_one(query, {'_id': 1}) is not None
+
+    def count(self, query=None, catalog=False):
+        return self._source(catalog).count_documents(query or {})
+
+    def distinct(self, field, query=None):
+        return self.collection.distinct(field, query or {})
+
+    def insert(self, doc):
+        """Insert a document and return its id as a string"""
+        return str(self.collection.insert_one(doc).inserted_id)
+
+    def insert_many(self, docs):
+        """Insert documents in one unordered batch (ids are set on docs).
+
+        Returns {position: error message} for the documents the server rejected.
+        """
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return write_errors(e)
+        return {}
+
+    def update(self, doc_id, fields):
+        """Set fields (and updated_at, for incremental exports) on a document. Returns True if it was modified"""
+        fields = dict({'updated_at': datetime.utcnow()}, **fields)
+        return self.collection.update_one({'_id': as_object_id(doc_id)}, {'$set': fields}).modified_count > 0
+
+    def update_where(self, query, update):
+        """Apply an update document to every match. Returns the number modified"""
+        return self.collection.update_many(query, update).modified_count
+
+    def delete(self, doc_id):
+        """Delete a document. Returns True if it was deleted"""
+        return self.collection.delete_one({'_id': as_object_id(doc_id)}).deleted_count > 0
+
+    def bulk_update(self, requests):
+        """Send update requests (UpdateOne/UpdateMany) in one unordered batch. Returns the number modified"""
+        if not requests:
+            return 0
+        return self.collection.bulk_write(requests, ordered=False).modified_count
+
+    def bulk_write(self, requests):
+        """Send write requests in one unordered batch. Returns {position: error message} for failed ones"""
+        if not requests:
+            return {}
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            return write_errors(e)
+        return {}
+
+
+class AsyncRepository(Repository):
+    """asyncio data access for one collection; every method returns an awaitable.
+
+    Native async collections (AsyncMongoClient, Motor) are awaited directly; synchronous
+    collections (PyMongo, mongomock) run in the default thread pool.
+    """
+
+    def __init__(self, collection, catalog=None):
+        super().__init__(collection, catalog)
+        self.native = isinstance(self.collection, ASYNC_COLLECTION_TYPES)
+
+    async def _call(self, collection, method, *args, **kwargs):
+        if self.native:
+            return await getattr(collection, method)(*args, **kwargs)
+        return await asyncio.to_thread(getattr(collection, method), *args, **kwargs)
+
+    async def _to_list(self, cursor):
+        if self.native:
+            return await cursor.to_list(length=None)
+        return await asyncio.to_thread(list, cursor)
+
+    async def list(self, query=None, projection=None, sort=None, limit=0, catalog=False):
+        docs = await self._to_list(_cursor(self._source(catalog), query, projection, sort, limit))
+        return [self.serialize(doc) for doc in docs]
+
+    async def iter(self, query=None, projection=None, sort=None, limit=0, catalog=False):
+        cursor = _cursor(self._source(catalog), query, projection, sort, limit)
+        if self.native:
+            async for doc in cursor:
+                yield self.serialize(doc)
+            return
+        for doc in await asyncio.to_thread(list, cursor):
+            yield self.serialize(doc)
+
+    async def batches(self, query=None, projection=None, after=None, batch_size=1000):
+        """Async generator of serialized batches in _id order (see Repository.batches)"""
+        query = dict(query or {})
+        while True:
+            page_query = dict(query, _id={'$gt': as_object_id(after)}) if after is not None else query
+            docs = await self._to_list(_cursor(self.collection, page_query, projection, [('_id', 1)], batch_size))
+            if docs:
+                after = docs[-1]['_id']
+                yield [self.serialize(doc) for doc in docs]
+            if len(docs) < batch_size:
+                return
+
+    async def find_one(self, query, projection=None, catalog=False):
+        return await self._call(self._source(catalog), 'find_one', query, projection)
+
+    async def get(self, doc_id, projection=None):
+        return await self._call(self.collection, 'find_one', {'_id': as_object_id(doc_id)}, projection)
+
+    async def exists(self, query):
+        return await self._call(self.collection, 'find_one', query, {'_id': 1}) is not None
+
+    async def count(self, query=None, catalog=False):
+        return await self._call(self._source(catalog), 'count_documents', query or {})
+
+    async def distinct(self, field, query=None):
+        return await self._call(self.collection, 'distinct', field, query or {})
+
+    async def insert(self, doc):
+        return str((await self._call(self.collection, 'insert_one', doc)).inserted_id)
+
+    async def insert_many(self, docs):
+        try:
+            await self._call(self.collection, 'insert_many', docs, ordered=False)
+        except BulkWriteError as e:
+            return write_errors(e)
+        return {}
+
+    async def update(self, doc_id, fields):
+        fields = dict({'updated_at': datetime.utcnow()}, **fields)
+        result = await self._call(self.collection, 'update_one', {'_id': as_object_id(doc_id)}, {'$set': fields})
+        return result.modified_count > 0
+
+    async def update_where(self, query, update):
+        return (await self._call(self.collection, 'update_many', query, update)).modified_count
+
+    async def delete(self, doc_id):
+        result = await self._call(self.collection, 'delete_one', {'_id': as_object_id(doc_id)})
+        return result.deleted_count > 0
+
+    async def bulk_update(self, requests):
+        if not requests:
+            return 0
+        return (await self._call(self.collection, 'bulk_write', requests, ordered=False)).modified_count
+
+    async def bulk_write(self, requests):
+        if not requests:
+            return {}
+        try:
+            await self._call(self.collection, 'bulk_write', requests, ordered=False)
+        except BulkWriteError as e:
+            return write_errors(e)
+        return {}
+
+
+# Query methods shared by the sync and async repositories. They only build queries and
+# return the base method's result, so they work unchanged on both.
+
+class MarketUpdateQueries:
+    def latest(self):
+        """All market updates, newest first (catalog read)"""
+        return self.list(sort=NEWEST_FIRST, catalog=True)
+
+    def create(self, update_data):
+        update_data['created_at'] = datetime.utcnow()
+        return self.insert(update_data)
+
+
+class CropQueries:
+    def serialize(self, doc):
+        return crop_record(doc)
+
+    @staticmethod
+    def search_query(filters=None):
+        """
+        Build a crops query from search filters (category, location, price_min, price_max,
+        near: a GeoJSON point, radius_km: limit for near)
+        """
+        query = {}
+        if filters:
+            if filters.get('category'):
+                query['category'] = filters['category']
+            if filters.get('location'):
+                query['location'] = {'$regex': filters['location'], '$options': 'i'}
+            if filters.get('price_min') or filters.get('price_max'):
+                price_query = {}
+                if filters.get('price_min'):
+                    price_query['$gte'] = filters['price_min']
+                if filters.get('price_max'):
+                    price_query['$lte'] = filters['price_max']
+                query['price_per_kg'] = price_query
+            if filters.get('near'):
+                # Needs the 2dsphere index on location_point; results come nearest first
+                near = {'$geometry': filters['near']}
+                if filters.get('radius_km'):
+                    near['$maxDistance'] = filters['radius_km'] * 1000
+                query['location_point'] = {'$near': near}
+        return query
+
+    def search(self, filters=None):
+        """Crop listings matching the filters, newest first or nearest first with 'near' (catalog read)"""
+        sort = None if filters and filters.get('near') else NEWEST_FIRST
+        return self.list(self.search_query(filters), CROP_PROJECTION, sort=sort, catalog=True)
+
+    def by_ids(self, crop_ids):
+        """Listings with the given ids, in one query (malformed ids are skipped)"""
+        object_ids = [as_object_id(crop_id) for crop_id in crop_ids if ObjectId.is_valid(crop_id)]
+        return self.list({'_id': {'$in': object_ids}}, CROP_PROJECTION)
+
+    def update_seller_snapshots(self, snapshots):
+        """Copy sellers' new details onto their listings. snapshots: {seller email: fields}"""
+        now = datetime.utcnow()
+        return self.bulk_update([
+            UpdateMany({'seller_email': email}, {'$set': dict(fields, updated_at=now)})
+            for email, fields in snapshots.items()
+        ])
+
+    def sellers_without_snapshot(self):
+        """Emails of sellers whose listings predate seller snapshots"""
+        return self.distinct('seller_email', {'seller_location': {'$exists': False}})
+
+    def by_seller(self, seller_email):
+        """A seller's own listings, newest first (always read from the primary)"""
+        return self.list({'seller_email': seller_email}, CROP_PROJECTION, sort=NEWEST_FIRST)
+
+    def create(self, crop_data):
+        crop_data['created_at'] = datetime.utcnow()
+        return self.insert(crop_data)
+
+
+class StoryQueries:
+    def active(self, now):
+        """Stories that have not expired, newest first (catalog read)"""
+        return self.list({'expires_at': {'$gt': now}}, sort=NEWEST_FIRST, catalog=True)
+
+    def expired(self, now):
+        return self.list({'expires_at': {'$lte': now}})
+
+    def uses_file(self, filename):
+        """Check if any story still references a stored file"""
+        return self.exists({'filename': filename})
+
+
+class PaymentQueries:
+    def successful_for(self, user_email):
+        """A buyer's successful payments, newest first"""
+        return self.list({'user_email': user_email, 'status': 'success'}, sort=NEWEST_FIRST)
+
+
+class UserQueries:
+    def by_email(self, email, projection=None):
+        return self.find_one({'email': email}, projection)
+
+    def by_email_or_phone(self, email, phone):
+        return self.find_one({'$or': [{'email': email}, {'phone': phone}]})
+
+    def username_taken(self, username):
+        return self.exists({'username': username})
+
+    def without_passwords(self):
+        return self.iter(projection={'password': 0})
+
+
+class MarketUpdateRepository(MarketUpdateQueries, Repository):
+    pass
+
+
+class CropRepository(CropQueries, Repository):
+    pass
+
+
+class StoryRepository(StoryQueries, Repository):
+    pass
+
+
+class PaymentRepository(PaymentQueries, Repository):
+    pass
+
+
+class UserRepository(UserQueries, Repository):
+    pass
+
+
+class AsyncMarketUpdateRepository(MarketUpdateQueries, AsyncRepository):
+    pass
+
+
+class AsyncCropRepository(CropQueries, AsyncRepository):
+    pass
+
+
+class AsyncStoryRepository(StoryQueries, AsyncRepository):
+    pass
+
+
+class AsyncPaymentRepository(PaymentQueries, AsyncRepository):
+    pass
+
+
+class AsyncUserRepository(UserQueries, AsyncRepository):
+    pass
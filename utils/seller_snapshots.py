@@ -0,0 +1,112 @@
+"""
+Seller Snapshots for Farming App
+Crop listings carry a copy of the seller's public details (name, phone, location), so
+listing and order views render without looking up the users collection.
+
+When a seller changes their profile the copies are refreshed in the background:
+changes are queued, coalesced per seller and written in one batched update_many
+round trip.
+"""
+
+import threading
+
+from utils.database import job_timeout
+
+# Seller fields copied onto every crop listing
+SNAPSHOT_FIELDS = ('seller_name', 'seller_phone', 'seller_location')
+
+
+def seller_snapshot(profile, phone='', email=''):
+    """Build the crop fields that describe a seller from their profile.
+
+    Without a profile name the seller is named after their email, as new listings are;
+    with neither, seller_name is left out so an existing name is kept.
+    """
+    profile = profile or {}
+    snapshot = {
+        'seller_phone': phone or '',
+        'seller_location': profile.get('location', ''),
+    }
+    name = profile.get('name') or (email.split('@')[0] if email else '')
+    if name:
+        snapshot['seller_name'] = name
+    return snapshot
+
+
+class SellerSnapshotSync:
+    """Background propagation of profile changes to crop listings.
+
+    Args:
+        crops: CropRepository holding the listings
+        users: UserRepository, used to backfill listings created before snapshots existed
+        on_change: called after listings were modified (e.g. to bump the crops data version)
+        delay: seconds to wait for more changes before writing a batch
+    """
+
+    def __init__(self, crops, users, on_change=None, delay=2.0):
+        self.crops = crops
+        self.users = users
+        self.on_change = on_change
+        self.delay = delay
+        self._pending = {}  # {seller email: snapshot}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def queue(self, seller_email, snapshot):
+        """Queue a seller's new snapshot; later changes for the same seller replace earlier ones"""
+        with self._lock:
+            self._pending[seller_email] = snapshot
+        self._wake.set()
+
+    def flush(self):
+        """Write every queued snapshot in one batch. Returns the number of listings modified"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._wake.clear()
+        if not pending:
+            return 0
+        try:
+            modified = self.crops.update_seller_snapshots(pending)
+        except Exception:
+            # Put the batch back (unless newer changes arrived) so the next flush retries it
+            with self._lock:
+                for email, snapshot in pending.items():
+                    self._pending.setdefault(email, snapshot)
+            self._wake.set()
+            raise
+        if modified and self.on_change:
+            self.on_change()
+        return modified
+
+    def backfill(self):
+        """Add snapshots to listings that don't have one yet. Returns the number of listings modified"""
+        emails = self.crops.sellers_without_snapshot()
+        if not emails:
+            return 0
+        for user in self.users.list({'email': {'$in': emails}}, {'email': 1, 'phone': 1, 'profile': 1}):
+            self.queue(user['email'], seller_snapshot(user.get('profile'), user.get('phone', ''), user['email']))
+        return self.flush()
+
+    def run(self, stop_event, logger):
+        """Propagate queued snapshots until stop_event is set (background thread target)"""
+        try:
+            with job_timeout():
+                modified = self.backfill()
+            if modified:
+                logger.info(f"Backfilled seller snapshots on {modified} crop listings")
+        except Exception as e:
+            logger.error(f"Error backfilling seller snapshots: {e}")
+
+        while not stop_event.is_set():
+            self._wake.wait(timeout=1.0)
+            if not self._wake.is_set():
+                continue
+            # Give a burst of profile edits a moment to coalesce into one batch
+            stop_event.wait(self.delay)
+            try:
+                with job_timeout():
+                    modified = self.flush()
+                if modified:
+                    logger.info(f"Updated seller snapshots on {modified} crop listings")
+            except Exception as e:
+                logger.error(f"Error updating seller snapshots: {e}")
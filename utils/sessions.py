@@ -0,0 +1,182 @@
+"""
+Server-side Sessions for Farming App
+Session data lives in the 'sessions' collection and the cookie only carries a signed
+random session id, so the cookie stays small however much is stored and requests don't
+re-sign and re-parse the whole session.
+
+User profiles are not kept in the session. A small per-process cache holds them, keyed
+by user id and checked against a profile version stored in the session:
+complete_profile() writes a new version to the user document and the session, so the
+next request on any worker reloads the profile (read-your-writes) while unchanged
+profiles are served from memory.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+# Paths served without a session (static assets, media and metrics scrapes), so they cost no database read
+SESSIONLESS_PATHS = ('/static/', '/i18n/', '/uploads/', '/styles.', '/script.', '/favicon.ico', '/metrics')
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data loaded from the sessions collection"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.old_sid = None
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def regenerate(self):
+        """Move the data to a new session id (call on login to prevent session fixation)"""
+        if not self.new:
+            self.old_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class MongoSessionInterface(SessionInterface):
+    """Flask session interface storing sessions in MongoDB.
+
+    Sessions expire permanent_session_lifetime after their last write or touch; a TTL
+    index on expires_at (see ensure_indexes) removes them from the collection.
+
+    Args:
+        collection: the sessions collection
+        touch_interval: seconds between expiry extensions of a session that is read but not changed
+    """
+
+    salt = 'farming-session'
+
+    def __init__(self, collection, touch_interval=3600):
+        self.collection = collection
+        self.touch_interval = touch_interval
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        if request.path.startswith(SESSIONLESS_PATHS):
+            return None  # Flask substitutes a read-only null session
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                doc = self.collection.find_one({'_id': sid, 'expires_at': {'$gt': datetime.utcnow()}})
+                if doc:
+                    return ServerSession(doc.get('data'), sid=sid, expires_at=doc['expires_at'])
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        if self.is_null_session(session):
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.old_sid:
+            self.collection.delete_one({'_id': session.old_sid})
+        if not session:
+            # Emptied (logout): drop the stored session and the cookie
+            if not session.new:
+                self.collection.delete_one({'_id': session.sid})
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + app.permanent_session_lifetime
+        if session.modified or session.new:
+            self.collection.replace_one(
+                {'_id': session.sid},
+                {'_id': session.sid, 'data': dict(session), 'expires_at': expires_at, 'updated_at': now},
+                upsert=True
+            )
+        elif (expires_at - session.expires_at).total_seconds() > self.touch_interval:
+            self.collection.update_one({'_id': session.sid}, {'$set': {'expires_at': expires_at}})
+
+        if session.new or session.old_sid or session.permanent:
+            response.set_cookie(
+                name, self._signer(app).sign(session.sid).decode('ascii'),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app)
+            )
+
+    def ensure_indexes(self):
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+
+class ProfileCache:
+    """Per-process LRU cache of user profiles, validated against a profile version.
+
+    Args:
+        load: function(user_id) returning (profile dict, version) from the database
+        max_entries: profiles kept in memory
+        ttl: seconds a cached profile is trusted without a version change (picks up
+            changes made from another session of the same user)
+    """
+
+    def __init__(self, load, max_entries=1024, ttl=300):
+        self.load = load
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {user_id: (version, profile, loaded_at)}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version=None):
+        """Get (profile, version); reloads when version differs from the cached one or the entry is old"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached and cached[0] == version and now - cached[2] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return cached[1], cached[0]
+
+        profile, version = self.load(user_id)
+        self.put(user_id, version, profile)
+        return profile, version
+
+    def put(self, user_id, version, profile):
+        """Cache a profile the caller just read or wrote"""
+        with self._lock:
+            self._entries[user_id] = (version, profile, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
@@ -0,0 +1,289 @@
+"""
+Media Storage Backends for Farming App
+Story uploads are stored through a MediaStorage backend instead of a fixed local folder.
+
+Files are content-addressed: the storage key is the SHA-256 of the file contents plus
+the original extension, so identical uploads are stored only once and any app node can
+serve any key. Saving content that is already stored refreshes its modification time,
+so cleanup jobs can tell it is about to be referenced again.
+
+Backends:
+    - LocalContentStorage: sharded directories on local (or shared) disk
+    - S3Storage: any S3-compatible object store (AWS S3, MinIO, ...)
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+from flask import Response, redirect, send_from_directory
+from werkzeug.exceptions import NotFound
+
+# boto3 is only needed for the S3 backend
+BOTO3_AVAILABLE = False
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+CHUNK_SIZE = 1024 * 1024  # 1MB read/write chunks
+CONTENT_KEY_PATTERN = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]+)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # Content-addressed files never change
+
+
+def content_key(digest, extension):
+    """Build a storage key from a SHA-256 hex digest and file extension"""
+    return f"{digest}.{extension.lower()}"
+
+
+def is_content_key(key):
+    """Check if a key is a content-addressed key (legacy uploads used random names)"""
+    return CONTENT_KEY_PATTERN.match(key or '') is not None
+
+
+def _spool_and_hash(stream, directory=None):
+    """Copy a stream into a temporary file (in directory, default the system temp dir) while
+    hashing it. Returns (temp_path, sha256 hex)"""
+    hasher = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(prefix='upload_', suffix='.part', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                temp_file.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, hasher.hexdigest()
+
+
+class MediaStorage(ABC):
+    """Base class for story media storage backends"""
+
+    name = 'base'
+
+    @abstractmethod
+    def save(self, stream, extension):
+        """Store the contents of a file-like object and return its storage key"""
+
+    @abstractmethod
+    def exists(self, key):
+        """Check if a key is stored"""
+
+    @abstractmethod
+    def modified_at(self, key):
+        """When a key was last saved (naive UTC datetime), or None if it is not stored"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Delete a stored key. Returns True if something was deleted"""
+
+    @abstractmethod
+    def send(self, key):
+        """Return a Flask response that serves the stored key"""
+
+
+class LocalContentStorage(MediaStorage):
+    """Content-addressed storage on a local or shared (NFS) directory.
+
+    Keys are laid out as <root>/<aa>/<bb>/<sha256>.<ext> so no single directory grows
+    too large. Legacy uploads (random names stored flat in <root>) are still served.
+    Uploads are written under <root>/.incoming first, so they are renamed into place on
+    the same filesystem and never seen half-written.
+    """
+
+    name = 'local'
+
+    def __init__(self, root):
+        # Directories are created on the first save, not at startup
+        self.root = os.path.abspath(root)
+
+    def path_for(self, key):
+        """Get the absolute path of a key"""
+        match = CONTENT_KEY_PATTERN.match(key)
+        if match:
+            digest = match.group(1)
+            return os.path.join(self.root, digest[:2], digest[2:4], key)
+        # Legacy flat layout; never allow keys to escape the root directory
+        return os.path.join(self.root, os.path.basename(key))
+
+    def save(self, stream, extension):
+        incoming = os.path.join(self.root, '.incoming')
+        os.makedirs(incoming, exist_ok=True)
+        temp_path, digest = _spool_and_hash(stream, incoming)
+        key = content_key(digest, extension)
+        target = self.path_for(key)
+        try:
+            if os.path.exists(target):
+                # Duplicate upload - the content is already stored
+                os.utime(target)
+                return key
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # The rename is atomic (same filesystem), so concurrent uploads of the same
+            # content simply replace each other with identical bytes
+            os.replace(temp_path, target)
+            return key
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def exists(self, key):
+        return os.path.isfile(self.path_for(key))
+
+    def modified_at(self, key):
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(self.path_for(key)))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return False
+        os.remove(path)
+        return True
+
+    def send(self, key):
+        path = self.path_for(key)
+        if is_content_key(key):
+            return send_from_directory(os.path.dirname(path), key, max_age=IMMUTABLE_MAX_AGE)
+        return send_from_directory(self.root, os.path.basename(key))
+
+
+class S3Storage(MediaStorage):
+    """Content-addressed storage in an S3-compatible bucket.
+
+    Works with AWS S3 and with local stand-ins such as MinIO by setting endpoint_url.
+    Files are served either by redirecting to a presigned URL or by proxying the body.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='stories/', endpoint_url=None, region_name=None,
+                 presign=True, presign_expiry=3600, client=None):
+        if client is None:
+            if not BOTO3_AVAILABLE:
+                raise RuntimeError("boto3 is not installed. Install with: pip install boto3")
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign = presign
+        self.presign_expiry = presign_expiry
+
+    def object_key(self, key):
+        """Get the bucket object key for a storage key"""
+        match = CONTENT_KEY_PATTERN.match(key)
+        if match:
+            digest = match.group(1)
+            return f"{self.prefix}{digest[:2]}/{digest[2:4]}/{key}"
+        return f"{self.prefix}{os.path.basename(key)}"
+
+    def save(self, stream, extension):
+        temp_path, digest = _spool_and_hash(stream)
+        key = content_key(digest, extension)
+        try:
+            content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+            cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            if self.exists(key):
+                # Duplicate upload - copy the object onto itself to refresh LastModified
+                self.client.copy_object(
+                    Bucket=self.bucket, Key=self.object_key(key),
+                    CopySource={'Bucket': self.bucket, 'Key': self.object_key(key)},
+                    MetadataDirective='REPLACE', ContentType=content_type, CacheControl=cache_control
+                )
+                return key
+            with open(temp_path, 'rb') as temp_file:
+                self.client.upload_fileobj(
+                    temp_file, self.bucket, self.object_key(key),
+                    ExtraArgs={'ContentType': content_type, 'CacheControl': cache_control}
+                )
+            return key
+        finally:
+            os.remove(temp_path)
+
+    def _head(self, key):
+        """The object's metadata, or None if it is not stored"""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def modified_at(self, key):
+        head = self._head(key)
+        if head is None:
+            return None
+        return head['LastModified'].astimezone(timezone.utc).replace(tzinfo=None)
+
+    def delete(self, key):
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        return True
+
+    def send(self, key):
+        if self.presign:
+            url = self.client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': self.object_key(key)},
+                ExpiresIn=self.presign_expiry
+            )
+            return redirect(url)
+
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise NotFound()
+            raise
+        response = Response(obj['Body'].iter_chunks(CHUNK_SIZE),
+                            mimetype=obj.get('ContentType') or 'application/octet-stream')
+        if 'ContentLength' in obj:
+            response.content_length = obj['ContentLength']
+        if is_content_key(key):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        return response
+
+
+def create_storage(local_root, backend=None):
+    """
+    Create the media storage backend configured in the environment.
+
+    Environment variables:
+        MEDIA_STORAGE_BACKEND: 'local' (default) or 's3'
+        MEDIA_S3_BUCKET, MEDIA_S3_PREFIX, MEDIA_S3_ENDPOINT_URL, MEDIA_S3_REGION
+        MEDIA_S3_PRESIGN: 'True' to redirect to presigned URLs, 'False' to proxy files
+    Credentials for S3 are read by boto3 from the usual AWS_* variables.
+    """
+    backend = (backend or os.getenv('MEDIA_STORAGE_BACKEND', 'local')).lower()
+
+    if backend == 's3':
+        bucket = os.getenv('MEDIA_S3_BUCKET')
+        if not bucket:
+            raise ValueError("MEDIA_S3_BUCKET environment variable is required for the s3 storage backend")
+        return S3Storage(
+            bucket=bucket,
+            prefix=os.getenv('MEDIA_S3_PREFIX', 'stories/'),
+            endpoint_url=os.getenv('MEDIA_S3_ENDPOINT_URL') or None,
+            region_name=os.getenv('MEDIA_S3_REGION') or None,
+            presign=os.getenv('MEDIA_S3_PRESIGN', 'True').lower() == 'true'
+        )
+
+    if backend != 'local':
+        raise ValueError(f"Unknown media storage backend: {backend}")
+    return LocalContentStorage(local_root)
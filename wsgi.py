@@ -0,0 +1,10 @@
+"""
+WSGI entry point for the Farming App.
+
+Used by production servers, e.g.:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from backend.app import create_app
+
+app = create_app()